@@ -43,6 +43,6 @@ foreach(_plugin ${_plugins})
     get_filename_component(_plugin_directory ${_plugin} DIRECTORY)
     if(EXISTS ${_plugin_directory}/tests)
         get_filename_component(_plugin_name ${_plugin_directory} NAME)
-        cura_add_test(NAME pytest-${_plugin_name} DIRECTORY ${_plugin_directory} PYTHONPATH "${_plugin_directory}|${CMAKE_SOURCE_DIR}|${URANIUM_DIR}")
+        cura_add_test(NAME pytest-${_plugin_name} DIRECTORY ${_plugin_directory} PYTHONPATH "${_plugin_directory}|${CMAKE_SOURCE_DIR}/plugins|${CMAKE_SOURCE_DIR}|${URANIUM_DIR}")
     endif()
 endforeach()
@@ -0,0 +1,298 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import concurrent.futures
+import json
+import os
+import threading
+import time
+
+from UM.Application import Application
+from UM.Logger import Logger
+from UM.Scene.SceneNode import SceneNode
+from UM.Settings.ContainerRegistry import ContainerRegistry
+
+from cura.Arrange import Arrange
+from cura.ConvexHullDecorator import ConvexHullDecorator
+from cura.PrintInformation import createMaterialCostModel
+from cura.ShapeArray import ShapeArray
+from cura.SliceableObjectDecorator import SliceableObjectDecorator
+from cura.Settings.CuraStackBuilder import CuraStackBuilder
+
+
+##  Raised when a batch job can't be sliced.
+class BatchJobError(Exception):
+    pass
+
+
+##  Read the list of jobs to slice from a JSON file.
+#
+#   The file contains a list of jobs. Each job is a dictionary with:
+#   - "models": A list of model files to put on the build plate together.
+#   - "output": The g-code file to write.
+#   - "machine": The ID or name of a printer that was added to Cura, or the ID
+#     of a machine definition to add a printer for.
+#   - "material" (optional): The ID of the material to use.
+#   - "quality" (optional): The ID of the quality profile to use.
+#   - "name" (optional): The name of the job in the report. The default is
+#     the name of the output file.
+#   Relative paths are relative to the directory of the job file.
+#
+#   \param file_name The JSON file to read.
+#   \return A list of job dictionaries, with absolute paths.
+def loadBatchJobs(file_name):
+    with open(file_name, encoding = "utf-8") as f:
+        jobs = json.load(f)
+    if not isinstance(jobs, list):
+        raise BatchJobError("{file_name} must contain a list of jobs".format(file_name = file_name))
+
+    base_directory = os.path.dirname(os.path.abspath(file_name))
+    result = []
+    for index, job in enumerate(jobs):
+        for key in ("models", "output", "machine"):
+            if key not in job:
+                raise BatchJobError("Job {index} in {file_name} has no {key}".format(index = index, file_name = file_name, key = key))
+        job = dict(job)
+        job["models"] = [os.path.join(base_directory, model) for model in job["models"]]
+        job["output"] = os.path.join(base_directory, job["output"])
+        job.setdefault("name", os.path.basename(job["output"]))
+        result.append(job)
+    return result
+
+
+##  Format a print time in seconds like the {print_time} token in g-code.
+def formatPrintTime(seconds):
+    seconds = int(round(seconds))
+    return "{0:02d}:{1:02d}:{2:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+##  Slices a list of jobs without an interface and writes their g-code.
+#
+#   The scene and the stacks of the application are used to prepare each
+#   job, which happens on the main thread, one job at a time. Slicing happens
+#   in separate engine processes, several at the same time. While the engines
+#   slice, the next jobs are prepared.
+#
+#   The active printer, material and quality of the application are changed
+#   by the jobs, just like choosing them in the interface would.
+class BatchSlicer:
+    ##  \param jobs The jobs, as returned by loadBatchJobs().
+    #   \param worker_count How many engine processes to slice with at the
+    #   same time.
+    #   \param report_file (Optional) The JSON file to write the report to.
+    def __init__(self, jobs, worker_count = 1, report_file = None):
+        self._jobs = jobs
+        self._worker_count = max(worker_count, 1)
+        self._report_file = report_file
+        self._report = []
+        self._engines = []
+
+    ##  Slice all jobs.
+    #
+    #   This blocks until all jobs are done.
+    #   \return Whether all jobs were sliced successfully.
+    def run(self):
+        start_time = time.time()
+        application = Application.getInstance()
+        backend = application.getBackend()
+        backend.disableTimer()  # The scene is changed for every job. Don't slice it in the background as well.
+
+        idle_engines = []
+        running = {}  # For each slice that is running: the engine that slices it.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = self._worker_count)
+        try:
+            for job in self._jobs:
+                while not idle_engines:
+                    if len(self._engines) < self._worker_count:  # Not started yet, or replacing one that crashed.
+                        engine = self._startEngine(backend)
+                        if engine is None:
+                            break
+                        idle_engines.append(engine)
+                    else:  # All engines are slicing. The one that finishes first could have crashed, so check again.
+                        self._collectFinished(running, idle_engines, concurrent.futures.FIRST_COMPLETED)
+                if not idle_engines:  # Could not start an engine.
+                    break
+
+                engine = idle_engines.pop()
+                entry = {"name": job["name"], "output": job["output"], "success": False}
+                self._report.append(entry)
+                try:
+                    slice_message, material_cost_model = self._prepareJob(job, engine, backend, entry)
+                except Exception as e:
+                    Logger.logException("w", "Could not prepare batch job %s", job["name"])
+                    entry["error"] = str(e)
+                    idle_engines.append(engine)
+                    continue
+                future = executor.submit(self._sliceJob, job, engine, slice_message, material_cost_model, entry)
+                running[future] = engine
+
+            self._collectFinished(running, idle_engines, concurrent.futures.ALL_COMPLETED)
+        finally:
+            executor.shutdown()
+            for engine in self._engines:
+                engine.close()
+
+        total_time = time.time() - start_time
+        success_count = sum(1 for entry in self._report if entry["success"])
+        Logger.log("i", "Sliced %d of %d batch jobs in %.3f s with %d engines", success_count, len(self._jobs), total_time, len(self._engines))
+        if self._report_file:
+            with open(self._report_file, "w", encoding = "utf-8") as f:
+                json.dump({"workers": self._worker_count, "total_time": total_time, "jobs": self._report}, f, indent = 4)
+        return success_count == len(self._jobs)
+
+    ##  Get a report entry for each job that was started.
+    def getReport(self):
+        return self._report
+
+    def _startEngine(self, backend):
+        try:
+            engine = backend.createEngineProcess()
+        except Exception as e:
+            Logger.logException("e", "Could not start an engine for batch slicing")
+            for job in self._jobs[len(self._report):]:
+                self._report.append({"name": job["name"], "output": job["output"], "success": False, "error": str(e)})
+            return None
+        self._engines.append(engine)
+        return engine
+
+    ##  Wait for slices to finish, and make their engines available again.
+    def _collectFinished(self, running, idle_engines, return_when):
+        if not running:
+            return
+        done, _ = concurrent.futures.wait(list(running), return_when = return_when)
+        for future in done:
+            engine = running.pop(future)
+            future.result()  # _sliceJob catches its own errors, so this only re-raises bugs.
+            if engine.isAlive():
+                idle_engines.append(engine)
+            else:  # Crashed. A new engine is started for the next job.
+                engine.close()
+                self._engines.remove(engine)
+
+    ##  Put the models of a job on the build plate with the right stacks, and
+    #   build the slice message for it.
+    #
+    #   This must be called on the main thread.
+    #   \return The slice message and the MaterialCostModel of the job.
+    def _prepareJob(self, job, engine, backend, entry):
+        start_time = time.time()
+        self._activateStacks(job)
+        self._loadModels(job["models"])
+        Application.getInstance().getBuildVolume().updateNodeBoundaryCheck()
+
+        slice_message = engine.createSliceMessage()
+        result, slice_hash = backend.buildSliceMessage(slice_message)
+        entry["prepare_time"] = time.time() - start_time
+        if result != 1:  # StartJobResult.Finished
+            raise BatchJobError("Could not build the slice message, result {result}".format(result = result))
+        entry["slice_hash"] = slice_hash
+        return slice_message, createMaterialCostModel(Application.getInstance().getGlobalContainerStack())
+
+    ##  Slice a prepared job and write its g-code.
+    #
+    #   This runs on a worker thread.
+    def _sliceJob(self, job, engine, slice_message, material_cost_model, entry):
+        try:
+            start_time = time.time()
+            result = engine.slice(slice_message)
+            entry["slice_time"] = time.time() - start_time
+
+            start_time = time.time()
+            print_time = sum(result.print_times.values())
+            material_estimate = material_cost_model.estimate(result.material_amounts)
+            self._writeGCode(job, result, print_time, material_estimate)
+            entry["write_time"] = time.time() - start_time
+
+            entry["total_time"] = entry["prepare_time"] + entry["slice_time"] + entry["write_time"]
+            entry["print_time"] = print_time
+            entry["material_amounts"] = result.material_amounts
+            entry["material_lengths"] = material_estimate.lengths
+            entry["material_weights"] = material_estimate.weights
+            entry["material_costs"] = material_estimate.costs
+            entry["success"] = True
+            Logger.log("d", "Batch job %s sliced in %.3f s on thread %s", job["name"], entry["slice_time"], threading.current_thread().name)
+        except Exception as e:
+            Logger.logException("w", "Could not slice batch job %s", job["name"])
+            entry["error"] = str(e)
+
+    def _writeGCode(self, job, result, print_time, material_estimate):
+        replacements = {
+            "{print_time}": formatPrintTime(print_time),
+            "{filament_amount}": str(material_estimate.lengths),
+            "{filament_weight}": str(material_estimate.weights),
+            "{filament_cost}": str(material_estimate.costs),
+            "{jobname}": os.path.splitext(os.path.basename(job["output"]))[0]
+        }
+        os.makedirs(os.path.dirname(job["output"]), exist_ok = True)
+        with open(job["output"], "w", encoding = "utf-8") as f:
+            for gcode in result.gcode_list:
+                for token, value in replacements.items():
+                    gcode = gcode.replace(token, value)
+                f.write(gcode)
+
+    ##  Make the printer, material and quality of a job active.
+    def _activateStacks(self, job):
+        application = Application.getInstance()
+        machine_manager = application.getMachineManager()
+        registry = ContainerRegistry.getInstance()
+
+        machine = job["machine"]
+        stacks = registry.findContainerStacks(id = machine, type = "machine") or registry.findContainerStacks(name = machine, type = "machine")
+        if not stacks:
+            if not registry.findDefinitionContainersMetadata(id = machine):
+                raise BatchJobError("There is no printer or machine definition {machine}".format(machine = machine))
+            global_stack = CuraStackBuilder.createMachine(machine, machine)
+            if global_stack is None:
+                raise BatchJobError("Could not add a printer for {machine}".format(machine = machine))
+            stacks = [global_stack]
+        if application.getGlobalContainerStack() is not stacks[0]:
+            machine_manager.setActiveMachine(stacks[0].getId())
+
+        if "material" in job:
+            if not registry.findInstanceContainersMetadata(id = job["material"], type = "material"):
+                raise BatchJobError("There is no material {material}".format(material = job["material"]))
+            machine_manager.setActiveMaterial(job["material"])
+        if "quality" in job:
+            if not registry.findInstanceContainersMetadata(id = job["quality"]):
+                raise BatchJobError("There is no quality profile {quality}".format(quality = job["quality"]))
+            machine_manager.setActiveQuality(job["quality"])
+
+    ##  Replace the models on the build plate with those of a job, and arrange
+    #   them.
+    def _loadModels(self, file_names):
+        application = Application.getInstance()
+        scene = application.getController().getScene()
+        root = scene.getRoot()
+        with scene.getSceneLock():
+            for node in list(root.getChildren()):
+                if node.callDecoration("isSliceable") or node.callDecoration("isGroup"):
+                    root.removeChild(node)
+
+        mesh_file_handler = application.getMeshFileHandler()
+        arranger = Arrange.create(scene_root = root)
+        for file_name in file_names:
+            reader = mesh_file_handler.getReaderForFile(file_name)
+            if reader is None:
+                raise BatchJobError("No reader for {file_name}".format(file_name = file_name))
+            nodes = mesh_file_handler.readerRead(reader, file_name)
+            if nodes is None:
+                raise BatchJobError("Could not read {file_name}".format(file_name = file_name))
+            if not isinstance(nodes, list):
+                nodes = [nodes]
+
+            for node in nodes:
+                if type(node) is not SceneNode and not node.callDecoration("isGroup"):
+                    continue
+                node.setName(os.path.basename(file_name))
+                node.addDecorator(SliceableObjectDecorator())
+                if not node.getDecorator(ConvexHullDecorator):
+                    node.addDecorator(ConvexHullDecorator())
+                for child in node.getAllChildren():
+                    if not child.getDecorator(ConvexHullDecorator):
+                        child.addDecorator(ConvexHullDecorator())
+
+                offset_shape_arr, hull_shape_arr = ShapeArray.fromNode(node, min_offset = 8)
+                if offset_shape_arr is not None or hull_shape_arr is not None:
+                    node, _ = arranger.findNodePlacement(node, offset_shape_arr, hull_shape_arr, step = 10)
+                root.addChild(node)
+        scene.sceneChanged.emit(root)
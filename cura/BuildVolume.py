@@ -1,6 +1,7 @@
 # Copyright (c) 2017 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+from cura.HullGrid import HullGrid
 from cura.Settings.ExtruderManager import ExtruderManager
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.i18n import i18nCatalog
@@ -24,6 +25,7 @@ catalog = i18nCatalog("cura")
 
 import numpy
 import math
+import weakref
 
 from typing import List
 
@@ -60,8 +62,13 @@ class BuildVolume(SceneNode):
         self._grid_shader = None
 
         self._disallowed_areas = []
+        self._disallowed_area_grid = None  # Grid of the disallowed areas, for quickly finding the areas near a node. Built when needed.
         self._disallowed_area_mesh = None
 
+        # For each node the convex hull and disallowed area grid it was last checked with, and whether it overlapped.
+        # If neither changed, the node doesn't need to be checked against the disallowed areas again.
+        self._disallowed_area_checks = weakref.WeakKeyDictionary()
+
         self._error_areas = []
         self._error_mesh = None
 
@@ -169,6 +176,7 @@ class BuildVolume(SceneNode):
 
     def setDisallowedAreas(self, areas: List[Polygon]):
         self._disallowed_areas = areas
+        self._disallowed_area_grid = None
 
     def render(self, renderer):
         if not self.getMeshData():
@@ -228,19 +236,42 @@ class BuildVolume(SceneNode):
                 if convex_hull:
                     if not convex_hull.isValid():
                         return
-                    # Check for collisions between disallowed areas and the object
-                    for area in self.getDisallowedAreas():
-                        overlap = convex_hull.intersectsPolygon(area)
-                        if overlap is None:
-                            continue
-                        node._outside_buildarea = True
-                        continue
+                    node._outside_buildarea = self._intersectsDisallowedAreas(node, convex_hull)
 
         # Group nodes should override the _outside_buildarea property of their children.
         for group_node in group_nodes:
             for child_node in group_node.getAllChildren():
                 child_node._outside_buildarea = group_node._outside_buildarea
 
+    ##  Check whether the convex hull of a node overlaps with any disallowed
+    #   area.
+    #
+    #   Only the areas whose bounding boxes overlap with that of the hull are
+    #   checked exactly. The result is remembered until the hull or the
+    #   disallowed areas change, so nodes that didn't move are not checked
+    #   again.
+    def _intersectsDisallowedAreas(self, node: SceneNode, convex_hull: Polygon) -> bool:
+        if self._disallowed_area_grid is None:
+            self._disallowed_area_grid = HullGrid()
+            for area in self._disallowed_areas:
+                bounds = HullGrid.getPolygonBounds(area)
+                if bounds is not None:
+                    self._disallowed_area_grid.add(area, bounds)
+            self._disallowed_area_grid.build()
+        grid = self._disallowed_area_grid
+
+        cached = self._disallowed_area_checks.get(node)
+        if cached is not None and cached[0] is convex_hull and cached[1] is grid:
+            return cached[2]
+
+        result = False
+        for area in grid.findNear(HullGrid.getPolygonBounds(convex_hull)):
+            if convex_hull.intersectsPolygon(area) is not None:
+                result = True
+                break
+        self._disallowed_area_checks[node] = (convex_hull, grid, result)
+        return result
+
     ##  Recalculates the build volume & disallowed areas.
     def rebuild(self):
         if not self._width or not self._height or not self._depth:
@@ -673,6 +704,7 @@ class BuildVolume(SceneNode):
         self._disallowed_areas = []
         for extruder_id in result_areas:
             self._disallowed_areas.extend(result_areas[extruder_id])
+        self._disallowed_area_grid = None
 
     ##  Computes the disallowed areas for objects that are printed with print
     #   features.
@@ -6,6 +6,8 @@ from UM.Math.Polygon import Polygon
 from UM.Scene.SceneNodeDecorator import SceneNodeDecorator
 from UM.Settings.ContainerRegistry import ContainerRegistry
 
+from cura.ConvexHullService import ConvexHullService
+from cura.ConvexHullSnapshot import ConvexHullSnapshot, addAdhesionMargin, getObjectConvexHull, offsetHull
 from cura.Settings.ExtruderManager import ExtruderManager
 from . import ConvexHullNode
 
@@ -20,18 +22,15 @@ class ConvexHullDecorator(SceneNodeDecorator):
         self._convex_hull_node = None
         self._init2DConvexHullCache()
 
-        self._global_stack = None
+        # The per-object settings stack of the node, if any. Its changes are not seen by the ConvexHullService.
+        self._per_object_stack = None
+        self._per_object_stack_revision = 0  # Increased on every change of a per-object setting value.
 
-        self._raft_thickness = 0.0
         # For raft thickness, DRY
         self._build_volume = Application.getInstance().getBuildVolume()
-        self._build_volume.raftThicknessChanged.connect(self._onChanged)
 
-        Application.getInstance().globalContainerStackChanged.connect(self._onGlobalStackChanged)
-        Application.getInstance().getController().toolOperationStarted.connect(self._onChanged)
-        Application.getInstance().getController().toolOperationStopped.connect(self._onChanged)
-
-        self._onGlobalStackChanged()
+        # Changes to the settings, the tools and the build volume are handled by the service for all nodes at once.
+        ConvexHullService.getInstance().addDecorator(self)
 
     def setNode(self, node):
         previous_node = self._node
@@ -39,12 +38,15 @@ class ConvexHullDecorator(SceneNodeDecorator):
         if previous_node is not None and node is not previous_node:
             previous_node.transformationChanged.disconnect(self._onChanged)
             previous_node.parentChanged.disconnect(self._onChanged)
+            previous_node.decoratorsChanged.disconnect(self._updatePerObjectStack)
 
         super().setNode(node)
 
         self._node.transformationChanged.connect(self._onChanged)
         self._node.parentChanged.connect(self._onChanged)
+        self._node.decoratorsChanged.connect(self._updatePerObjectStack)  # The per-object stack can be added or replaced later.
 
+        self._updatePerObjectStack()
         self._onChanged()
 
     ## Force that a new (empty) object is created upon copy.
@@ -58,13 +60,37 @@ class ConvexHullDecorator(SceneNodeDecorator):
 
         hull = self._compute2DConvexHull()
 
-        if self._global_stack and self._node:
-            # Parent can be None if node is just loaded.
-            if self._global_stack.getProperty("print_sequence", "value") == "one_at_a_time" and (self._node.getParent() is None or not self._node.getParent().callDecoration("isGroup")):
-                hull = hull.getMinkowskiHull(Polygon(numpy.array(self._global_stack.getProperty("machine_head_polygon", "value"), numpy.float32)))
-                hull = self._add2DAdhesionMargin(hull)
+        if self._isPrintedOneAtATime():
+            hull = self._getDerivedHull("head", hull, self._computeHeadHull)
         return hull
 
+    ##  Copy everything that is needed to compute the convex hull of the node,
+    #   so that it can be computed on another thread.
+    #
+    #   This must be called on the main thread.
+    #   \return A ConvexHullSnapshot, or None if the decorator has no node.
+    def createConvexHullSnapshot(self):
+        if self._node is None:
+            return None
+
+        mesh = None
+        world_transform_data = None
+        children = None
+        if self._node.callDecoration("isGroup"):
+            children = [child.callDecoration("createConvexHullSnapshot") for child in self._node.getChildren()]
+            children = [child for child in children if child is not None]
+        else:
+            mesh = self._node.getMeshData()
+            if mesh:
+                world_transform_data = numpy.array(self._node.getWorldTransformation().getData())  # Copy, since the node may be moved while the hull is computed.
+
+        head_polygon = None
+        adhesion_margin = 0
+        if self._isPrintedOneAtATime():
+            head_polygon = numpy.array(self._global_stack.getProperty("machine_head_polygon", "value"), numpy.float32)
+            adhesion_margin = self._getAdhesionMargin()
+        return ConvexHullSnapshot(mesh, world_transform_data, children, self._getHullOffset(), head_polygon, adhesion_margin)
+
     ##  Get the convex hull of the node with the full head size
     def getConvexHullHeadFull(self):
         if self._node is None:
@@ -79,11 +105,8 @@ class ConvexHullDecorator(SceneNodeDecorator):
         if self._node is None:
             return None
 
-        if self._global_stack:
-            if self._global_stack.getProperty("print_sequence", "value") == "one_at_a_time" and (self._node.getParent() is None or not self._node.getParent().callDecoration("isGroup")):
-                head_with_fans = self._compute2DConvexHeadMin()
-                head_with_fans_with_adhesion_margin = self._add2DAdhesionMargin(head_with_fans)
-                return head_with_fans_with_adhesion_margin
+        if self._isPrintedOneAtATime():
+            return self._getDerivedHull("head_min", self._compute2DConvexHull(), self._computeHeadMinHull)
         return None
 
     ##  Get convex hull of the node
@@ -93,46 +116,54 @@ class ConvexHullDecorator(SceneNodeDecorator):
         if self._node is None:
             return None
 
-        if self._global_stack:
-            if self._global_stack.getProperty("print_sequence", "value") == "one_at_a_time" and (self._node.getParent() is None or not self._node.getParent().callDecoration("isGroup")):
-                # Printing one at a time and it's not an object in a group
-                return self._compute2DConvexHull()
+        if self._isPrintedOneAtATime():
+            # Printing one at a time and it's not an object in a group
+            return self._compute2DConvexHull()
         return None
 
+    ##  Compute the convex hull right away and show it.
+    #
+    #   Normally the ConvexHullService does this in the background.
     def recomputeConvexHull(self):
+        self.showConvexHull(self.getConvexHull())
+
+    ##  Show a convex hull in the scene for this node, replacing the previous
+    #   one.
+    #
+    #   Nothing is shown if a tool is in use or if the node is not in the scene.
+    #
+    #   \param convex_hull The hull to show, or None to only remove the
+    #   previous one.
+    def showConvexHull(self, convex_hull):
         controller = Application.getInstance().getController()
         root = controller.getScene().getRoot()
-        if self._node is None or controller.isToolOperationActive() or not self.__isDescendant(root, self._node):
+        if convex_hull is None or self._node is None or controller.isToolOperationActive() or not self.__isDescendant(root, self._node):
             if self._convex_hull_node:
                 self._convex_hull_node.setParent(None)
                 self._convex_hull_node = None
             return
 
-        convex_hull = self.getConvexHull()
         if self._convex_hull_node:
             self._convex_hull_node.setParent(None)
-        hull_node = ConvexHullNode.ConvexHullNode(self._node, convex_hull, self._raft_thickness, root)
+        hull_node = ConvexHullNode.ConvexHullNode(self._node, convex_hull, self._build_volume.getRaftThickness(), root)
         self._convex_hull_node = hull_node
 
-    def _onSettingValueChanged(self, key, property_name):
-        if property_name != "value": #Not the value that was changed.
-            return
-
-        if key in self._affected_settings:
-            self._onChanged()
-        if key in self._influencing_settings:
-            self._init2DConvexHullCache() #Invalidate the cache.
-            self._onChanged()
+    ##  Forget the cached convex hull, e.g. because the settings that
+    #   influence it changed.
+    def invalidateCache(self):
+        self._init2DConvexHullCache()
 
     def _init2DConvexHullCache(self):
-        # Cache for the group code path in _compute2DConvexHull()
-        self._2d_convex_hull_group_child_polygon = None
-        self._2d_convex_hull_group_result = None
+        # Cache for the group code path in _compute2DConvexHull(): (child polygon, result).
+        # Cache entries are replaced as a whole, since the hulls may be computed in a background job.
+        self._2d_convex_hull_group_cache = (None, None)
 
-        # Cache for the mesh code path in _compute2DConvexHull()
-        self._2d_convex_hull_mesh = None
-        self._2d_convex_hull_mesh_world_transform = None
-        self._2d_convex_hull_mesh_result = None
+        # Cache for the mesh code path in _compute2DConvexHull(): (mesh, world transformation, result).
+        self._2d_convex_hull_mesh_cache = (None, None, None)
+
+        # Hulls derived from the 2D convex hull with the head and adhesion settings, per kind of hull:
+        # (settings revision, 2D convex hull, result).
+        self._derived_hull_cache = {}
 
     def _compute2DConvexHull(self):
         if self._node.callDecoration("isGroup"):
@@ -147,15 +178,15 @@ class ConvexHullDecorator(SceneNodeDecorator):
             child_polygon = Polygon(points)
 
             # Check the cache
-            if child_polygon == self._2d_convex_hull_group_child_polygon:
-                return self._2d_convex_hull_group_result
+            cached_child_polygon, cached_result = self._2d_convex_hull_group_cache
+            if child_polygon == cached_child_polygon:
+                return cached_result
 
             convex_hull = child_polygon.getConvexHull() #First calculate the normal convex hull around the points.
             offset_hull = self._offsetHull(convex_hull) #Then apply the offset from the settings.
 
             # Store the result in the cache
-            self._2d_convex_hull_group_child_polygon = child_polygon
-            self._2d_convex_hull_group_result = offset_hull
+            self._2d_convex_hull_group_cache = (child_polygon, offset_hull)
 
             return offset_hull
 
@@ -168,66 +199,72 @@ class ConvexHullDecorator(SceneNodeDecorator):
                 world_transform = self._node.getWorldTransformation()
 
                 # Check the cache
-                if mesh is self._2d_convex_hull_mesh and world_transform == self._2d_convex_hull_mesh_world_transform:
-                    return self._2d_convex_hull_mesh_result
-
-                vertex_data = mesh.getConvexHullTransformedVertices(world_transform)
-                # Don't use data below 0.
-                # TODO; We need a better check for this as this gives poor results for meshes with long edges.
-                # Do not throw away vertices: the convex hull may be too small and objects can collide.
-                # vertex_data = vertex_data[vertex_data[:,1] >= -0.01]
-
-                if len(vertex_data) >= 4:
-                    # Round the vertex data to 1/10th of a mm, then remove all duplicate vertices
-                    # This is done to greatly speed up further convex hull calculations as the convex hull
-                    # becomes much less complex when dealing with highly detailed models.
-                    vertex_data = numpy.round(vertex_data, 1)
-
-                    vertex_data = vertex_data[:, [0, 2]]  # Drop the Y components to project to 2D.
-
-                    # Grab the set of unique points.
-                    #
-                    # This basically finds the unique rows in the array by treating them as opaque groups of bytes
-                    # which are as long as the 2 float64s in each row, and giving this view to numpy.unique() to munch.
-                    # See http://stackoverflow.com/questions/16970982/find-unique-rows-in-numpy-array
-                    vertex_byte_view = numpy.ascontiguousarray(vertex_data).view(
-                        numpy.dtype((numpy.void, vertex_data.dtype.itemsize * vertex_data.shape[1])))
-                    _, idx = numpy.unique(vertex_byte_view, return_index=True)
-                    vertex_data = vertex_data[idx]  # Select the unique rows by index.
-
-                    hull = Polygon(vertex_data)
-
-                    if len(vertex_data) >= 3:
-                        convex_hull = hull.getConvexHull()
-                        offset_hull = self._offsetHull(convex_hull)
+                cached_mesh, cached_world_transform, cached_result = self._2d_convex_hull_mesh_cache
+                if mesh is cached_mesh and world_transform == cached_world_transform:
+                    return cached_result
+
+                convex_hull = getObjectConvexHull(mesh, world_transform.getData())
+                if convex_hull is not None:
+                    # The hull is shared by all nodes with this mesh, rotation and scale. Move it to where this node is.
+                    translation = world_transform.getData()[[0, 2], 3]
+                    offset_hull = self._offsetHull(convex_hull.translate(translation[0], translation[1]))
             else:
                 return Polygon([])  # Node has no mesh data, so just return an empty Polygon.
 
             # Store the result in the cache
-            self._2d_convex_hull_mesh = mesh
-            self._2d_convex_hull_mesh_world_transform = world_transform
-            self._2d_convex_hull_mesh_result = offset_hull
+            self._2d_convex_hull_mesh_cache = (mesh, world_transform, offset_hull)
 
             return offset_hull
 
+    ##  Get a hull derived from the 2D convex hull, computing it only if the
+    #   convex hull or any setting changed since the last time.
+    #
+    #   \param kind A name for the kind of derived hull.
+    #   \param convex_hull The 2D convex hull to derive from.
+    #   \param compute Function that computes the derived hull from the 2D
+    #   convex hull.
+    def _getDerivedHull(self, kind, convex_hull, compute):
+        settings_revision = (ConvexHullService.getInstance().getSettingsRevision(), self._per_object_stack_revision)
+        cached_revision, cached_convex_hull, cached_result = self._derived_hull_cache.get(kind, (None, None, None))
+        if cached_revision == settings_revision and cached_convex_hull is convex_hull and convex_hull is not None:
+            return cached_result
+
+        result = compute(convex_hull)
+        self._derived_hull_cache[kind] = (settings_revision, convex_hull, result)
+        return result
+
+    def _computeHeadHull(self, convex_hull):
+        hull = convex_hull.getMinkowskiHull(Polygon(numpy.array(self._global_stack.getProperty("machine_head_polygon", "value"), numpy.float32)))
+        return self._add2DAdhesionMargin(hull)
+
+    def _computeHeadMinHull(self, convex_hull):
+        head_with_fans = self._compute2DConvexHeadMin(convex_hull)
+        return self._add2DAdhesionMargin(head_with_fans)
+
     def _getHeadAndFans(self):
         return Polygon(numpy.array(self._global_stack.getProperty("machine_head_with_fans_polygon", "value"), numpy.float32))
 
     def _compute2DConvexHeadFull(self):
-        return self._compute2DConvexHull().getMinkowskiHull(self._getHeadAndFans())
+        return self._getDerivedHull("head_full", self._compute2DConvexHull(), lambda convex_hull: convex_hull.getMinkowskiHull(self._getHeadAndFans()))
 
-    def _compute2DConvexHeadMin(self):
+    def _compute2DConvexHeadMin(self, convex_hull = None):
+        if convex_hull is None:
+            convex_hull = self._compute2DConvexHull()
         headAndFans = self._getHeadAndFans()
         mirrored = headAndFans.mirror([0, 0], [0, 1]).mirror([0, 0], [1, 0])  # Mirror horizontally & vertically.
         head_and_fans = self._getHeadAndFans().intersectionConvexHulls(mirrored)
 
         # Min head hull is used for the push free
-        min_head_hull = self._compute2DConvexHull().getMinkowskiHull(head_and_fans)
+        min_head_hull = convex_hull.getMinkowskiHull(head_and_fans)
         return min_head_hull
 
     ##  Compensate given 2D polygon with adhesion margin
     #   \return 2D polygon with added margin
     def _add2DAdhesionMargin(self, poly):
+        return addAdhesionMargin(poly, self._getAdhesionMargin())
+
+    ##  Get the margin of the raft, brim or skirt around the head hull.
+    def _getAdhesionMargin(self):
         # Compensate for raft/skirt/brim
         # Add extra margin depending on adhesion type
         adhesion_type = self._global_stack.getProperty("adhesion_type", "value")
@@ -244,12 +281,7 @@ class ConvexHullDecorator(SceneNodeDecorator):
                    self._getSettingProperty("skirt_line_count", "value") * self._getSettingProperty("skirt_brim_line_width", "value"))
         else:
             raise Exception("Unknown bed adhesion type. Did you forget to update the convex hull calculations for your new bed adhesion type?")
-
-        # adjust head_and_fans with extra margin
-        if extra_margin > 0:
-            extra_margin_polygon = Polygon.approximatedCircle(extra_margin)
-            poly = poly.getMinkowskiHull(extra_margin_polygon)
-        return poly
+        return extra_margin
 
     ##  Offset the convex hull with settings that influence the collision area.
     #
@@ -257,6 +289,11 @@ class ConvexHullDecorator(SceneNodeDecorator):
     #   \return New Polygon instance that is offset with everything that
     #   influences the collision area.
     def _offsetHull(self, convex_hull):
+        return offsetHull(convex_hull, self._getHullOffset())
+
+    ##  Get how far the hull must be offset for the horizontal expansion and
+    #   the mold.
+    def _getHullOffset(self):
         horizontal_expansion = max(
             self._getSettingProperty("xy_offset", "value"),
             self._getSettingProperty("xy_offset_layer_0", "value")
@@ -265,41 +302,43 @@ class ConvexHullDecorator(SceneNodeDecorator):
         mold_width = 0
         if self._getSettingProperty("mold_enabled", "value"):
             mold_width = self._getSettingProperty("mold_width", "value")
-        hull_offset = horizontal_expansion + mold_width
-        if hull_offset > 0: #TODO: Implement Minkowski subtraction for if the offset < 0.
-            expansion_polygon = Polygon(numpy.array([
-                [-hull_offset, -hull_offset],
-                [-hull_offset, hull_offset],
-                [hull_offset, hull_offset],
-                [hull_offset, -hull_offset]
-            ], numpy.float32))
-            return convex_hull.getMinkowskiHull(expansion_polygon)
-        else:
-            return convex_hull
+        return horizontal_expansion + mold_width
 
     def _onChanged(self, *args):
-        self._raft_thickness = self._build_volume.getRaftThickness()
-        self.recomputeConvexHull()
+        ConvexHullService.getInstance().invalidate(self)
 
-    def _onGlobalStackChanged(self):
-        if self._global_stack:
-            self._global_stack.propertyChanged.disconnect(self._onSettingValueChanged)
-            self._global_stack.containersChanged.disconnect(self._onChanged)
-            extruders = ExtruderManager.getInstance().getMachineExtruders(self._global_stack.getId())
-            for extruder in extruders:
-                extruder.propertyChanged.disconnect(self._onSettingValueChanged)
+    ##  Follow the setting changes of the per-object stack of the node.
+    def _updatePerObjectStack(self, *args):
+        stack = self._node.callDecoration("getStack") if self._node is not None else None
+        if stack is self._per_object_stack:
+            return
 
-        self._global_stack = Application.getInstance().getGlobalContainerStack()
+        if self._per_object_stack is not None:
+            self._per_object_stack.propertyChanged.disconnect(self._onPerObjectSettingChanged)
+        self._per_object_stack = stack
+        if self._per_object_stack is not None:
+            self._per_object_stack.propertyChanged.connect(self._onPerObjectSettingChanged)
+        self._onPerObjectSettingChanged(None, "value")  # Different stack, so the settings may differ.
 
-        if self._global_stack:
-            self._global_stack.propertyChanged.connect(self._onSettingValueChanged)
-            self._global_stack.containersChanged.connect(self._onChanged)
+    def _onPerObjectSettingChanged(self, key, property_name):
+        if property_name != "value":
+            return
+        # Per-object settings change rarely, so just forget all cached hulls instead of checking which ones depend on the setting.
+        self._per_object_stack_revision += 1
+        self._init2DConvexHullCache()
+        self._onChanged()
 
-            extruders = ExtruderManager.getInstance().getMachineExtruders(self._global_stack.getId())
-            for extruder in extruders:
-                extruder.propertyChanged.connect(self._onSettingValueChanged)
+    ##  Whether the node is printed one at a time, so its hull includes the
+    #   head. Nodes in a group are printed together with their group.
+    def _isPrintedOneAtATime(self):
+        if not self._global_stack or self._global_stack.getProperty("print_sequence", "value") != "one_at_a_time":
+            return False
+        # Parent can be None if node is just loaded.
+        return self._node.getParent() is None or not self._node.getParent().callDecoration("isGroup")
 
-            self._onChanged()
+    @property
+    def _global_stack(self):
+        return Application.getInstance().getGlobalContainerStack()
 
     ##   Private convenience function to get a setting from the correct extruder (as defined by limit_to_extruder property).
     def _getSettingProperty(self, setting_key, prop = "value"):
@@ -327,12 +366,3 @@ class ConvexHullDecorator(SceneNodeDecorator):
         if root is node:
             return True
         return self.__isDescendant(root, node.getParent())
-
-    _affected_settings = [
-        "adhesion_type", "raft_margin", "print_sequence",
-        "skirt_gap", "skirt_line_count", "skirt_brim_line_width", "skirt_distance", "brim_line_count"]
-
-    ##  Settings that change the convex hull.
-    #
-    #   If these settings change, the convex hull should be recalculated.
-    _influencing_settings = {"xy_offset", "xy_offset_layer_0", "mold_enabled", "mold_width"}
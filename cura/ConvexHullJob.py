@@ -0,0 +1,36 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from UM.Job import Job
+from UM.Logger import Logger
+
+
+##  Computes the convex hulls of a batch of nodes in the background.
+#
+#   The job only gets snapshots of the nodes and their settings, made on the
+#   main thread, so it never reads nodes or stacks while they change. Showing
+#   the hulls in the scene is left to the ConvexHullService, on the main
+#   thread, when the job is finished.
+class ConvexHullJob(Job):
+    ##  Create a job to compute the convex hulls of nodes.
+    #
+    #   \param snapshots A list of (decorator, snapshot) tuples, with the
+    #   convex hull decorator of each node and a ConvexHullSnapshot of it.
+    def __init__(self, snapshots):
+        super().__init__()
+        self._snapshots = snapshots
+
+    ##  Compute the hulls.
+    #
+    #   The result is a list of (decorator, hull) tuples.
+    def run(self):
+        result = []
+        for decorator, snapshot in self._snapshots:
+            try:
+                hull = snapshot.computeConvexHull()
+            except Exception:
+                Logger.logException("w", "Failed to compute the convex hull of a node.")
+                continue
+            result.append((decorator, hull))
+            Job.yieldThread()
+        self.setResult(result)
@@ -0,0 +1,199 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading
+import weakref
+
+from PyQt5.QtCore import QTimer
+
+from UM.Application import Application
+from UM.Logger import Logger
+
+from cura.ConvexHullJob import ConvexHullJob
+from cura.Settings.ExtruderManager import ExtruderManager
+
+
+##  Keeps the convex hulls of all nodes up to date.
+#
+#   Instead of every ConvexHullDecorator listening to the global stack, the
+#   extruders and the tools, and recomputing its hull right away, this service
+#   listens once and marks the hulls as out of date. The out of date hulls are
+#   collected for a short while and then computed together in a background job.
+#   When the job is done, all new hulls are shown at once.
+#
+#   The service lives on the main thread. Decorators are also created and
+#   changed on other threads, e.g. when nodes are copied or arranged in a job.
+#   Those calls are passed on to the main thread.
+class ConvexHullService:
+    ##  Get the singleton instance for this class.
+    @classmethod
+    def getInstance(cls) -> "ConvexHullService":
+        # Note: Explicit use of class name to prevent issues with inheritance.
+        if not ConvexHullService.__instance:
+            ConvexHullService.__instance = cls()
+        return ConvexHullService.__instance
+
+    __instance = None   # type: "ConvexHullService"
+
+    def __init__(self):
+        self._decorators = weakref.WeakSet()  # All convex hull decorators.
+        self._dirty_decorators = weakref.WeakSet()  # Decorators whose hulls need to be recomputed.
+        self._job = None
+
+        # Collect changes for a bit, so that changing many settings or moving many nodes only computes the hulls once.
+        self._update_timer = QTimer()
+        self._update_timer.setInterval(20)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.timeout.connect(self._startUpdate)
+
+        # Increased on every change of a setting value, so that results derived from settings can be memoized.
+        self._settings_revision = 0
+
+        self._global_stack = None
+        self._extruders = []
+
+        application = Application.getInstance()
+        application.globalContainerStackChanged.connect(self._onGlobalStackChanged)
+        application.getController().toolOperationStarted.connect(self._onToolOperationStarted)
+        application.getController().toolOperationStopped.connect(self.invalidateAll)
+        application.getBuildVolume().raftThicknessChanged.connect(self.invalidateAll)
+        self._onGlobalStackChanged()
+
+    ##  Start keeping the hull of a decorator up to date.
+    #
+    #   This may be called from any thread.
+    def addDecorator(self, decorator):
+        self._callOnMainThread(self._decorators.add, decorator)
+
+    ##  Mark the hull of a decorator as out of date.
+    #
+    #   This may be called from any thread.
+    def invalidate(self, decorator):
+        self._callOnMainThread(self._invalidate, decorator)
+
+    ##  Mark the hulls of all decorators as out of date.
+    #
+    #   This may be called from any thread.
+    def invalidateAll(self, *args):
+        self._callOnMainThread(self._invalidateAll)
+
+    def _invalidate(self, decorator):
+        self._dirty_decorators.add(decorator)
+        self._update_timer.start()
+
+    def _invalidateAll(self):
+        for decorator in list(self._decorators):
+            self._dirty_decorators.add(decorator)
+        self._update_timer.start()
+
+    ##  Call a function right away on the main thread, or later on the main
+    #   thread when called from another thread. The sets of decorators and the
+    #   timer may only be used on the main thread.
+    def _callOnMainThread(self, function, *args):
+        if threading.current_thread() is threading.main_thread():
+            function(*args)
+        else:
+            Application.getInstance().callLater(function, *args)
+
+    ##  Get a number that changes whenever any setting value changes.
+    #
+    #   Results computed from the settings remain valid as long as this number
+    #   stays the same.
+    def getSettingsRevision(self) -> int:
+        return self._settings_revision
+
+    def _onToolOperationStarted(self, tool):
+        # Hulls are hidden while a tool is in use. No need to wait for a batch for that.
+        for decorator in list(self._decorators):
+            decorator.showConvexHull(None)
+
+    def _onSettingValueChanged(self, key, property_name):
+        if property_name != "value":  # Not the value that was changed.
+            return
+        self._settings_revision += 1
+
+        if key in self._influencing_settings:
+            for decorator in list(self._decorators):
+                decorator.invalidateCache()
+            self.invalidateAll()
+        elif key in self._affected_settings:
+            self.invalidateAll()
+
+    def _onGlobalStackChanged(self):
+        if self._global_stack:
+            self._global_stack.propertyChanged.disconnect(self._onSettingValueChanged)
+            self._global_stack.containersChanged.disconnect(self._onContainersChanged)
+            for extruder in self._extruders:
+                extruder.propertyChanged.disconnect(self._onSettingValueChanged)
+
+        self._global_stack = Application.getInstance().getGlobalContainerStack()
+        self._extruders = []
+        self._settings_revision += 1
+
+        if self._global_stack:
+            self._global_stack.propertyChanged.connect(self._onSettingValueChanged)
+            self._global_stack.containersChanged.connect(self._onContainersChanged)
+
+            self._extruders = list(ExtruderManager.getInstance().getMachineExtruders(self._global_stack.getId()))
+            for extruder in self._extruders:
+                extruder.propertyChanged.connect(self._onSettingValueChanged)
+
+            self.invalidateAll()
+
+    def _onContainersChanged(self, *args):
+        self._settings_revision += 1
+        self.invalidateAll()
+
+    def _startUpdate(self):
+        if self._job is not None:  # Still busy with the previous batch. Start the next one when that's done.
+            return
+
+        decorators = list(self._dirty_decorators)
+        self._dirty_decorators.clear()
+        if not decorators:
+            return
+
+        # The nodes and settings may only be read here, on the main thread. The job only gets copies.
+        snapshots = []
+        for decorator in decorators:
+            try:
+                snapshot = decorator.createConvexHullSnapshot()
+            except Exception:  # E.g. a setting that can't be evaluated. Don't let it block the other nodes.
+                Logger.logException("w", "Failed to read the convex hull settings of a node.")
+                continue
+            if snapshot is None:  # Not attached to a node (any more).
+                decorator.showConvexHull(None)
+                continue
+            snapshots.append((decorator, snapshot))
+        if not snapshots:
+            return
+
+        self._job = ConvexHullJob(snapshots)
+        self._job.finished.connect(self._onJobFinished)
+        self._job.start()
+
+    ##  Show all hulls of a batch at once.
+    def _onJobFinished(self, job):
+        if job is not self._job:
+            return
+        self._job = None
+
+        for decorator, hull in job.getResult():
+            if decorator in self._dirty_decorators:
+                continue  # Changed again while computing. It'll be shown with the next batch.
+            decorator.showConvexHull(hull)
+
+        if len(self._dirty_decorators) > 0:
+            self._update_timer.start()
+
+    ##  Settings that change how the convex hull is used.
+    #
+    #   If these settings change, the convex hulls should be shown again.
+    _affected_settings = {
+        "adhesion_type", "raft_margin", "print_sequence",
+        "skirt_gap", "skirt_line_count", "skirt_brim_line_width", "skirt_distance", "brim_line_count"}
+
+    ##  Settings that change the convex hull.
+    #
+    #   If these settings change, the convex hull should be recalculated.
+    _influencing_settings = {"xy_offset", "xy_offset_layer_0", "mold_enabled", "mold_width"}
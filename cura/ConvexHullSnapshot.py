@@ -0,0 +1,158 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading
+import weakref
+
+import numpy
+
+from UM.Math.Polygon import Polygon
+
+# For each mesh, the 2D convex hulls of that mesh per rotation and scale, without any translation.
+_object_convex_hulls = weakref.WeakKeyDictionary()
+_object_convex_hulls_lock = threading.Lock()  # Hulls are computed on the main thread and in the ConvexHullJob.
+
+
+##  Get the 2D convex hull of a mesh with a rotation and scale, but without
+#   the translation of the node.
+#
+#   Copies of a node share their mesh data. The hull is stored with the mesh,
+#   so that copies that are only moved compute it just once.
+#
+#   \param mesh The mesh data of the node.
+#   \param world_transform_data The 4x4 world transformation matrix of the
+#   node, as numpy array. Its translation is ignored.
+#   \return The convex hull, or None if the mesh is too small to have one.
+def getObjectConvexHull(mesh, world_transform_data):
+    # Only the X and Z rows of the rotation and scale are needed, since the Y component is dropped anyway.
+    linear_transform = numpy.array(world_transform_data[[0, 2], 0:3])
+    key = linear_transform.tobytes()
+    with _object_convex_hulls_lock:
+        mesh_hulls = _object_convex_hulls.setdefault(mesh, {})
+        if key in mesh_hulls:
+            return mesh_hulls[key]
+
+    convex_hull = None
+    # The 3D convex hull of the mesh is computed only once by the mesh data. Only its vertices need to be projected.
+    vertex_data = mesh.getConvexHullVertices()
+    # Don't use data below 0.
+    # TODO; We need a better check for this as this gives poor results for meshes with long edges.
+    # Do not throw away vertices: the convex hull may be too small and objects can collide.
+    # vertex_data = vertex_data[vertex_data[:,1] >= -0.01]
+
+    if vertex_data is not None and len(vertex_data) >= 4:
+        vertex_data = numpy.dot(vertex_data, linear_transform.T)  # Transform and project to 2D at once.
+
+        # Round the vertex data to 1/10th of a mm, then remove all duplicate vertices
+        # This is done to greatly speed up further convex hull calculations as the convex hull
+        # becomes much less complex when dealing with highly detailed models.
+        vertex_data = numpy.round(vertex_data, 1)
+
+        # Grab the set of unique points.
+        #
+        # This basically finds the unique rows in the array by treating them as opaque groups of bytes
+        # which are as long as the 2 float64s in each row, and giving this view to numpy.unique() to munch.
+        # See http://stackoverflow.com/questions/16970982/find-unique-rows-in-numpy-array
+        vertex_byte_view = numpy.ascontiguousarray(vertex_data).view(
+            numpy.dtype((numpy.void, vertex_data.dtype.itemsize * vertex_data.shape[1])))
+        _, idx = numpy.unique(vertex_byte_view, return_index=True)
+        vertex_data = vertex_data[idx]  # Select the unique rows by index.
+
+        if len(vertex_data) >= 3:
+            convex_hull = Polygon(vertex_data).getConvexHull()
+
+    with _object_convex_hulls_lock:
+        if len(mesh_hulls) >= 16:  # Rotating or scaling a node creates a new entry for every step.
+            mesh_hulls.clear()
+        mesh_hulls[key] = convex_hull
+    return convex_hull
+
+##  Offset a convex hull with the settings that influence the collision area.
+#
+#   \param convex_hull Polygon of the original convex hull.
+#   \param hull_offset The horizontal expansion plus the mold width.
+#   \return New Polygon instance that is offset with everything that
+#   influences the collision area.
+def offsetHull(convex_hull, hull_offset):
+    if hull_offset > 0: #TODO: Implement Minkowski subtraction for if the offset < 0.
+        expansion_polygon = Polygon(numpy.array([
+            [-hull_offset, -hull_offset],
+            [-hull_offset, hull_offset],
+            [hull_offset, hull_offset],
+            [hull_offset, -hull_offset]
+        ], numpy.float32))
+        return convex_hull.getMinkowskiHull(expansion_polygon)
+    else:
+        return convex_hull
+
+##  Compensate a 2D polygon with the margin of the build plate adhesion.
+#
+#   \param poly The polygon to add the margin to.
+#   \param extra_margin The margin of the raft, brim or skirt.
+#   \return 2D polygon with added margin
+def addAdhesionMargin(poly, extra_margin):
+    if extra_margin > 0:
+        extra_margin_polygon = Polygon.approximatedCircle(extra_margin)
+        poly = poly.getMinkowskiHull(extra_margin_polygon)
+    return poly
+
+
+##  Everything that is needed to compute the convex hull of a node, copied
+#   from the node and its settings at one moment.
+#
+#   The node, its transformation and its settings may only be used on the main
+#   thread. A snapshot is made there, after which the hull can be computed from
+#   it on any thread, even while the node changes.
+class ConvexHullSnapshot:
+    ##  \param mesh The mesh data of the node, or None if it has no mesh. Mesh
+    #   data is never changed, only replaced.
+    #   \param world_transform_data A copy of the 4x4 world transformation
+    #   matrix of the node, as numpy array.
+    #   \param children For groups, the snapshots of the children. None for
+    #   nodes that are not a group.
+    #   \param hull_offset The horizontal expansion plus the mold width.
+    #   \param head_polygon If the hull must include the print head, because
+    #   objects are printed one at a time, the points of the head polygon.
+    #   Otherwise None.
+    #   \param adhesion_margin The margin of the raft, brim or skirt around the
+    #   head hull.
+    def __init__(self, mesh, world_transform_data, children, hull_offset, head_polygon = None, adhesion_margin = 0):
+        self.mesh = mesh
+        self.world_transform_data = world_transform_data
+        self.children = children
+        self.hull_offset = hull_offset
+        self.head_polygon = head_polygon
+        self.adhesion_margin = adhesion_margin
+
+    ##  Compute the convex hull, like ConvexHullDecorator.getConvexHull().
+    def computeConvexHull(self):
+        hull = self.compute2DConvexHull()
+        if self.head_polygon is not None and hull is not None:
+            hull = hull.getMinkowskiHull(Polygon(numpy.array(self.head_polygon, numpy.float32)))
+            hull = addAdhesionMargin(hull, self.adhesion_margin)
+        return hull
+
+    ##  Compute the 2D convex hull of the node, with the offset from the
+    #   settings but without the head.
+    def compute2DConvexHull(self):
+        if self.children is not None:  # A group.
+            points = numpy.zeros((0, 2), dtype = numpy.int32)
+            for child in self.children:
+                child_hull = child.compute2DConvexHull()
+                if child_hull:
+                    points = numpy.append(points, child_hull.getPoints(), axis = 0)
+
+                if points.size < 3:
+                    return None
+            if points.size < 3:
+                return None
+            return offsetHull(Polygon(points).getConvexHull(), self.hull_offset)
+
+        if self.mesh is None:
+            return Polygon([])  # Node has no mesh data, so just return an empty Polygon.
+        convex_hull = getObjectConvexHull(self.mesh, self.world_transform_data)
+        if convex_hull is None:
+            return None
+        # The hull is shared by all nodes with this mesh, rotation and scale. Move it to where this node is.
+        translation = self.world_transform_data[[0, 2], 3]
+        return offsetHull(convex_hull.translate(translation[0], translation[1]), self.hull_offset)
@@ -72,8 +72,10 @@ from cura.Settings.ContainerSettingsModel import ContainerSettingsModel
 from cura.Settings.MaterialSettingsVisibilityHandler import MaterialSettingsVisibilityHandler
 from cura.Settings.QualitySettingsModel import QualitySettingsModel
 from cura.Settings.ContainerManager import ContainerManager
+from cura.Settings.ContainerSaveWorker import ContainerSaveWorker
 from cura.Settings.GlobalStack import GlobalStack
 from cura.Settings.ExtruderStack import ExtruderStack
+from cura.QualityManager import QualityManager
 
 from PyQt5.QtCore import QUrl, pyqtSignal, pyqtProperty, QEvent, Q_ENUMS
 from UM.FlameProfiler import pyqtSlot
@@ -88,6 +90,7 @@ import copy
 import urllib.parse
 import os
 import argparse
+import time
 import json
 
 numpy.seterr(all="ignore")
@@ -198,6 +201,8 @@ class CuraApplication(QtApplication):
 
         self._currently_loading_files = []
         self._non_sliceable_extensions = []
+        self._read_mesh_start_times = {}  # When each of the files that are being loaded started loading.
+        self._read_mesh_results = []  # (file name, nodes) of the files that were read, but not added to the scene yet.
 
         self._machine_action_manager = MachineActionManager.MachineActionManager()
         self._machine_manager = None    # This is initialized on demand.
@@ -315,6 +320,10 @@ class CuraApplication(QtApplication):
         preferences.addPreference("cura/currency", "€")
         preferences.addPreference("cura/material_settings", "{}")
 
+        # Answer quality queries from lookup tables that are rebuilt when qualities or materials change.
+        preferences.addPreference("cura/use_quality_lookup_table", True)
+        QualityManager.getInstance().followLookupTablePreference(preferences)
+
         preferences.addPreference("view/invert_zoom", False)
         preferences.addPreference("cura/sidebar_collapse", False)
 
@@ -478,6 +487,8 @@ class CuraApplication(QtApplication):
         if not self._started: # Do not do saving during application start
             return
 
+        # Files that are still being saved in the background are older than what is saved now.
+        ContainerSaveWorker.getInstance().flush()
         ContainerRegistry.getInstance().saveDirtyContainers()
 
     def saveStack(self, stack):
@@ -1335,67 +1346,108 @@ class CuraApplication(QtApplication):
         if extension in self._non_sliceable_extensions:
             self.deleteAll()
 
+        self._read_mesh_start_times[f] = time.time()
         job = ReadMeshJob(f)
         job.finished.connect(self._readMeshFinished)
         job.start()
 
+    ##  Collects the nodes of a file that was read.
+    #
+    #   The files are read in parallel by the job queue. The nodes are only
+    #   added to the scene once all files that are being loaded have been read,
+    #   so that opening many files at once is a single operation with a single
+    #   arrange pass.
     def _readMeshFinished(self, job):
         nodes = job.getResult()
         filename = job.getFileName()
         self._currently_loading_files.remove(filename)
+        Logger.log("d", "Reading %s took %.3f s", filename, time.time() - self._read_mesh_start_times.pop(filename, time.time()))
+
+        self.fileLoaded.emit(filename)
+
+        self._read_mesh_results.append((filename, nodes if nodes else []))
+        if not self._currently_loading_files:
+            self._addReadMeshResults()
 
-        root = self.getController().getScene().getRoot()
+    ##  Adds the nodes of all files that were read to the scene.
+    def _addReadMeshResults(self):
+        read_mesh_results = self._read_mesh_results
+        self._read_mesh_results = []
+
+        start_time = time.time()
+        scene = self.getController().getScene()
+        root = scene.getRoot()
         arranger = Arrange.create(scene_root = root)
         min_offset = 8
+        arrange_time = 0.0
 
-        self.fileLoaded.emit(filename)
+        op = GroupedOperation()
+        node_count = 0
+        for filename, nodes in read_mesh_results:
+            for node in nodes:
+                self._prepareReadNode(node, filename)
+                if node.callDecoration("isSliceable"):
+                    arrange_start_time = time.time()
+                    node = self._placeReadNode(node, arranger, min_offset)
+                    arrange_time += time.time() - arrange_start_time
+                    if node is None:
+                        continue
+                op.addOperation(AddSceneNodeOperation(node, root))
+                node_count += 1
+
+        if node_count == 0:
+            return
+        add_start_time = time.time()
+        op.push()
+        scene.sceneChanged.emit(root)
+        Logger.log("d", "Added %d nodes from %d files in %.3f s (arranging: %.3f s, adding to the scene: %.3f s)",
+                   node_count, len(read_mesh_results), time.time() - start_time, arrange_time, time.time() - add_start_time)
+
+    ##  Sets up the decorators of a node that was read from a file.
+    def _prepareReadNode(self, node, filename):
+        node.setSelectable(True)
+        node.setName(os.path.basename(filename))
+
+        extension = os.path.splitext(filename)[1]
+        if extension.lower() in self._non_sliceable_extensions:
+            self.getController().setActiveView("SimulationView")
+            view = self.getController().getActiveView()
+            view.resetLayerData()
+            view.setLayer(9999999)
+            view.calculateMaxLayers()
+
+            block_slicing_decorator = BlockSlicingDecorator()
+            node.addDecorator(block_slicing_decorator)
+        else:
+            sliceable_decorator = SliceableObjectDecorator()
+            node.addDecorator(sliceable_decorator)
 
-        for node in nodes:
-            node.setSelectable(True)
-            node.setName(os.path.basename(filename))
+        # If there is no convex hull for the node, start calculating it and continue.
+        if not node.getDecorator(ConvexHullDecorator):
+            node.addDecorator(ConvexHullDecorator())
+        for child in node.getAllChildren():
+            if not child.getDecorator(ConvexHullDecorator):
+                child.addDecorator(ConvexHullDecorator())
 
-            extension = os.path.splitext(filename)[1]
-            if extension.lower() in self._non_sliceable_extensions:
-                self.getController().setActiveView("SimulationView")
-                view = self.getController().getActiveView()
-                view.resetLayerData()
-                view.setLayer(9999999)
-                view.calculateMaxLayers()
-
-                block_slicing_decorator = BlockSlicingDecorator()
-                node.addDecorator(block_slicing_decorator)
-            else:
-                sliceable_decorator = SliceableObjectDecorator()
-                node.addDecorator(sliceable_decorator)
-
-            scene = self.getController().getScene()
-
-            # If there is no convex hull for the node, start calculating it and continue.
-            if not node.getDecorator(ConvexHullDecorator):
-                node.addDecorator(ConvexHullDecorator())
-            for child in node.getAllChildren():
-                if not child.getDecorator(ConvexHullDecorator):
-                    child.addDecorator(ConvexHullDecorator())
-
-            if node.callDecoration("isSliceable"):
-                # Only check position if it's not already blatantly obvious that it won't fit.
-                if node.getBoundingBox().width < self._volume.getBoundingBox().width or node.getBoundingBox().depth < self._volume.getBoundingBox().depth:
-                    # Find node location
-                    offset_shape_arr, hull_shape_arr = ShapeArray.fromNode(node, min_offset = min_offset)
-
-                    # If a model is to small then it will not contain any points
-                    if offset_shape_arr is None and hull_shape_arr is None:
-                        Message(self._i18n_catalog.i18nc("@info:status", "The selected model was too small to load."),
-                                title=self._i18n_catalog.i18nc("@info:title", "Warning")
-                                ).show()
-                        return
-
-                    # Step is for skipping tests to make it a lot faster. it also makes the outcome somewhat rougher
-                    node, _ = arranger.findNodePlacement(node, offset_shape_arr, hull_shape_arr, step = 10)
-
-            op = AddSceneNodeOperation(node, scene.getRoot())
-            op.push()
-            scene.sceneChanged.emit(node)
+    ##  Finds a place for a node that was read from a file.
+    #
+    #   \return The placed node, or None if the node is too small to load.
+    def _placeReadNode(self, node, arranger, min_offset):
+        # Only check position if it's not already blatantly obvious that it won't fit.
+        if node.getBoundingBox().width < self._volume.getBoundingBox().width or node.getBoundingBox().depth < self._volume.getBoundingBox().depth:
+            # Find node location
+            offset_shape_arr, hull_shape_arr = ShapeArray.fromNode(node, min_offset = min_offset)
+
+            # If a model is to small then it will not contain any points
+            if offset_shape_arr is None and hull_shape_arr is None:
+                Message(self._i18n_catalog.i18nc("@info:status", "The selected model was too small to load."),
+                        title=self._i18n_catalog.i18nc("@info:title", "Warning")
+                        ).show()
+                return None
+
+            # Step is for skipping tests to make it a lot faster. it also makes the outcome somewhat rougher
+            node, _ = arranger.findNodePlacement(node, offset_shape_arr, hull_shape_arr, step = 10)
+        return node
 
     def addNonSliceableExtension(self, extension):
         self._non_sliceable_extensions.append(extension)
@@ -0,0 +1,85 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import math
+
+
+##  Uniform grid of the 2D bounding boxes around the convex hulls of nodes.
+#
+#   This is used as broad phase for collision checks: two nodes can only
+#   overlap if their bounding boxes share a cell of the grid, so only those
+#   pairs need to be tested with the much more expensive polygon intersection.
+#
+#   Bounds are given as (min x, min z, max x, max z), in the same coordinates
+#   as the convex hulls.
+class HullGrid:
+    def __init__(self):
+        self._entries = []  # The nodes and their bounds, in the order they were added.
+        self._cells = {}  # Maps a cell (x, z) to the indices in _entries of the nodes that touch it.
+        self._cell_size = 1.0
+
+    ##  Add a node to the grid.
+    #
+    #   The node is not findable until build() is called.
+    def add(self, node, bounds):
+        self._entries.append((node, bounds))
+
+    ##  Put all added nodes in their cells.
+    #
+    #   The size of the cells is the average size of the bounds, so that most
+    #   nodes cover just a few cells.
+    def build(self):
+        self._cells = {}
+        if not self._entries:
+            return
+
+        total_size = sum(max(bounds[2] - bounds[0], bounds[3] - bounds[1]) for _, bounds in self._entries)
+        self._cell_size = max(total_size / len(self._entries), 1.0)
+
+        for index, (_, bounds) in enumerate(self._entries):
+            for cell in self._getCells(bounds):
+                self._cells.setdefault(cell, []).append(index)
+
+    ##  Find the nodes whose bounds may overlap with the given bounds.
+    #
+    #   \param bounds The bounds to find nodes near to, or None.
+    #   \param offset (Optional) A vector to move the bounds by before looking,
+    #   using only its X and Z components.
+    #   \return The nodes whose bounds overlap, in the order they were added.
+    def findNear(self, bounds, offset = None):
+        if bounds is None:
+            return []
+        if offset is not None:
+            bounds = (bounds[0] + offset.x, bounds[1] + offset.z, bounds[2] + offset.x, bounds[3] + offset.z)
+
+        indices = set()
+        for cell in self._getCells(bounds):
+            indices.update(self._cells.get(cell, ()))
+
+        result = []
+        for index in sorted(indices):
+            node, other_bounds = self._entries[index]
+            if other_bounds[0] <= bounds[2] and bounds[0] <= other_bounds[2] and other_bounds[1] <= bounds[3] and bounds[1] <= other_bounds[3]:
+                result.append(node)
+        return result
+
+    ##  Get the bounds of a polygon, in the form that the grid uses.
+    #
+    #   \param polygon The polygon to get the bounds of.
+    #   \return The bounds (min x, min z, max x, max z), or None if the polygon
+    #   has no points.
+    @staticmethod
+    def getPolygonBounds(polygon):
+        points = polygon.getPoints()
+        if points is None or len(points) == 0:
+            return None
+        return float(points[:, 0].min()), float(points[:, 1].min()), float(points[:, 0].max()), float(points[:, 1].max())
+
+    def _getCells(self, bounds):
+        min_x = math.floor(bounds[0] / self._cell_size)
+        min_z = math.floor(bounds[1] / self._cell_size)
+        max_x = math.floor(bounds[2] / self._cell_size)
+        max_z = math.floor(bounds[3] / self._cell_size)
+        for x in range(min_x, max_x + 1):
+            for z in range(min_z, max_z + 1):
+                yield x, z
@@ -0,0 +1,142 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from collections import namedtuple
+import math
+
+##  The length (m), weight (g) and cost estimates for the material amounts of
+#   one slice, with one entry for each extruder.
+MaterialEstimate = namedtuple("MaterialEstimate", ["lengths", "weights", "costs"])
+
+
+##  The properties of the material in one extruder that are needed to turn a
+#   material amount into a length, weight and cost.
+#
+#   The conversion factors are computed once, so estimating is only a few
+#   multiplications for each amount.
+class ExtruderMaterial:
+    ##  \param name The name of the material.
+    #   \param density The density of the material in g/cm^3.
+    #   \param diameter The diameter of the filament in mm.
+    #   \param spool_weight The weight of a spool of the material in g.
+    #   \param spool_cost The cost of a spool of the material.
+    def __init__(self, name, density, diameter, spool_weight = 0, spool_cost = 0):
+        self.name = name
+        self.density = float(density)
+        self.diameter = float(diameter)
+
+        # The engine sends amounts in mm^3.
+        radius = self.diameter / 2
+        self.length_per_amount = 1 / (math.pi * radius ** 2 * 1000) if radius != 0 else 0
+        self.weight_per_amount = self.density / 1000
+        self.cost_per_weight = float(spool_cost) / float(spool_weight) if float(spool_weight) != 0 else 0
+
+    ##  Get the length, weight and cost of an amount of this material.
+    #
+    #   \param amount The amount of material in mm^3.
+    def estimate(self, amount):
+        weight = float(amount) * self.weight_per_amount
+        return round(amount * self.length_per_amount, 2), weight, weight * self.cost_per_weight
+
+
+##  The materials of all extruders of a printer, and the spool weights and
+#   costs that the user entered for them.
+#
+#   Building the model looks through the stacks and parses the preferences, so
+#   it should be kept until the stacks or the preferences change.
+class MaterialCostModel:
+    ##  \param extruder_materials A list with an ExtruderMaterial for each
+    #   extruder position, or None for positions without a material.
+    def __init__(self, extruder_materials):
+        self._extruder_materials = extruder_materials
+
+    ##  Build the model for a printer.
+    #
+    #   \param global_stack The global stack of the printer.
+    #   \param extruder_stacks The extruder stacks of the printer. If there are
+    #   none, the material of the global stack is used.
+    #   \param material_preference_values The parsed "cura/material_settings"
+    #   preference, with the spool weight and cost for each material GUID.
+    #   \param unknown_name The name for extruders without a material.
+    @classmethod
+    def fromStacks(cls, global_stack, extruder_stacks, material_preference_values, unknown_name = ""):
+        if extruder_stacks:  # Multi extrusion machine
+            stacks_by_position = {}
+            for extruder_stack in extruder_stacks:
+                try:
+                    stacks_by_position[int(extruder_stack.getMetaDataEntry("position"))] = extruder_stack
+                except (TypeError, ValueError):
+                    continue
+        else:  # Machine with no extruder stacks
+            stacks_by_position = {0: global_stack}
+
+        global_diameter = global_stack.getProperty("material_diameter", "value")
+        extruder_materials = [None] * (max(stacks_by_position) + 1 if stacks_by_position else 0)
+        for position, stack in stacks_by_position.items():
+            density = stack.getMetaDataEntry("properties", {}).get("density", 0)
+            diameter = stack.getProperty("material_diameter", "value")
+            if diameter is None:
+                diameter = global_diameter
+            material = stack.findContainer({"type": "material"})
+
+            name = unknown_name
+            spool_weight = 0
+            spool_cost = 0
+            if material:
+                name = material.getName()
+                material_values = material_preference_values.get(material.getMetaDataEntry("GUID"))
+                if material_values:
+                    spool_weight = material_values.get("spool_weight", 0)
+                    spool_cost = material_values.get("spool_cost", 0)
+            extruder_materials[position] = ExtruderMaterial(name, density, diameter or 0, spool_weight, spool_cost)
+        return cls(extruder_materials)
+
+    ##  Get the material of an extruder, or None if the extruder has none.
+    def getExtruderMaterial(self, position):
+        if 0 <= position < len(self._extruder_materials):
+            return self._extruder_materials[position]
+        return None
+
+    ##  Get the names of the materials for the material amounts of a slice.
+    def getNames(self, material_amounts, unknown_name = ""):
+        names = []
+        for position in range(len(material_amounts)):
+            material = self.getExtruderMaterial(position)
+            names.append(material.name if material else unknown_name)
+        return names
+
+    ##  Estimate the length, weight and cost of the material amounts of one
+    #   slice.
+    #
+    #   \param material_amounts The material amount in mm^3 for each extruder.
+    #   \return A MaterialEstimate.
+    def estimate(self, material_amounts):
+        return estimateMaterials([material_amounts], self._extruder_materials)[0]
+
+
+##  Estimate the length, weight and cost of the material amounts of many
+#   slices with the same materials.
+#
+#   This only uses its arguments, so it can be used for slices that are not
+#   shown in the interface, on any thread.
+#
+#   \param material_amounts_list A list with, for each slice, the material
+#   amount in mm^3 for each extruder.
+#   \param extruder_materials A list with an ExtruderMaterial for each
+#   extruder position, or None for positions without a material.
+#   \return A list with a MaterialEstimate for each slice.
+def estimateMaterials(material_amounts_list, extruder_materials):
+    unknown = ExtruderMaterial("", 0, 0)
+    estimates = []
+    for material_amounts in material_amounts_list:
+        lengths = []
+        weights = []
+        costs = []
+        for position, amount in enumerate(material_amounts):
+            material = extruder_materials[position] if position < len(extruder_materials) else None
+            length, weight, cost = (material or unknown).estimate(amount)
+            lengths.append(length)
+            weights.append(weight)
+            costs.append(cost)
+        estimates.append(MaterialEstimate(lengths, weights, costs))
+    return estimates
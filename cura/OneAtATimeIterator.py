@@ -1,10 +1,19 @@
 # Copyright (c) 2015 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+import weakref
+
+import numpy
+
 from UM.Scene.Iterator import Iterator
 from UM.Scene.SceneNode import SceneNode
-from functools import cmp_to_key
-from UM.Application import Application
+
+from cura.HullGrid import HullGrid
+
+# For each node, for each other node: the hulls that were used to check if they hit, and the result.
+# The hulls are cached by the convex hull decorators until a node is moved or the settings change, so as long as the
+# hulls are the same objects the result can be reused by the next slice.
+_hit_cache = weakref.WeakKeyDictionary()
 
 ## Iterator that returns a list of nodes in the order that they need to be printed
 #  If there is no solution an empty list is returned.
@@ -12,9 +21,9 @@ from UM.Application import Application
 class OneAtATimeIterator(Iterator.Iterator):
     def __init__(self, scene_node):
         super().__init__(scene_node) # Call super to make multiple inheritence work.
-        self._hit_map = [[]]
+        self._hit_map = numpy.zeros((0, 0), dtype = numpy.bool_)
         self._original_node_list = []
-    
+
     def _fillStack(self):
         node_list = []
         for node in self._scene_node.getChildren():
@@ -26,86 +35,73 @@ class OneAtATimeIterator(Iterator.Iterator):
 
         if len(node_list) < 2:
             self._node_stack = node_list[:]
-            return 
+            return
 
         # Copy the list
         self._original_node_list = node_list[:]
 
         ## Initialise the hit map (pre-compute all hits between all objects)
-        self._hit_map = [[self._checkHit(i,j) for i in node_list] for j in node_list]
+        #  If _hit_map[a, b] is True, object a has to be printed before object b.
+        self._hit_map = self._computeHitMap(node_list)
 
         # Check if we have to files that block eachother. If this is the case, there is no solution!
-        for a in range(0,len(node_list)):
-            for b in range(0,len(node_list)):
-                if a != b and self._hit_map[a][b] and self._hit_map[b][a]:
-                    return 
-
-        # Sort the original list so that items that block the most other objects are at the beginning.
-        # This does not decrease the worst case running time, but should improve it in most cases.
-        sorted(node_list, key = cmp_to_key(self._calculateScore))
-
-        todo_node_list = [_ObjectOrder([], node_list)]
-        while len(todo_node_list) > 0:
-            current = todo_node_list.pop()
-            for node in current.todo:
-                # Check if the object can be placed with what we have and still allows for a solution in the future
-                if not self._checkHitMultiple(node, current.order) and not self._checkBlockMultiple(node, current.todo):
-                    # We found a possible result. Create new todo & order list.
-                    new_todo_list = current.todo[:]
-                    new_todo_list.remove(node)
-                    new_order = current.order[:] + [node]
-                    if len(new_todo_list) == 0: 
-                        # We have no more nodes to check, so quit looking.
-                        todo_node_list = None
-                        self._node_stack = new_order
-
-                        return
-                    todo_node_list.append(_ObjectOrder(new_order, new_todo_list))
-        self._node_stack = [] #No result found!
-
-
-    # Check if first object can be printed before the provided list (using the hit map)
-    def _checkHitMultiple(self, node, other_nodes):
-        node_index = self._original_node_list.index(node)
-        for other_node in other_nodes:
-            other_node_index = self._original_node_list.index(other_node)
-            if self._hit_map[node_index][other_node_index]:
-                return True
-        return False
-
-    def _checkBlockMultiple(self, node, other_nodes):
-        node_index = self._original_node_list.index(node)
-        for other_node in other_nodes:
-            other_node_index = self._original_node_list.index(other_node)
-            if self._hit_map[other_node_index][node_index] and node_index != other_node_index:
-                return True
-        return False
-
-    ##  Calculate score simply sums the number of other objects it 'blocks'
-    def _calculateScore(self, a, b):
-        score_a = sum(self._hit_map[self._original_node_list.index(a)])
-        score_b = sum(self._hit_map[self._original_node_list.index(b)])
-        return score_a - score_b
+        if numpy.any(self._hit_map & self._hit_map.T):
+            return
+
+        # Topological sort of the objects. Of the objects that are not blocked by any object that still needs to be
+        # printed, the one that's last in the list is printed first.
+        remaining = numpy.ones(len(node_list), dtype = numpy.bool_)
+        blocked_count = self._hit_map.sum(axis = 0)  # For each object, how many remaining objects must be printed before it.
+        order = []
+        for _ in range(len(node_list)):
+            candidates = numpy.flatnonzero(remaining & (blocked_count == 0))
+            if len(candidates) == 0:  # There is a cycle in which each object has to be printed before the next.
+                self._node_stack = [] #No result found!
+                return
+            index = candidates[-1]
+            remaining[index] = False
+            blocked_count -= self._hit_map[index]
+            order.append(node_list[index])
+        self._node_stack = order
+
+    ##  Compute which objects have to be printed before which others.
+    #
+    #   Only pairs of objects whose hulls have overlapping bounding boxes are
+    #   checked exactly.
+    #
+    #   \return A boolean matrix. Element [a, b] is True if object a has to be
+    #   printed before object b.
+    def _computeHitMap(self, node_list):
+        boundaries = [node.callDecoration("getConvexHullBoundary") for node in node_list]
+        heads = [node.callDecoration("getConvexHullHeadFull") for node in node_list]
+
+        no_bounds = (numpy.inf, numpy.inf, -numpy.inf, -numpy.inf)  # Overlaps with nothing.
+        boundary_bounds = numpy.array([(boundary and HullGrid.getPolygonBounds(boundary)) or no_bounds for boundary in boundaries])
+        head_bounds = numpy.array([(head and HullGrid.getPolygonBounds(head)) or no_bounds for head in heads])
+
+        # [a, b] is True if the bounding box of the boundary of b overlaps with that of the head of a.
+        candidates = (boundary_bounds[numpy.newaxis, :, 0] <= head_bounds[:, numpy.newaxis, 2]) & \
+                     (head_bounds[:, numpy.newaxis, 0] <= boundary_bounds[numpy.newaxis, :, 2]) & \
+                     (boundary_bounds[numpy.newaxis, :, 1] <= head_bounds[:, numpy.newaxis, 3]) & \
+                     (head_bounds[:, numpy.newaxis, 1] <= boundary_bounds[numpy.newaxis, :, 3])
+        numpy.fill_diagonal(candidates, False)
+
+        hit_map = numpy.zeros((len(node_list), len(node_list)), dtype = numpy.bool_)
+        for a, b in zip(*numpy.nonzero(candidates)):
+            hit_map[a, b] = self._checkHit(node_list[b], boundaries[b], node_list[a], heads[a])
+        return hit_map
 
     #   Checks if A can be printed before B
-    def _checkHit(self, a, b):
+    def _checkHit(self, a, a_boundary, b, b_head):
         if a == b:
             return False
 
-        overlap = a.callDecoration("getConvexHullBoundary").intersectsPolygon(b.callDecoration("getConvexHullHeadFull"))
-        if overlap:
-            return True
-        else: 
-            return False
-
-
-## Internal object used to keep track of a possible order in which to print objects.      
-class _ObjectOrder():
-    def __init__(self, order, todo):
-        """
-        :param order:   List of indexes in which to print objects, ordered by printing order.
-        :param todo:    List of indexes which are not yet inserted into the order list.
-        """
-        self.order = order
-        self.todo = todo
+        node_cache = _hit_cache.setdefault(a, weakref.WeakKeyDictionary())
+        cached = node_cache.get(b)
+        if cached is not None and cached[0] is a_boundary and cached[1] is b_head:
+            return cached[2]
 
+        overlap = a_boundary.intersectsPolygon(b_head)
+        hit = bool(overlap)
+        node_cache[b] = (a_boundary, b_head, hit)
+        return hit
@@ -11,11 +11,13 @@ from UM.Scene.Selection import Selection
 from UM.Preferences import Preferences
 
 from cura.ConvexHullDecorator import ConvexHullDecorator
+from cura.HullGrid import HullGrid
 
 from . import PlatformPhysicsOperation
 from . import ZOffsetDecorator
 
 import random  # used for list shuffling
+import weakref
 
 
 class PlatformPhysics:
@@ -35,6 +37,10 @@ class PlatformPhysics:
         self._move_factor = 1.1  # By how much should we multiply overlap to calculate a new spot?
         self._max_overlap_checks = 10  # How many times should we try to find a new spot per tick?
 
+        self._hulls = {}  # Convex hull and head hull per node, during a pass.
+        self._all_children = {}  # All descendants per node, during a pass.
+        self._hull_bounds = weakref.WeakKeyDictionary()  # Bounding box of the hulls per node, kept between passes.
+
         Preferences.getInstance().addPreference("physics/automatic_push_free", True)
         Preferences.getInstance().addPreference("physics/automatic_drop_down", True)
 
@@ -47,14 +53,32 @@ class PlatformPhysics:
 
         root = self._controller.getScene().getRoot()
 
-        # Keep a list of nodes that are moving. We use this so that we don't move two intersecting objects in the
+        # Keep a set of nodes that are moving. We use this so that we don't move two intersecting objects in the
         # same direction.
-        transformed_nodes = []
+        transformed_nodes = set()
+
+        # The hulls and children of the nodes are used for many pairs of nodes, so only get them once per pass.
+        self._hulls = {}
+        self._all_children = {}
 
         # We try to shuffle all the nodes to prevent "locked" situations, where iteration B inverts iteration A.
         # By shuffling the order of the nodes, this might happen a few times, but at some point it will resolve.
         nodes = list(BreadthFirstIterator(root))
 
+        # Broad phase: put the bounds of the hulls of all nodes in a grid, so that the expensive polygon intersection
+        # tests are only done for nodes that are near each other.
+        node_order = {}
+        hull_grid = HullGrid()
+        if Preferences.getInstance().getValue("physics/automatic_push_free"):
+            for index, node in enumerate(nodes):
+                if node is root or type(node) is not SceneNode:
+                    continue
+                node_order[node] = index
+                bounds = self._getHullBounds(node)
+                if bounds is not None:
+                    hull_grid.add(node, bounds)
+            hull_grid.build()
+
         # Only check nodes inside build area.
         nodes = [node for node in nodes if (hasattr(node, "_outside_buildarea") and not node._outside_buildarea)]
 
@@ -77,69 +101,130 @@ class PlatformPhysics:
                 node.addDecorator(ConvexHullDecorator())
 
             if Preferences.getInstance().getValue("physics/automatic_push_free"):
-                # Check for collisions between convex hulls
-                for other_node in BreadthFirstIterator(root):
-                    # Ignore root, ourselves and anything that is not a normal SceneNode.
-                    if other_node is root or type(other_node) is not SceneNode or other_node is node:
-                        continue
-                    
-                    # Ignore collisions of a group with it's own children
-                    if other_node in node.getAllChildren() or node in other_node.getAllChildren():
-                        continue
-                    
-                    # Ignore collisions within a group
-                    if other_node.getParent() and node.getParent() and (other_node.getParent().callDecoration("isGroup") is not None or node.getParent().callDecoration("isGroup") is not None):
-                        continue
-                    
-                    # Ignore nodes that do not have the right properties set.
-                    if not other_node.callDecoration("getConvexHull") or not other_node.getBoundingBox():
-                        continue
-
-                    if other_node in transformed_nodes:
-                        continue  # Other node is already moving, wait for next pass.
-
-                    overlap = (0, 0)  # Start loop with no overlap
-                    current_overlap_checks = 0
-                    # Continue to check the overlap until we no longer find one.
-                    while overlap and current_overlap_checks < self._max_overlap_checks:
-                        current_overlap_checks += 1
-                        head_hull = node.callDecoration("getConvexHullHead")
-                        if head_hull:  # One at a time intersection.
-                            overlap = head_hull.translate(move_vector.x, move_vector.z).intersectsPolygon(other_node.callDecoration("getConvexHull"))
-                            if not overlap:
-                                other_head_hull = other_node.callDecoration("getConvexHullHead")
-                                if other_head_hull:
-                                    overlap = node.callDecoration("getConvexHull").translate(move_vector.x, move_vector.z).intersectsPolygon(other_head_hull)
-                                    if overlap:
-                                        # Moving ensured that overlap was still there. Try anew!
-                                        move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
-                                                                      z=move_vector.z + overlap[1] * self._move_factor)
-                            else:
-                                # Moving ensured that overlap was still there. Try anew!
-                                move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
-                                                              z=move_vector.z + overlap[1] * self._move_factor)
-                        else:
-                            own_convex_hull = node.callDecoration("getConvexHull")
-                            other_convex_hull = other_node.callDecoration("getConvexHull")
-                            if own_convex_hull and other_convex_hull:
-                                overlap = own_convex_hull.translate(move_vector.x, move_vector.z).intersectsPolygon(other_convex_hull)
-                                if overlap:  # Moving ensured that overlap was still there. Try anew!
-                                    move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
-                                                                  z=move_vector.z + overlap[1] * self._move_factor)
-                            else:
-                                # This can happen in some cases if the object is not yet done with being loaded.
-                                #  Simply waiting for the next tick seems to resolve this correctly.
-                                overlap = None
+                # Check for collisions between convex hulls. Only the nodes whose hulls are near this node's hulls can
+                # overlap with it. Whenever the node gets pushed, look again for nodes near its new position.
+                checked_nodes = {node}
+                while True:
+                    candidates = [other_node for other_node in hull_grid.findNear(self._getHullBounds(node), move_vector) if other_node not in checked_nodes]
+                    if not candidates:
+                        break
+                    candidates.sort(key = node_order.__getitem__)  # Check them in scene order, like a full iteration would.
+                    checked_nodes.update(candidates)
+
+                    for other_node in candidates:
+                        # Ignore collisions of a group with it's own children
+                        if other_node in self._getAllChildren(node) or node in self._getAllChildren(other_node):
+                            continue
+
+                        # Ignore collisions within a group
+                        if other_node.getParent() and node.getParent() and (other_node.getParent().callDecoration("isGroup") is not None or node.getParent().callDecoration("isGroup") is not None):
+                            continue
+
+                        # Ignore nodes that do not have the right properties set.
+                        if not self._getHulls(other_node)[0] or not other_node.getBoundingBox():
+                            continue
+
+                        if other_node in transformed_nodes:
+                            continue  # Other node is already moving, wait for next pass.
+
+                        move_vector = self._pushApart(node, other_node, move_vector)
 
             if not Vector.Null.equals(move_vector, epsilon=1e-5):
-                transformed_nodes.append(node)
+                transformed_nodes.add(node)
                 op = PlatformPhysicsOperation.PlatformPhysicsOperation(node, move_vector)
                 op.push()
+                self._hulls.pop(node, None)  # It moved, so its hulls changed.
+
+        self._hulls = {}
+        self._all_children = {}
 
         # After moving, we have to evaluate the boundary checks for nodes
         build_volume = Application.getInstance().getBuildVolume()
         build_volume.updateNodeBoundaryCheck()
 
+    ##  Find how far a node needs to move to no longer overlap with another
+    #   node.
+    #
+    #   \param node The node to move.
+    #   \param other_node The node it may overlap with.
+    #   \param move_vector How far the node is already being moved.
+    #   \return The new move vector of the node.
+    def _pushApart(self, node, other_node, move_vector):
+        own_convex_hull, head_hull = self._getHulls(node)
+        other_convex_hull, other_head_hull = self._getHulls(other_node)
+
+        overlap = (0, 0)  # Start loop with no overlap
+        current_overlap_checks = 0
+        # Continue to check the overlap until we no longer find one.
+        while overlap and current_overlap_checks < self._max_overlap_checks:
+            current_overlap_checks += 1
+            if head_hull:  # One at a time intersection.
+                overlap = head_hull.translate(move_vector.x, move_vector.z).intersectsPolygon(other_convex_hull)
+                if not overlap:
+                    if other_head_hull:
+                        overlap = own_convex_hull.translate(move_vector.x, move_vector.z).intersectsPolygon(other_head_hull)
+                        if overlap:
+                            # Moving ensured that overlap was still there. Try anew!
+                            move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
+                                                          z=move_vector.z + overlap[1] * self._move_factor)
+                else:
+                    # Moving ensured that overlap was still there. Try anew!
+                    move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
+                                                  z=move_vector.z + overlap[1] * self._move_factor)
+            else:
+                if own_convex_hull and other_convex_hull:
+                    overlap = own_convex_hull.translate(move_vector.x, move_vector.z).intersectsPolygon(other_convex_hull)
+                    if overlap:  # Moving ensured that overlap was still there. Try anew!
+                        move_vector = move_vector.set(x=move_vector.x + overlap[0] * self._move_factor,
+                                                      z=move_vector.z + overlap[1] * self._move_factor)
+                else:
+                    # This can happen in some cases if the object is not yet done with being loaded.
+                    #  Simply waiting for the next tick seems to resolve this correctly.
+                    overlap = None
+        return move_vector
+
+    ##  Get the convex hull and the head hull of a node.
+    #
+    #   These are only computed once per pass, or again after the node moved.
+    def _getHulls(self, node):
+        if node not in self._hulls:
+            self._hulls[node] = (node.callDecoration("getConvexHull"), node.callDecoration("getConvexHullHead"))
+        return self._hulls[node]
+
+    ##  Get the 2D bounding box around the convex hull and head hull of a node.
+    #
+    #   The bounding box is kept between passes, until the node gets different
+    #   hulls.
+    #
+    #   \return The bounds as (min x, min z, max x, max z), or None if the node
+    #   has no hull.
+    def _getHullBounds(self, node):
+        hulls = self._getHulls(node)
+        cached = self._hull_bounds.get(node)
+        if cached is not None and cached[0] is hulls[0] and cached[1] is hulls[1]:
+            return cached[2]
+
+        bounds = None
+        for hull in hulls:
+            if not hull:
+                continue
+            hull_bounds = HullGrid.getPolygonBounds(hull)
+            if hull_bounds is None:
+                continue
+            if bounds is None:
+                bounds = hull_bounds
+            else:
+                bounds = (min(bounds[0], hull_bounds[0]), min(bounds[1], hull_bounds[1]), max(bounds[2], hull_bounds[2]), max(bounds[3], hull_bounds[3]))
+
+        self._hull_bounds[node] = (hulls[0], hulls[1], bounds)
+        return bounds
+
+    ##  Get all descendants of a node, as a set.
+    def _getAllChildren(self, node):
+        if node not in self._all_children:
+            self._all_children[node] = set(node.getAllChildren())
+        return self._all_children[node]
+
     def _onToolOperationStarted(self, tool):
         self._enabled = False
 
@@ -10,9 +10,9 @@ from UM.Qt.Duration import Duration
 from UM.Preferences import Preferences
 from UM.Settings.ContainerRegistry import ContainerRegistry
 
+from cura.MaterialCostModel import MaterialCostModel
 from cura.Settings.ExtruderManager import ExtruderManager
 
-import math
 import os.path
 import unicodedata
 import json
@@ -58,6 +58,7 @@ class PrintInformation(QObject):
         self._material_weights = []
         self._material_costs = []
         self._material_names = []
+        self._material_cost_model = None  # Built when it's needed, and thrown away when the materials or their costs change.
 
         self._pre_sliced = False
 
@@ -70,12 +71,14 @@ class PrintInformation(QObject):
         self._job_name = ""
 
         Application.getInstance().globalContainerStackChanged.connect(self._updateJobName)
+        Application.getInstance().globalContainerStackChanged.connect(self._invalidateMaterialCostModel)
         Application.getInstance().fileLoaded.connect(self.setBaseName)
         Application.getInstance().workspaceLoaded.connect(self.setProjectName)
         Preferences.getInstance().preferenceChanged.connect(self._onPreferencesChanged)
 
         self._active_material_container = None
         Application.getInstance().getMachineManager().activeMaterialChanged.connect(self._onActiveMaterialChanged)
+        Application.getInstance().getMachineManager().activeStackValueChanged.connect(self._invalidateMaterialCostModel)  # The material diameter could have changed.
         self._onActiveMaterialChanged()
 
         self._material_amounts = []
@@ -122,27 +125,30 @@ class PrintInformation(QObject):
     def currentPrintTime(self):
         return self._current_print_time
 
+    ##  Emitted once when any of the material lengths, weights, costs or names
+    #   changed, so the interface updates once for all of them.
+    materialInformationChanged = pyqtSignal()
+
+    # Still emitted along with materialInformationChanged, for plug-ins that
+    # listen to these.
     materialLengthsChanged = pyqtSignal()
+    materialWeightsChanged = pyqtSignal()
+    materialCostsChanged = pyqtSignal()
+    materialNamesChanged = pyqtSignal()
 
-    @pyqtProperty("QVariantList", notify = materialLengthsChanged)
+    @pyqtProperty("QVariantList", notify = materialInformationChanged)
     def materialLengths(self):
         return self._material_lengths
 
-    materialWeightsChanged = pyqtSignal()
-
-    @pyqtProperty("QVariantList", notify = materialWeightsChanged)
+    @pyqtProperty("QVariantList", notify = materialInformationChanged)
     def materialWeights(self):
         return self._material_weights
 
-    materialCostsChanged = pyqtSignal()
-
-    @pyqtProperty("QVariantList", notify = materialCostsChanged)
+    @pyqtProperty("QVariantList", notify = materialInformationChanged)
     def materialCosts(self):
         return self._material_costs
 
-    materialNamesChanged = pyqtSignal()
-
-    @pyqtProperty("QVariantList", notify = materialNamesChanged)
+    @pyqtProperty("QVariantList", notify = materialInformationChanged)
     def materialNames(self):
         return self._material_names
 
@@ -168,70 +174,51 @@ class PrintInformation(QObject):
 
         self._current_print_time.setDuration(total_estimated_time)
 
+    ##  Get the materials of the active printer and their costs.
+    #
+    #   The model is kept until the printer, its materials or the material
+    #   costs change.
+    #   \return A MaterialCostModel, or None if there is no active printer.
+    def getMaterialCostModel(self):
+        if self._material_cost_model is None:
+            global_stack = Application.getInstance().getGlobalContainerStack()
+            if global_stack is None:
+                return None
+            self._material_cost_model = createMaterialCostModel(global_stack)
+        return self._material_cost_model
+
+    def _invalidateMaterialCostModel(self, *args, **kwargs):
+        self._material_cost_model = None
+
     def _calculateInformation(self):
-        if Application.getInstance().getGlobalContainerStack() is None:
+        material_cost_model = self.getMaterialCostModel()
+        if material_cost_model is None:
             return
 
-        # Material amount is sent as an amount of mm^3, so calculate length from that
-        radius = Application.getInstance().getGlobalContainerStack().getProperty("material_diameter", "value") / 2
-        self._material_lengths = []
-        self._material_weights = []
-        self._material_costs = []
-        self._material_names = []
-
-        material_preference_values = json.loads(Preferences.getInstance().getValue("cura/material_settings"))
-
-        extruder_stacks = list(ExtruderManager.getInstance().getMachineExtruders(Application.getInstance().getGlobalContainerStack().getId()))
-        for index, amount in enumerate(self._material_amounts):
-            ## Find the right extruder stack. As the list isn't sorted because it's a annoying generator, we do some
-            #  list comprehension filtering to solve this for us.
-            material = None
-            if extruder_stacks:  # Multi extrusion machine
-                extruder_stack = [extruder for extruder in extruder_stacks if extruder.getMetaDataEntry("position") == str(index)][0]
-                density = extruder_stack.getMetaDataEntry("properties", {}).get("density", 0)
-                material = extruder_stack.findContainer({"type": "material"})
-            else:  # Machine with no extruder stacks
-                density = Application.getInstance().getGlobalContainerStack().getMetaDataEntry("properties", {}).get("density", 0)
-                material = Application.getInstance().getGlobalContainerStack().findContainer({"type": "material"})
-
-            weight = float(amount) * float(density) / 1000
-            cost = 0
-            material_name = catalog.i18nc("@label unknown material", "Unknown")
-            if material:
-                material_guid = material.getMetaDataEntry("GUID")
-                material_name = material.getName()
-                if material_guid in material_preference_values:
-                    material_values = material_preference_values[material_guid]
-
-                    weight_per_spool = float(material_values["spool_weight"] if material_values and "spool_weight" in material_values else 0)
-                    cost_per_spool = float(material_values["spool_cost"] if material_values and "spool_cost" in material_values else 0)
-
-                    if weight_per_spool != 0:
-                        cost = cost_per_spool * weight / weight_per_spool
-                    else:
-                        cost = 0
-
-            if radius != 0:
-                length = round((amount / (math.pi * radius ** 2)) / 1000, 2)
-            else:
-                length = 0
-            self._material_weights.append(weight)
-            self._material_lengths.append(length)
-            self._material_costs.append(cost)
-            self._material_names.append(material_name)
+        estimate = material_cost_model.estimate(self._material_amounts)
+        material_names = material_cost_model.getNames(self._material_amounts, catalog.i18nc("@label unknown material", "Unknown"))
+        if (estimate.lengths, estimate.weights, estimate.costs, material_names) == (self._material_lengths, self._material_weights, self._material_costs, self._material_names):
+            return  # Nothing changed, so the interface doesn't need to update.
 
+        self._material_lengths = estimate.lengths
+        self._material_weights = estimate.weights
+        self._material_costs = estimate.costs
+        self._material_names = material_names
         self.materialLengthsChanged.emit()
         self.materialWeightsChanged.emit()
         self.materialCostsChanged.emit()
         self.materialNamesChanged.emit()
+        self.materialInformationChanged.emit()
 
     def _onPreferencesChanged(self, preference):
         if preference != "cura/material_settings":
             return
 
+        self._invalidateMaterialCostModel()
         self._calculateInformation()
 
     def _onActiveMaterialChanged(self):
+        self._invalidateMaterialCostModel()
         if self._active_material_container:
             try:
                 self._active_material_container.metaDataChanged.disconnect(self._onMaterialMetaDataChanged)
@@ -246,6 +233,7 @@ class PrintInformation(QObject):
             self._active_material_container.metaDataChanged.connect(self._onMaterialMetaDataChanged)
 
     def _onMaterialMetaDataChanged(self, *args, **kwargs):
+        self._invalidateMaterialCostModel()
         self._calculateInformation()
 
     @pyqtSlot(str)
@@ -355,3 +343,14 @@ class PrintInformation(QObject):
 
         temp_material_amounts = [0]
         self._onPrintDurationMessage(temp_message, temp_material_amounts)
+
+
+##  Build the material cost model for a printer from its stacks and the
+#   material costs in the preferences.
+#
+#   \param global_stack The global stack of the printer.
+#   \return A MaterialCostModel.
+def createMaterialCostModel(global_stack):
+    material_preference_values = json.loads(Preferences.getInstance().getValue("cura/material_settings"))
+    extruder_stacks = list(ExtruderManager.getInstance().getMachineExtruders(global_stack.getId()))
+    return MaterialCostModel.fromStacks(global_stack, extruder_stacks, material_preference_values, catalog.i18nc("@label unknown material", "Unknown"))
@@ -3,10 +3,11 @@
 
 # This collects a lot of quality and quality changes related code which was split between ContainerManager
 # and the MachineManager and really needs to usable from both.
-from typing import Any, Dict, List, Optional, TYPE_CHECKING
+from typing import Any, Dict, List, Optional, Tuple, TYPE_CHECKING
 
 from UM.Application import Application
 from UM.Settings.ContainerRegistry import ContainerRegistry
+from UM.Settings.DefinitionContainer import DefinitionContainer
 from UM.Settings.InstanceContainer import InstanceContainer
 from cura.Settings.ExtruderManager import ExtruderManager
 
@@ -14,6 +15,7 @@ if TYPE_CHECKING:
     from cura.Settings.GlobalStack import GlobalStack
     from cura.Settings.ExtruderStack import ExtruderStack
     from UM.Settings.DefinitionContainer import DefinitionContainerInterface
+    from UM.Preferences import Preferences
 
 class QualityManager:
 
@@ -27,6 +29,63 @@ class QualityManager:
 
     __instance = None   # type: "QualityManager"
 
+    def __init__(self) -> None:
+        self._use_lookup_table = False
+        self._preferences = None  # type: Optional[Preferences]
+
+        # Lookup tables, filled as queries come in and cleared when the relevant containers change.
+        self._lookup_table = {}  # type: Dict[Tuple, List[InstanceContainer]]  # (machine definition, materials, criteria) -> qualities.
+        self._parent_machine_definitions = {}  # type: Dict[str, DefinitionContainerInterface]
+        self._whole_machine_definitions = {}  # type: Dict[str, DefinitionContainerInterface]
+        self._basic_material_metadatas = {}  # type: Dict[Tuple, List[Dict[str, Any]]]
+
+    ##  Answer quality queries from lookup tables instead of searching the
+    #   container registry and resolving the machine definitions every time.
+    #
+    #   The tables are filled as queries come in and are cleared whenever a
+    #   quality, material, variant or definition container is added, removed or
+    #   changes its metadata, so they are rebuilt lazily after such a change.
+    #
+    #   \param enabled Whether to use the lookup tables.
+    def setLookupTableEnabled(self, enabled: bool) -> None:
+        if enabled == self._use_lookup_table:
+            return
+        self._use_lookup_table = enabled
+        self._clearLookupTables()
+
+        container_registry = ContainerRegistry.getInstance()
+        if enabled:
+            container_registry.containerAdded.connect(self._onContainerChanged)
+            container_registry.containerRemoved.connect(self._onContainerChanged)
+            container_registry.containerMetaDataChanged.connect(self._onContainerChanged)
+        else:
+            container_registry.containerAdded.disconnect(self._onContainerChanged)
+            container_registry.containerRemoved.disconnect(self._onContainerChanged)
+            container_registry.containerMetaDataChanged.disconnect(self._onContainerChanged)
+
+    ##  Use the lookup tables while the cura/use_quality_lookup_table
+    #   preference is on, and follow changes to that preference.
+    #
+    #   \param preferences The preferences that contain the preference.
+    def followLookupTablePreference(self, preferences: "Preferences") -> None:
+        self._preferences = preferences
+        self.setLookupTableEnabled(preferences.getValue("cura/use_quality_lookup_table"))
+        preferences.preferenceChanged.connect(self._onPreferenceChanged)
+
+    def _onPreferenceChanged(self, preference: str) -> None:
+        if preference == "cura/use_quality_lookup_table":
+            self.setLookupTableEnabled(self._preferences.getValue(preference))
+
+    def _clearLookupTables(self) -> None:
+        self._lookup_table = {}
+        self._parent_machine_definitions = {}
+        self._whole_machine_definitions = {}
+        self._basic_material_metadatas = {}
+
+    def _onContainerChanged(self, container, *args) -> None:
+        if isinstance(container, DefinitionContainer) or container.getMetaDataEntry("type") in ("quality", "material", "variant"):
+            self._clearLookupTables()
+
     ##  Find a quality by name for a specific machine definition and materials.
     #
     #   \param quality_name
@@ -206,6 +265,15 @@ class QualityManager:
     #   \return \type{List[Dict[str, Any]]} A list of the metadata of basic
     #   materials, or an empty list if none could be found.
     def _getBasicMaterialMetadatas(self, material_container: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not self._use_lookup_table:
+            return self.__findBasicMaterialMetadatas(material_container)
+
+        key = (material_container.get("id"), material_container.get("definition"), material_container.get("variant"), material_container.get("material"))
+        if key not in self._basic_material_metadatas:
+            self._basic_material_metadatas[key] = self.__findBasicMaterialMetadatas(material_container)
+        return list(self._basic_material_metadatas[key])  # Copy, so the caller can't modify the table.
+
+    def __findBasicMaterialMetadatas(self, material_container: Dict[str, Any]) -> List[Dict[str, Any]]:
         if "definition" not in material_container:
             definition_id = "fdmprinter"
         else:
@@ -249,6 +317,21 @@ class QualityManager:
             if active_stacks:
                 material_metadata = [stack.material.getMetaData() for stack in active_stacks]
 
+        if not self._use_lookup_table:
+            return self.__findFilteredContainersForStack(machine_definition, material_metadata, **kwargs)
+
+        try:
+            key = (machine_definition.getId(),
+                   tuple(material["id"] if material is not None else None for material in material_metadata or []),
+                   tuple(sorted(kwargs.items())))
+            hash(key)
+        except TypeError:  # Criteria that can't be used as key, e.g. lists. Don't cache those.
+            return self.__findFilteredContainersForStack(machine_definition, material_metadata, **kwargs)
+        if key not in self._lookup_table:
+            self._lookup_table[key] = self.__findFilteredContainersForStack(machine_definition, material_metadata, **kwargs)
+        return list(self._lookup_table[key])  # Copy, so the caller can't modify the table.
+
+    def __findFilteredContainersForStack(self, machine_definition: "DefinitionContainerInterface", material_metadata: Optional[List[Dict[str, Any]]], **kwargs) -> List[InstanceContainer]:
         criteria = kwargs
         filter_by_material = False
 
@@ -292,6 +375,15 @@ class QualityManager:
     #    \return  \type{DefinitionContainer} the parent machine definition. If the given machine
     #               definition doesn't have a parent then it is simply returned.
     def getParentMachineDefinition(self, machine_definition: "DefinitionContainerInterface") -> "DefinitionContainerInterface":
+        if not self._use_lookup_table:
+            return self.__findParentMachineDefinition(machine_definition)
+
+        definition_id = machine_definition.getId()
+        if definition_id not in self._parent_machine_definitions:
+            self._parent_machine_definitions[definition_id] = self.__findParentMachineDefinition(machine_definition)
+        return self._parent_machine_definitions[definition_id]
+
+    def __findParentMachineDefinition(self, machine_definition: "DefinitionContainerInterface") -> "DefinitionContainerInterface":
         container_registry = ContainerRegistry.getInstance()
 
         machine_entry = machine_definition.getMetaDataEntry("machine")
@@ -326,7 +418,11 @@ class QualityManager:
         if machine_entry is None:
             # This already is a 'global' machine definition.
             return machine_definition
+        elif self._use_lookup_table and machine_entry in self._whole_machine_definitions:
+            return self._whole_machine_definitions[machine_entry]
         else:
             container_registry = ContainerRegistry.getInstance()
             whole_machine = container_registry.findDefinitionContainers(id = machine_entry)[0]
+            if self._use_lookup_table:
+                self._whole_machine_definitions[machine_entry] = whole_machine
             return whole_machine
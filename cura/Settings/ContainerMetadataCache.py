@@ -0,0 +1,186 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from UM.Logger import Logger
+
+
+##  On-disk cache of the metadata parsed from container files.
+#
+#   The definitions, qualities, variants and materials that come with Cura
+#   don't change between runs, so there is no need to parse all of them on
+#   every start. This cache stores the metadata that was parsed from each file,
+#   together with the size and modification time of that file. An entry is
+#   only used if the file still has the same size and modification time, and
+#   the whole cache is discarded if it was written by a different version.
+#
+#   The cache is a JSON file. Metadata that can't be stored as JSON as it is,
+#   other than the container type, is not cached but parsed on every start.
+#
+#   Some metadata also depends on other files, e.g. materials are split per
+#   machine and variant, and definitions inherit metadata from their parents.
+#   Such entries are stored with a dependency stamp of those other files (see
+#   getFilesStamp), and are only used while that stamp is the same.
+class ContainerMetadataCache:
+    ##  Increase this when the format of the cache file changes.
+    CacheVersion = 3
+
+    ##  Create a new cache.
+    #
+    #   \param file_path The file to store the cache in.
+    #   \param version A version string for the application. Entries written by
+    #   a different version are discarded.
+    def __init__(self, file_path: str, version: str) -> None:
+        self._file_path = file_path
+        self._version = "{cache_version}-{version}".format(cache_version = self.CacheVersion, version = version)
+
+        # For each container ID: the file it was loaded from, that file's size and modification time, the stamp of
+        # the files it depends on and the metadata.
+        self._entries = {}  # type: Dict[str, List[Any]]
+        self._is_dirty = False
+
+    ##  Read the cache from disk.
+    #
+    #   If the cache file doesn't exist, is corrupt or was written by a
+    #   different version, the cache starts out empty.
+    def load(self) -> None:
+        self._entries = {}
+        self._is_dirty = False
+        if not os.path.isfile(self._file_path):
+            return
+
+        try:
+            with open(self._file_path, "r", encoding = "utf-8") as f:
+                data = json.load(f)
+            version = data["version"]
+            entries = data["entries"]
+            if not isinstance(entries, dict):
+                raise ValueError("The entries are not a dictionary.")
+        except Exception as e:  # Corrupt or unreadable. Just parse everything again and overwrite it.
+            Logger.log("w", "Could not read container metadata cache {file_path}: {error}".format(file_path = self._file_path, error = str(e)))
+            self._is_dirty = True
+            return
+
+        if version != self._version:
+            Logger.log("i", "Container metadata cache was written by version {old_version}, discarding it.".format(old_version = version))
+            self._is_dirty = True
+            return
+        self._entries = entries
+
+    ##  Write the cache to disk, if anything changed since it was loaded.
+    def save(self) -> None:
+        if not self._is_dirty:
+            return
+
+        temporary_path = self._file_path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(self._file_path), exist_ok = True)
+            with open(temporary_path, "w", encoding = "utf-8") as f:
+                json.dump({"version": self._version, "entries": self._entries}, f)
+            os.replace(temporary_path, self._file_path)  # Atomic, so a crash while writing can't leave a corrupt cache.
+        except Exception as e:
+            Logger.log("w", "Could not write container metadata cache {file_path}: {error}".format(file_path = self._file_path, error = str(e)))
+            return
+        self._is_dirty = False
+
+    ##  Get the cached metadata of a container.
+    #
+    #   \param container_id The ID of the container.
+    #   \param file_path The file the container would be loaded from.
+    #   \param dependency_stamp The current stamp of the files the metadata
+    #   depends on, or None if it only depends on its own file.
+    #   \return The metadata of the container and of any sub-containers that
+    #   were created from the same file, or None if there is no valid entry.
+    def get(self, container_id: str, file_path: str, dependency_stamp: Optional[str] = None) -> Optional[List[Dict[str, Any]]]:
+        entry = self._entries.get(container_id)
+        if entry is None:
+            return None
+        try:
+            cached_path, cached_size, cached_mtime, cached_dependency_stamp, cached_metadata = entry
+        except (TypeError, ValueError):  # Not an entry as put() stores them.
+            return None
+        if cached_path != file_path or (cached_size, cached_mtime) != self._getFileStamp(file_path) or cached_dependency_stamp != dependency_stamp:
+            return None
+
+        result = []
+        for metadata in cached_metadata:
+            metadata = dict(metadata)
+            if "container_type" in metadata:
+                container_type = self._resolveType(metadata["container_type"])
+                if container_type is None:  # The plug-in defining this type is not loaded (any more).
+                    return None
+                metadata["container_type"] = container_type
+            result.append(metadata)
+        return result
+
+    ##  Store the metadata of a container.
+    #
+    #   \param container_id The ID of the container.
+    #   \param file_path The file the container was loaded from.
+    #   \param metadata The metadata of the container and of any sub-containers
+    #   that were created from the same file.
+    #   \param dependency_stamp The stamp of the files the metadata depends on,
+    #   or None if it only depends on its own file.
+    def put(self, container_id: str, file_path: str, metadata: List[Dict[str, Any]], dependency_stamp: Optional[str] = None) -> None:
+        file_stamp = self._getFileStamp(file_path)
+        if file_stamp is None:
+            return
+
+        stored_metadata = []
+        for item in metadata:
+            item = dict(item)
+            if "container_type" in item:  # Store classes by the name of their module and class.
+                item["container_type"] = [item["container_type"].__module__, item["container_type"].__qualname__]
+            stored_metadata.append(item)
+
+        try:
+            # Tuples, dictionaries with other keys than strings, etc. would come back different. Don't cache those.
+            if json.loads(json.dumps(stored_metadata)) != stored_metadata:
+                return
+        except (TypeError, ValueError):  # Metadata contains something that can't be stored. Don't cache this one.
+            return
+        self._entries[container_id] = [file_path, file_stamp[0], file_stamp[1], dependency_stamp, stored_metadata]
+        self._is_dirty = True
+
+    ##  Remove the entries of containers that are no longer loaded from a file.
+    #
+    #   \param container_ids The IDs of the containers to keep.
+    def prune(self, container_ids: Iterable[str]) -> None:
+        stale_ids = set(self._entries.keys()) - set(container_ids)
+        for container_id in stale_ids:
+            del self._entries[container_id]
+        if stale_ids:
+            self._is_dirty = True
+
+    ##  Get a stamp of a set of files, which changes when any of the files is
+    #   added, removed or changed.
+    #
+    #   \param file_paths The files to get a stamp of.
+    #   \return A string to use as dependency stamp.
+    @classmethod
+    def getFilesStamp(cls, file_paths: Iterable[str]) -> str:
+        file_hash = hashlib.sha1()
+        for file_path in sorted(file_paths):
+            file_hash.update("{path}\0{stamp}\0".format(path = file_path, stamp = cls._getFileStamp(file_path)).encode("utf-8"))
+        return file_hash.hexdigest()
+
+    @staticmethod
+    def _getFileStamp(file_path: str) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _resolveType(type_name: List[str]) -> Optional[type]:
+        module_name, class_name = type_name
+        module = sys.modules.get(module_name)
+        if module is None:
+            return None
+        return getattr(module, class_name, None)
@@ -0,0 +1,134 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from typing import AbstractSet, Any, Dict, Iterable, List, Optional, Set
+
+
+##  Secondary indexes on the metadata of the containers in a registry.
+#
+#   For a fixed set of commonly queried metadata keys this keeps a mapping from
+#   each metadata value to the IDs of the containers that have that value. A
+#   query that filters on one or more of those keys can then intersect a few
+#   small sets of IDs instead of checking the metadata of every container.
+#
+#   Values are indexed by their string representation, which is also how the
+#   container query compares them, so the index never drops a container that a
+#   full scan would have found.
+class ContainerMetadataIndex:
+    ##  The metadata keys that are indexed if nothing else is specified.
+    DefaultKeys = ("type", "definition", "material", "variant", "quality_type", "GUID", "base_file")
+
+    def __init__(self, keys: Iterable[str] = DefaultKeys) -> None:
+        self._index = {key: {} for key in keys}  # type: Dict[str, Dict[str, Set[str]]]
+
+        # For each indexed container the values it was indexed under, so it can be removed again.
+        self._indexed_values = {}  # type: Dict[str, Dict[str, str]]
+
+        # Registration order of the containers, so results can be returned in the same order as a full scan.
+        self._order = {}  # type: Dict[str, int]
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self._indexed_values)
+
+    def __contains__(self, container_id: str) -> bool:
+        return container_id in self._indexed_values
+
+    ##  Get the IDs of all containers in the index.
+    def getContainerIds(self) -> Set[str]:
+        return set(self._indexed_values.keys())
+
+    ##  Whether exactly the containers with the given IDs are in the index.
+    #
+    #   \param container_ids The IDs to compare with, e.g. the keys of the
+    #   registry's metadata dictionary.
+    def hasContainerIds(self, container_ids: AbstractSet[str]) -> bool:
+        return self._indexed_values.keys() == container_ids
+
+    ##  Remove all containers from the index.
+    def clear(self) -> None:
+        for values in self._index.values():
+            values.clear()
+        self._indexed_values.clear()
+        self._order.clear()
+        self._next_order = 0
+
+    ##  Add a container to the index, or update it if it was already indexed.
+    #
+    #   \param metadata The metadata of the container. It must contain an "id"
+    #   entry.
+    def add(self, metadata: Dict[str, Any]) -> None:
+        container_id = metadata.get("id")
+        if container_id is None:
+            return
+
+        self._removeValues(container_id)
+        if container_id not in self._order:
+            self._order[container_id] = self._next_order
+            self._next_order += 1
+
+        indexed_values = {}
+        for key, values in self._index.items():
+            if key not in metadata:
+                continue
+            value = str(metadata[key])
+            values.setdefault(value, set()).add(container_id)
+            indexed_values[key] = value
+        self._indexed_values[container_id] = indexed_values
+
+    ##  Remove a container from the index.
+    #
+    #   Nothing happens if the container was not indexed.
+    def remove(self, container_id: str) -> None:
+        self._removeValues(container_id)
+        self._indexed_values.pop(container_id, None)
+        self._order.pop(container_id, None)
+
+    ##  Re-index all containers from scratch.
+    #
+    #   \param all_metadata The metadata of all containers, in registration
+    #   order.
+    def rebuild(self, all_metadata: Iterable[Dict[str, Any]]) -> None:
+        self.clear()
+        for metadata in all_metadata:
+            self.add(metadata)
+
+    ##  Find the IDs of the containers that may match the specified criteria.
+    #
+    #   Only the criteria on indexed keys with an exact (non-wildcard) string
+    #   value are used. The other criteria still need to be checked on the
+    #   resulting candidates.
+    #
+    #   \param criteria The query criteria, as passed to findContainersMetadata.
+    #   \return The IDs of the candidates in registration order, or None if
+    #   none of the criteria could be answered from the index.
+    def findCandidates(self, criteria: Dict[str, Any]) -> Optional[List[str]]:
+        id_sets = []
+        for key, value in criteria.items():
+            if key not in self._index or not isinstance(value, str) or "*" in value:
+                continue
+            id_sets.append(self._index[key].get(value, set()))
+        if not id_sets:
+            return None
+
+        # Intersect the smallest sets first so the intermediate results stay small.
+        id_sets.sort(key = len)
+        candidates = set(id_sets[0])
+        for id_set in id_sets[1:]:
+            if not candidates:
+                break
+            candidates &= id_set
+
+        return sorted(candidates, key = self._order.__getitem__)
+
+    def _removeValues(self, container_id: str) -> None:
+        indexed_values = self._indexed_values.get(container_id)
+        if not indexed_values:
+            return
+        for key, value in indexed_values.items():
+            ids = self._index[key].get(value)
+            if ids is None:
+                continue
+            ids.discard(container_id)
+            if not ids:
+                del self._index[key][value]
@@ -0,0 +1,194 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import collections
+import threading
+import time
+import urllib.parse
+from typing import Any, Dict, Optional
+
+from UM.Application import Application
+from UM.Logger import Logger
+from UM.Resources import Resources
+from UM.SaveFile import SaveFile
+from UM.Settings.ContainerRegistry import ContainerRegistry
+
+
+##  Writes containers and other settings files to disk in a background thread.
+#
+#   The containers are serialized on the main thread, so that the files get a
+#   consistent snapshot of them, and are then marked as saved. If writing the
+#   file fails, the container is marked as dirty again. Only writing the files
+#   happens in the background, while holding the lock file of the container
+#   registry. If a file is queued again before it was written, only the latest
+#   contents are written.
+#
+#   Call flush() before saving anything synchronously, so that an older
+#   snapshot can't overwrite a newer file, and discardContainer() before
+#   deleting the file of a container.
+class ContainerSaveWorker:
+    ##  Get the singleton instance for this class.
+    @classmethod
+    def getInstance(cls) -> "ContainerSaveWorker":
+        # Note: Explicit use of class name to prevent issues with inheritance.
+        if not ContainerSaveWorker.__instance:
+            ContainerSaveWorker.__instance = cls()
+        return ContainerSaveWorker.__instance
+
+    __instance = None   # type: "ContainerSaveWorker"
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._pending = collections.OrderedDict()  # type: Dict[str, Any] # For each file path: the contents to write, when they were queued, and the container ID and container, if any.
+        self._writing = {}  # type: Dict[str, Optional[str]] # The files that the thread took from the queue but didn't finish writing yet, with their container IDs.
+        self._thread = None  # type: Optional[threading.Thread]
+
+        # Statistics, to see how much the background saving helps.
+        self._written_count = 0
+        self._coalesced_count = 0
+        self._failed_count = 0
+        self._max_queue_depth = 0
+        self._last_latency = 0.0
+        self._max_latency = 0.0
+        self._total_latency = 0.0
+
+    ##  Serialize all dirty containers and queue them to be written.
+    #
+    #   This must be called on the main thread. Containers that can't be
+    #   written by this worker, like materials that are saved through their
+    #   base file, are saved right away by the container registry.
+    def queueDirtyContainers(self) -> None:
+        registry = ContainerRegistry.getInstance()
+        resource_types = registry.getResourceTypes()
+        for container in registry.findDirtyContainers():
+            if container.getMetaDataEntry("removed"):
+                continue
+
+            container_type = container.getMetaDataEntry("type")
+            mime_type = ContainerRegistry.getMimeTypeForContainer(type(container))
+            if container.getMetaDataEntry("base_file") is not None or mime_type is None or container_type not in resource_types:
+                registry.saveContainer(container)
+                continue
+
+            try:
+                serialized = container.serialize()
+            except NotImplementedError:
+                continue
+            except Exception:
+                Logger.logException("e", "An exception occurred when serializing container %s", container.getId())
+                continue
+
+            file_name = urllib.parse.quote_plus(container.getId()) + "." + mime_type.preferredSuffix
+            path = Resources.getStoragePath(resource_types[container_type], file_name)
+            self.queueFile(path, serialized, container)
+            container.setPath(path)
+            container.setDirty(False)
+
+    ##  Queue a file to be written.
+    #
+    #   If the file was already queued but not written yet, it is written only
+    #   once, with the new contents.
+    #   \param path The file to write.
+    #   \param data The contents of the file.
+    #   \param container (Optional) The container that the file is a snapshot
+    #   of. It is marked as dirty again if the file can't be written.
+    def queueFile(self, path: str, data: str, container: Any = None) -> None:
+        container_id = container.getId() if container is not None else None
+        with self._condition:
+            if path in self._pending:
+                self._coalesced_count += 1
+                del self._pending[path]  # Move it to the back of the queue.
+            self._pending[path] = (data, time.time(), container_id, container)
+            self._max_queue_depth = max(self._max_queue_depth, len(self._pending))
+
+            if self._thread is None:
+                self._thread = threading.Thread(target = self._run, name = "ContainerSaveWorker", daemon = True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    ##  Wait until all queued files are written.
+    def flush(self) -> None:
+        with self._condition:
+            while self._pending or self._writing:
+                self._condition.wait()
+
+    ##  Drop the queued files of a container, and wait until its file is not
+    #   being written anymore.
+    #
+    #   Call this before the file of a container is deleted, so that a queued
+    #   snapshot can't create the file again.
+    #   \param container_id The ID of the container.
+    def discardContainer(self, container_id: str) -> None:
+        with self._condition:
+            for path in [path for path, entry in self._pending.items() if entry[2] == container_id]:
+                del self._pending[path]
+            while container_id in self._writing.values():
+                self._condition.wait()
+            self._condition.notify_all()  # The queue may be empty now.
+
+    ##  Get the number of files that are waiting to be written.
+    def getQueueDepth(self) -> int:
+        with self._condition:
+            return len(self._pending) + len(self._writing)
+
+    ##  Get statistics about the files that were written.
+    #
+    #   \return A dictionary with the current and maximum queue depth, the
+    #   number of files written, coalesced and failed, and the last, maximum
+    #   and average time in seconds between queueing a file and writing it.
+    def getMetrics(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "queue_depth": len(self._pending) + len(self._writing),
+                "max_queue_depth": self._max_queue_depth,
+                "written": self._written_count,
+                "coalesced": self._coalesced_count,
+                "failed": self._failed_count,
+                "last_latency": self._last_latency,
+                "max_latency": self._max_latency,
+                "average_latency": self._total_latency / self._written_count if self._written_count else 0.0
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._pending:
+                    self._condition.wait()
+                path, (data, queued_time, container_id, container) = self._pending.popitem(last = False)
+                self._writing[path] = container_id
+
+            failed = True
+            try:
+                with self._lockFile():
+                    with SaveFile(path, "wt") as f:
+                        f.write(data)
+                failed = False
+            except Exception:
+                Logger.logException("e", "Failed to save %s in the background", path)
+            finally:
+                with self._condition:
+                    del self._writing[path]
+                    if failed:
+                        self._failed_count += 1
+                        if container is not None:
+                            Application.getInstance().callLater(self._onWriteFailed, container)
+                    else:
+                        latency = time.time() - queued_time
+                        self._written_count += 1
+                        self._last_latency = latency
+                        self._max_latency = max(self._max_latency, latency)
+                        self._total_latency += latency
+                    if not self._pending and not self._writing:
+                        Logger.log("d", "Background saving done: %d files written, %d writes coalesced, last latency %.3f s", self._written_count, self._coalesced_count, self._last_latency)
+                    self._condition.notify_all()
+
+    ##  Lock the configuration directory against other instances of Cura,
+    #   like the container registry does when it saves.
+    def _lockFile(self):
+        return ContainerRegistry.getInstance().lockFile()
+
+    ##  Mark a container as dirty again after its file failed to be written,
+    #   so that it is saved again later. Called on the main thread.
+    def _onWriteFailed(self, container: Any) -> None:
+        if not container.getMetaDataEntry("removed"):
+            container.setDirty(True)
@@ -5,18 +5,23 @@ import os
 import os.path
 import re
 import configparser
+import collections
+import time
+import urllib.parse
 
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from PyQt5.QtWidgets import QMessageBox
 
 from UM.Decorators import override
+from UM.Settings.ContainerQuery import ContainerQuery
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.Settings.ContainerStack import ContainerStack
 from UM.Settings.InstanceContainer import InstanceContainer
 from UM.Application import Application
 from UM.Logger import Logger
 from UM.Message import Message
+from UM.MimeTypeDatabase import MimeTypeDatabase, MimeTypeNotFoundError
 from UM.Platform import Platform
 from UM.PluginRegistry import PluginRegistry  # For getting the possible profile writers to write with.
 from UM.Util import parseBool
@@ -24,6 +29,9 @@ from UM.Resources import Resources
 
 from . import ExtruderStack
 from . import GlobalStack
+from .ContainerMetadataCache import ContainerMetadataCache
+from .ContainerMetadataIndex import ContainerMetadataIndex
+from .ContainerSaveWorker import ContainerSaveWorker
 from .ContainerManager import ContainerManager
 from .ExtruderManager import ExtruderManager
 
@@ -32,6 +40,21 @@ from cura.CuraApplication import CuraApplication
 from UM.i18n import i18nCatalog
 catalog = i18nCatalog("cura")
 
+##  Metadata dictionary that remembers which container IDs were added to it.
+#
+#   While all metadata is loaded, this finds the sub-containers that a
+#   provider added for a container file without comparing the whole registry.
+class _RecordingMetadataDict(dict):
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.added_ids = []  # type: List[str]
+
+    def __setitem__(self, key: str, value: Dict[str, Any]) -> None:
+        if key not in self:
+            self.added_ids.append(key)
+        super().__setitem__(key, value)
+
+
 class CuraContainerRegistry(ContainerRegistry):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -41,6 +64,11 @@ class CuraContainerRegistry(ContainerRegistry):
         # is added, we check to see if an extruder stack needs to be added.
         self.containerAdded.connect(self._onContainerAdded)
 
+        # Secondary indexes on the metadata keys that are queried most often (type, definition, material, ...), so
+        # that finding e.g. all qualities for a machine and material doesn't need to scan every container.
+        self._metadata_index = ContainerMetadataIndex()
+        self.containerMetaDataChanged.connect(self._updateMetadataIndexFor)
+
     ##  Overridden from ContainerRegistry
     #
     #   Adds a container to the registry.
@@ -63,6 +91,73 @@ class CuraContainerRegistry(ContainerRegistry):
 
         super().addContainer(container)
 
+        metadata = self.metadata.get(container.getId())
+        if metadata is not None:
+            self._metadata_index.add(metadata)
+
+    ##  Overridden from ContainerRegistry
+    #
+    #   Removes a container from the registry and from the metadata index.
+    #   Snapshots of it that are still waiting to be saved in the background
+    #   are dropped first, so that they can't bring back its file.
+    @override(ContainerRegistry)
+    def removeContainer(self, container_id: str) -> None:
+        ContainerSaveWorker.getInstance().discardContainer(container_id)
+        super().removeContainer(container_id)
+        self._metadata_index.remove(container_id)
+
+    ##  Overridden from ContainerRegistry
+    #
+    #   Finds the metadata of containers matching the criteria, using the
+    #   metadata index to limit the number of containers that need to be
+    #   checked.
+    #
+    #   Queries on an exact ID are already fast and can lazy-load the container,
+    #   and case-insensitive queries can't use the index. Those are passed on to
+    #   the ContainerRegistry as-is.
+    @override(ContainerRegistry)
+    def findContainersMetadata(self, *, ignore_case = False, **kwargs) -> List[Dict[str, Any]]:
+        container_id = kwargs.get("id")
+        if ignore_case or (isinstance(container_id, str) and "*" not in container_id):
+            return super().findContainersMetadata(ignore_case = ignore_case, **kwargs)
+
+        self._updateMetadataIndex()
+        candidate_ids = self._metadata_index.findCandidates(kwargs)
+        if candidate_ids is None:  # None of the criteria are indexed.
+            return super().findContainersMetadata(ignore_case = ignore_case, **kwargs)
+        if not candidate_ids:
+            return []
+
+        candidates = [self.metadata[candidate_id] for candidate_id in candidate_ids if candidate_id in self.metadata]
+        query = ContainerQuery(self, ignore_case = ignore_case, **kwargs)
+        query.execute(candidates = candidates)
+        return query.getResult()
+
+    ##  Bring the metadata index up to date with the metadata in the registry.
+    #
+    #   Metadata can be put in the registry without going through addContainer,
+    #   e.g. by loadAllMetadata or by lazy-loading a single container's metadata.
+    #   Those entries are indexed here before the next query.
+    def _updateMetadataIndex(self) -> None:
+        if self._metadata_index.hasContainerIds(self.metadata.keys()):
+            return
+
+        indexed_ids = self._metadata_index.getContainerIds()
+        for container_id in indexed_ids - set(self.metadata.keys()):
+            self._metadata_index.remove(container_id)
+        for container_id, metadata in self.metadata.items():
+            if container_id not in indexed_ids:
+                self._metadata_index.add(metadata)
+
+    ##  Re-index a container when its metadata changed.
+    #
+    #   The ContainerRegistry has already put the new metadata in the registry
+    #   when it emits containerMetaDataChanged.
+    def _updateMetadataIndexFor(self, container, *args) -> None:
+        metadata = self.metadata.get(container.getId())
+        if metadata is not None:
+            self._metadata_index.add(metadata)
+
     ##  Create a name that is not empty and unique
     #   \param container_type \type{string} Type of the container (machine, quality, ...)
     #   \param current_name \type{} Current name of the container, which may be an acceptable option
@@ -264,6 +359,142 @@ class CuraContainerRegistry(ContainerRegistry):
         # If it hasn't returned by now, none of the plugins loaded the profile successfully.
         return {"status": "error", "message": catalog.i18nc("@info:status", "Profile {0} has an unknown file type or is corrupted.", file_name)}
 
+    ##  Overridden from ContainerRegistry
+    #
+    #   Loads the metadata of all containers, without deserializing the
+    #   containers themselves. Those are only loaded when they are first
+    #   requested.
+    #
+    #   The metadata of definitions, qualities, variants and materials is taken
+    #   from the container metadata cache if their files didn't change since
+    #   the last run. The time spent per type of container is logged.
+    @override(ContainerRegistry)
+    def loadAllMetadata(self) -> None:
+        start_time = time.time()
+        metadata_cache = ContainerMetadataCache(Resources.getStoragePath(Resources.Cache, "container_metadata.json"), "{version}-{setting_version}".format(version = Application.getInstance().getVersion(), setting_version = CuraApplication.SettingVersion))
+        metadata_cache.load()
+        cacheable_files, dependency_stamps = self._findCacheableContainerFiles()
+        cached_metadata = {}  # type: Dict[str, List[Dict[str, Any]]]
+        for container_id, file_path in cacheable_files.items():
+            metadata = metadata_cache.get(container_id, file_path, dependency_stamps.get(container_id))
+            if metadata is not None:
+                cached_metadata[container_id] = metadata
+        cache_time = time.time() - start_time
+
+        load_times = collections.defaultdict(float)  # type: Dict[str, float]
+        load_counts = collections.defaultdict(int)  # type: Dict[str, int]
+        # Remember which containers are added, to find the sub-containers that a provider adds for a file.
+        recorded_metadata = _RecordingMetadataDict(self.metadata)
+        self.metadata = recorded_metadata
+        try:
+            cached_count = self._loadProviderMetadata(metadata_cache, cacheable_files, dependency_stamps, cached_metadata, load_times, load_counts)
+        finally:
+            self.metadata = dict(recorded_metadata)
+
+        # Let the ContainerRegistry pick up anything that was missed and clear its query caches.
+        super().loadAllMetadata()
+
+        metadata_cache.prune(cacheable_files.keys())
+        metadata_cache.save()
+
+        Logger.log("d", "Loading container metadata took {total:.3f}s, of which {cache:.3f}s reading the cache. {cached} containers were taken from the cache.".format(total = time.time() - start_time, cache = cache_time, cached = cached_count))
+        for container_type in sorted(load_times, key = load_times.get, reverse = True):
+            Logger.log("d", "  {container_type}: {count} files in {time:.3f}s".format(container_type = container_type, count = load_counts[container_type], time = load_times[container_type]))
+
+    ##  Load the metadata of all containers of all providers, taking it from
+    #   the metadata cache where possible and storing what was parsed in it.
+    #
+    #   This must be called while self.metadata is a _RecordingMetadataDict.
+    #   \return The number of containers that were taken from the cache.
+    def _loadProviderMetadata(self, metadata_cache: ContainerMetadataCache, cacheable_files: Dict[str, str], dependency_stamps: Dict[str, str],
+                              cached_metadata: Dict[str, List[Dict[str, Any]]], load_times: Dict[str, float], load_counts: Dict[str, int]) -> int:
+        cached_count = 0
+        for provider in self._providers:
+            for container_id in list(provider.getAllIds()):  # Copy, since loading metadata can add IDs.
+                if container_id in self.metadata:
+                    continue
+                container_start_time = time.time()
+                file_path = cacheable_files.get(container_id)
+
+                if container_id in cached_metadata:
+                    for metadata in cached_metadata[container_id]:
+                        self.metadata[metadata["id"]] = metadata
+                        self.source_provider[metadata["id"]] = provider
+                    metadata = self.metadata.get(container_id)
+                    cached_count += 1
+                else:
+                    self.metadata.added_ids = []
+                    metadata = provider.loadMetadata(container_id)
+                    if metadata is None:
+                        continue
+                    self.metadata[container_id] = metadata
+                    self.source_provider[container_id] = provider
+                    if file_path:
+                        # The provider registers the metadata of the container and of its sub-containers (e.g. the per-machine materials).
+                        new_metadata = [self.metadata[added_id] for added_id in self.metadata.added_ids] or [metadata]
+                        metadata_cache.put(container_id, file_path, new_metadata, dependency_stamps.get(container_id))
+
+                if metadata is None:
+                    continue
+                container_type = metadata.get("type", "unknown")
+                load_times[container_type] += time.time() - container_start_time
+                load_counts[container_type] += 1
+        return cached_count
+
+    ##  Get the files of the containers whose metadata may be cached between
+    #   runs: definitions, qualities, variants and materials.
+    #
+    #   User changes and stacks change all the time, so they are always parsed.
+    #   The metadata of definitions depends on the definitions they inherit
+    #   from, so definitions get a dependency stamp of all definition files.
+    #   Materials are split per machine and variant, by looking up the
+    #   definitions and variants, so materials get a stamp of all definition
+    #   and variant files. Saving a material then only invalidates the entry
+    #   of that material. Qualities and variants only depend on their own
+    #   file.
+    #
+    #   \return A dictionary of container ID to the file it is loaded from, and
+    #   a dictionary of container ID to the dependency stamp of the containers
+    #   whose metadata depends on other files.
+    def _findCacheableContainerFiles(self) -> Tuple[Dict[str, str], Dict[str, str]]:
+        definition_files = self._findContainerFiles([Resources.DefinitionContainers])
+        quality_files = self._findContainerFiles([CuraApplication.ResourceTypes.QualityInstanceContainer])
+        variant_files = self._findContainerFiles([CuraApplication.ResourceTypes.VariantInstanceContainer])
+        material_files = self._findContainerFiles([CuraApplication.ResourceTypes.MaterialInstanceContainer])
+
+        definition_stamp = ContainerMetadataCache.getFilesStamp(definition_files.values())
+        material_stamp = ContainerMetadataCache.getFilesStamp(list(definition_files.values()) + list(variant_files.values()))
+        cacheable_files = {}  # type: Dict[str, str]
+        dependency_stamps = {}  # type: Dict[str, str]
+        for files, dependency_stamp in ((definition_files, definition_stamp), (quality_files, None), (variant_files, None), (material_files, material_stamp)):
+            for container_id, file_path in files.items():
+                if container_id in cacheable_files:
+                    continue  # Same priority as the providers: the first one found wins.
+                cacheable_files[container_id] = file_path
+                if dependency_stamp is not None:
+                    dependency_stamps[container_id] = dependency_stamp
+        return cacheable_files, dependency_stamps
+
+    ##  Find the container files of the given resource types.
+    #
+    #   \return A dictionary of container ID to the file it is loaded from.
+    def _findContainerFiles(self, resource_types: List[int]) -> Dict[str, str]:
+        result = {}  # type: Dict[str, str]
+        for resource_type in resource_types:
+            try:
+                file_paths = Resources.getAllResourcesOfType(resource_type)
+            except Exception as e:  # Unknown resource type or unreadable directory. The providers will report this properly.
+                Logger.log("w", "Could not list container files of resource type {resource_type}: {error}".format(resource_type = resource_type, error = str(e)))
+                continue
+            for file_path in file_paths:
+                try:
+                    mime_type = MimeTypeDatabase.getMimeTypeForFile(file_path)
+                except MimeTypeNotFoundError:
+                    continue  # Not a container file.
+                container_id = urllib.parse.unquote_plus(mime_type.stripExtension(os.path.basename(file_path)))
+                result.setdefault(container_id, file_path)  # Same priority as the providers: the first one found wins.
+        return result
+
     @override(ContainerRegistry)
     def load(self):
         super().load()
@@ -0,0 +1,48 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from UM.Decorators import override
+from UM.Settings.InstanceContainer import InstanceContainer
+
+
+##  The instance container with the per-object settings of a node.
+#
+#   Copies of a node can share their per-object stack. This container lets the
+#   stack be un-shared right before a setting is actually written, instead of
+#   when the settings are only looked at.
+class PerObjectInstanceContainer(InstanceContainer):
+    def __init__(self, container_id, *args, **kwargs):
+        super().__init__(container_id, *args, **kwargs)
+        self._before_change_callback = None
+
+    ##  Sets the function to call before a setting in this container changes.
+    #
+    #   \param callback A function without arguments, or None.
+    def setBeforeChangeCallback(self, callback):
+        self._before_change_callback = callback
+
+    @override(InstanceContainer)
+    def setProperty(self, *args, **kwargs):
+        self._beforeChange()
+        return super().setProperty(*args, **kwargs)
+
+    @override(InstanceContainer)
+    def addInstance(self, *args, **kwargs):
+        self._beforeChange()
+        return super().addInstance(*args, **kwargs)
+
+    @override(InstanceContainer)
+    def removeInstance(self, *args, **kwargs):
+        self._beforeChange()
+        return super().removeInstance(*args, **kwargs)
+
+    def __deepcopy__(self, memo):
+        new_container = super().__deepcopy__(memo)
+        if type(new_container) is not type(self):  # In case the base class creates a plain instance container.
+            new_container.__class__ = type(self)
+        new_container._before_change_callback = None  # The copy belongs to a different stack.
+        return new_container
+
+    def _beforeChange(self):
+        if self._before_change_callback is not None:
+            self._before_change_callback()
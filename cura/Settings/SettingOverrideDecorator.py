@@ -2,21 +2,29 @@
 # Cura is released under the terms of the LGPLv3 or higher.
 
 import copy
+import uuid
+import weakref
 
 from UM.Scene.SceneNodeDecorator import SceneNodeDecorator
+from UM.Scene.Selection import Selection
 from UM.Signal import Signal, signalemitter
-from UM.Settings.InstanceContainer import InstanceContainer
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from UM.Logger import Logger
 
 from UM.Application import Application
 
 from cura.Settings.PerObjectContainerStack import PerObjectContainerStack
+from cura.Settings.PerObjectInstanceContainer import PerObjectInstanceContainer
 from cura.Settings.ExtruderManager import ExtruderManager
 
 ##  A decorator that adds a container stack to a Node. This stack should be queried for all settings regarding
 #   the linked node. The Stack in question will refer to the global stack (so that settings that are not defined by
 #   this stack still resolve.
+#
+#   Copies of a decorator share the stack of the original, so that multiplying an object doesn't create a stack for
+#   every copy that all need to be updated when a setting changes. Right before a setting of a shared stack is
+#   written, the selected objects keep the stack and the other objects move to a copy of it (see _StackUsers). A stack
+#   is removed from the registry when no decorator uses it any more.
 @signalemitter
 class SettingOverrideDecorator(SceneNodeDecorator):
     ##  Event indicating that the user selected a different extruder.
@@ -30,34 +38,29 @@ class SettingOverrideDecorator(SceneNodeDecorator):
     #   g-code in the volume of the mesh.
     _non_printing_mesh_settings = {"anti_overhang_mesh", "infill_mesh", "cutting_mesh"}
 
-    def __init__(self):
+    ##  Creates a new decorator.
+    #
+    #   \param share_stack_of (Optional) Another decorator to share the
+    #   per-object stack with, instead of creating a new stack.
+    def __init__(self, share_stack_of = None):
         super().__init__()
-        self._stack = PerObjectContainerStack(stack_id = "per_object_stack_" + str(id(self)))
-        self._stack.setDirty(False)  # This stack does not need to be saved.
-        self._stack.addContainer(InstanceContainer(container_id = "SettingOverrideInstanceContainer"))
-        self._extruder_stack = ExtruderManager.getInstance().getExtruderStack(0).getId()
-
-        self._stack.propertyChanged.connect(self._onSettingChanged)
-
-        Application.getInstance().getContainerRegistry().addContainer(self._stack)
+        self._stack = None
+        self._stack_users = None  # The decorators that share self._stack, including this one.
+        if share_stack_of is not None:
+            self._extruder_stack = share_stack_of._extruder_stack
+            self._setStackUsers(share_stack_of._stack_users)
+        else:
+            self._extruder_stack = ExtruderManager.getInstance().getExtruderStack(0).getId()
+            self._setStackUsers(_StackUsers(self._createStack(PerObjectInstanceContainer(container_id = "SettingOverrideInstanceContainer"))))
 
         Application.getInstance().globalContainerStackChanged.connect(self._updateNextStack)
         self.activeExtruderChanged.connect(self._updateNextStack)
         self._updateNextStack()
 
+    ##  Copies share the stack with this decorator until one of them gets
+    #   edited.
     def __deepcopy__(self, memo):
-        ## Create a fresh decorator object
-        deep_copy = SettingOverrideDecorator()
-        ## Copy the instance
-        instance_container = copy.deepcopy(self._stack.getContainer(0), memo)
-
-        ## Set the copied instance as the first (and only) instance container of the stack.
-        deep_copy._stack.replaceContainer(0, instance_container)
-
-        # Properly set the right extruder on the copy
-        deep_copy.setActiveExtruder(self._extruder_stack)
-
-        return deep_copy
+        return SettingOverrideDecorator(share_stack_of = self)
 
     ##  Gets the currently active extruder to print this object with.
     #
@@ -113,6 +116,8 @@ class SettingOverrideDecorator(SceneNodeDecorator):
     #
     #   \param extruder_stack_id The new extruder stack to print with.
     def setActiveExtruder(self, extruder_stack_id):
+        if extruder_stack_id != self._extruder_stack:
+            self._detachStack()  # The extruder is below the stack, so the copies must not follow.
         self._extruder_stack = extruder_stack_id
         self._updateNextStack()
         ExtruderManager.getInstance().resetSelectedObjectExtruders()
@@ -120,3 +125,99 @@ class SettingOverrideDecorator(SceneNodeDecorator):
 
     def getStack(self):
         return self._stack
+
+    ##  Gives this node a copy of its stack if the stack is shared with copies
+    #   of this node.
+    def _detachStack(self):
+        if len(self._stack_users.decorators) > 1:
+            self._stack_users.moveToCopy([self])
+
+    def _createStack(self, instance_container):
+        stack = PerObjectContainerStack(stack_id = "per_object_stack_" + str(uuid.uuid4()))  # Not the id() of a decorator, which may be reused after it's deleted.
+        stack.setDirty(False)  # This stack does not need to be saved.
+        stack.addContainer(instance_container)
+        Application.getInstance().getContainerRegistry().addContainer(stack)
+        return stack
+
+    def _setStackUsers(self, stack_users):
+        if self._stack is not None:
+            self._stack.propertyChanged.disconnect(self._onSettingChanged)
+            self._stack_users.remove(self)
+
+        self._stack = stack_users.stack
+        self._stack_users = stack_users
+        self._stack_users.add(self)
+        self._stack.propertyChanged.connect(self._onSettingChanged)
+
+    def _isSelected(self):
+        return self._node is not None and Selection.isSelected(self._node)
+
+
+##  The decorators that share a per-object stack.
+class _StackUsers:
+    def __init__(self, stack):
+        self.stack = stack
+        self.decorators = weakref.WeakSet()
+        self._finalizers = weakref.WeakKeyDictionary()  # For each decorator, what to do when it's garbage collected.
+        self._removed = False
+        stack.getContainer(0).setBeforeChangeCallback(self._beforeChange)
+
+    ##  Starts sharing the stack with a decorator.
+    def add(self, decorator):
+        self.decorators.add(decorator)
+        finalizer = weakref.finalize(decorator, self._onDecoratorDeleted)
+        finalizer.atexit = False  # The registry is going away too.
+        self._finalizers[decorator] = finalizer
+
+    ##  Stops sharing the stack with a decorator.
+    #
+    #   If no other decorator uses the stack, it is removed from the registry.
+    def remove(self, decorator):
+        self.decorators.discard(decorator)
+        finalizer = self._finalizers.pop(decorator, None)
+        if finalizer is not None:
+            finalizer.detach()
+        self._removeStackIfUnused()
+
+    ##  Moves some of the decorators to a copy of the stack, which they share.
+    #
+    #   The copy is made from the settings as they are now.
+    #
+    #   \param decorators The decorators to move.
+    def moveToCopy(self, decorators):
+        instance_container = copy.deepcopy(self.stack.getContainer(0))
+        stack_users = _StackUsers(decorators[0]._createStack(instance_container))
+        for decorator in decorators:
+            decorator._setStackUsers(stack_users)
+            decorator._updateNextStack()
+            if decorator._node is not None:
+                decorator._node.decoratorsChanged.emit(decorator._node)  # Let listeners connect to the new stack.
+
+    ##  Called right before a setting of the shared stack is written.
+    #
+    #   Settings are edited for the selected object, so only the selected
+    #   objects keep this stack and get the change. The other objects keep the
+    #   settings as they were, in a copy of the stack. If none of the objects is
+    #   selected, the change applies to all of them.
+    def _beforeChange(self):
+        decorators = list(self.decorators)
+        if len(decorators) <= 1:
+            return
+        selected = [decorator for decorator in decorators if decorator._isSelected()]
+        if not selected or len(selected) == len(decorators):
+            return
+        self.moveToCopy([decorator for decorator in decorators if decorator not in selected])
+
+    ##  Called when a decorator that used the stack was garbage collected, for
+    #   instance because its node was deleted.
+    #
+    #   That may happen in the middle of anything, so the stack is removed
+    #   later.
+    def _onDecoratorDeleted(self):
+        Application.getInstance().callLater(self._removeStackIfUnused)
+
+    def _removeStackIfUnused(self):
+        if self._removed or list(self.decorators):  # Iterating skips the decorators that were just deleted.
+            return
+        self._removed = True
+        Application.getInstance().getContainerRegistry().removeContainer(self.stack.getId())
@@ -6,6 +6,12 @@ from UM.Math.Polygon import Polygon
 
 ##  Polygon representation as an array for use with Arrange
 class ShapeArray:
+    ##  Arrays that were filled before, by shape and vertices relative to their
+    #   minimum. Copies of a model have the same hull at different positions,
+    #   so they can share one array.
+    _array_cache = {}
+    _max_array_cache_size = 256
+
     def __init__(self, arr, offset_x, offset_y, scale = 1):
         self.arr = arr
         self.offset_x = offset_x
@@ -25,14 +31,32 @@ class ShapeArray:
         flip_vertices[:, 1] = vertices[:, 0]
         flip_vertices = flip_vertices[::-1]
         # offset, we want that all coordinates have positive values
-        offset_y = int(numpy.amin(flip_vertices[:, 0]))
-        offset_x = int(numpy.amin(flip_vertices[:, 1]))
-        flip_vertices[:, 0] = numpy.add(flip_vertices[:, 0], -offset_y)
-        flip_vertices[:, 1] = numpy.add(flip_vertices[:, 1], -offset_x)
+        # The polygon is filled relative to its exact minimum, so that the same hull at another position gives the same
+        # array. That array is then placed at the nearest whole offset.
+        minimum = numpy.amin(flip_vertices, axis = 0)
+        flip_vertices = flip_vertices - minimum
+        offset_y = int(numpy.round(minimum[0]))
+        offset_x = int(numpy.round(minimum[1]))
         shape = [int(numpy.amax(flip_vertices[:, 0])), int(numpy.amax(flip_vertices[:, 1]))]
-        arr = cls.arrayFromPolygon(shape, flip_vertices)
+        arr = cls._cachedArrayFromPolygon(shape, flip_vertices)
         return cls(arr, offset_x, offset_y)
 
+    ##  Like arrayFromPolygon, but reuses the array of earlier calls with the
+    #   same polygon. The returned array is shared, so it must not be changed.
+    #
+    #   \param vertices The vertices, relative to their minimum.
+    @classmethod
+    def _cachedArrayFromPolygon(cls, shape, vertices):
+        key = (tuple(shape), numpy.round(vertices, 3).tobytes())  # Round off the noise of moving hulls around.
+        arr = cls._array_cache.get(key)
+        if arr is None:
+            arr = cls.arrayFromPolygon(shape, vertices)
+            arr.flags.writeable = False
+            if len(cls._array_cache) >= cls._max_array_cache_size:
+                cls._array_cache.clear()
+            cls._array_cache[key] = arr
+        return arr
+
     ##  Instantiate an offset and hull ShapeArray from a scene node.
     #   \param node source node where the convex hull must be present
     #   \param min_offset offset for the offset ShapeArray
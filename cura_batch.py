@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+##  Slices a list of jobs without showing the interface.
+#
+#   Usage: cura_batch.py jobs.json [--workers N] [--report report.json]
+#   See cura.BatchSlicer.loadBatchJobs for the format of the job file.
+
+import argparse
+import faulthandler
+import sys
+
+parser = argparse.ArgumentParser(prog = "cura_batch",
+                                 description = "Slice a list of jobs without showing the interface.")
+parser.add_argument("jobs",
+                    help = "A JSON file with the jobs to slice."
+                    )
+parser.add_argument("--workers",
+                    type = int,
+                    default = 1,
+                    help = "How many engine processes to slice with at the same time."
+                    )
+parser.add_argument("--report",
+                    default = None,
+                    help = "A JSON file to write the timings and results of each job to."
+                    )
+parser.add_argument('--debug',
+                    action='store_true',
+                    default = False,
+                    help = "Turn on the debug mode by setting this option."
+                    )
+batch_args = parser.parse_args()
+
+# The application parses the command line again. It should only see the options for the application itself.
+sys.argv = [sys.argv[0], "--headless"]
+if batch_args.debug:
+    sys.argv.append("--debug")
+
+# Workaround for a race condition on certain systems where there
+# is a race condition between Arcus and PyQt. Importing Arcus
+# first seems to prevent Sip from going into a state where it
+# tries to create PyQt objects on a non-main thread.
+import Arcus #@UnusedImport
+import cura.CuraApplication
+import cura.Settings.CuraContainerRegistry
+from cura.BatchSlicer import BatchSlicer, loadBatchJobs
+
+from PyQt5.QtCore import QTimer
+
+faulthandler.enable()
+
+jobs = loadBatchJobs(batch_args.jobs)
+
+# Force an instance of CuraContainerRegistry to be created and reused later.
+cura.Settings.CuraContainerRegistry.CuraContainerRegistry.getInstance()
+
+application_parser = argparse.ArgumentParser(prog = "cura", add_help = False)
+known_args = {"debug": batch_args.debug, "headless": True, "file": []}
+if not cura.CuraApplication.CuraApplication.preStartUp(parser = application_parser, parsed_command_line = known_args):
+    sys.exit(0)
+
+app = cura.CuraApplication.CuraApplication.getInstance(parser = application_parser, parsed_command_line = known_args)
+
+exit_code = 1
+def runBatch():
+    global exit_code
+    try:
+        exit_code = 0 if BatchSlicer(jobs, batch_args.workers, batch_args.report).run() else 1
+    finally:
+        app.quit()
+
+# Start slicing once the application has started and loaded its plug-ins.
+QTimer.singleShot(0, runBatch)
+app.run()
+sys.exit(exit_code)
@@ -1,6 +1,7 @@
 # Copyright (c) 2015 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+import hashlib
 import os.path
 import zipfile
 
@@ -43,6 +44,7 @@ class ThreeMFReader(MeshReader):
         }
         self._base_name = ""
         self._unit = None
+        self._mesh_data_cache = {}  # The mesh data read so far from the current file, by a hash of the mesh in the file.
 
     def _createMatrixFromTransformationString(self, transformation):
         if transformation == "":
@@ -80,16 +82,9 @@ class ThreeMFReader(MeshReader):
         um_node = SceneNode()
         transformation = self._createMatrixFromTransformationString(savitar_node.getTransformation())
         um_node.setTransformation(transformation)
-        mesh_builder = MeshBuilder()
-
-        data = numpy.fromstring(savitar_node.getMeshData().getFlatVerticesAsBytes(), dtype=numpy.float32)
-
-        vertices = numpy.resize(data, (int(data.size / 3), 3))
-        mesh_builder.setVertices(vertices)
-        mesh_builder.calculateNormals(fast=True)
-        mesh_data = mesh_builder.build()
 
-        if len(mesh_data.getVertices()):
+        mesh_data = self._getMeshData(savitar_node.getMeshData())
+        if mesh_data is not None:
             um_node.setMeshData(mesh_data)
 
         for child in savitar_node.getChildren():
@@ -145,14 +140,31 @@ class ThreeMFReader(MeshReader):
             um_node.addDecorator(sliceable_decorator)
         return um_node
 
-    def read(self, file_name):
-        result = []
+    ##  Parse the model in a 3MF file, without turning it into scene nodes yet.
+    #
+    #   This doesn't depend on the active machine, so when loading a project it
+    #   can be done while the machine is still being loaded.
+    #   \param file_name The 3MF file to parse.
+    #   \return The parsed Savitar scene, which can be passed to read().
+    def parseScene(self, file_name):
         # The base object of 3mf is a zipped archive.
+        with zipfile.ZipFile(file_name, "r") as archive:
+            model = archive.read("3D/3dmodel.model")
+        parser = Savitar.ThreeMFParser()
+        return parser.parse(model)
+
+    ##  Read the scene nodes from a 3MF file.
+    #
+    #   \param file_name The 3MF file to read.
+    #   \param scene_3mf (Optional) The scene as parsed by parseScene(), if
+    #   that was done already.
+    def read(self, file_name, scene_3mf = None):
+        result = []
+        self._mesh_data_cache = {}
         try:
-            archive = zipfile.ZipFile(file_name, "r")
             self._base_name = os.path.basename(file_name)
-            parser = Savitar.ThreeMFParser()
-            scene_3mf = parser.parse(archive.open("3D/3dmodel.model").read())
+            if scene_3mf is None:
+                scene_3mf = self.parseScene(file_name)
             self._unit = scene_3mf.getUnit()
             for node in scene_3mf.getSceneNodes():
                 um_node = self._convertSavitarNodeToUMNode(node)
@@ -209,9 +221,42 @@ class ThreeMFReader(MeshReader):
         except Exception:
             Logger.logException("e", "An exception occurred in 3mf reader.")
             return []
+        finally:
+            self._mesh_data_cache = {}
 
         return result
 
+    ##  Convert the mesh of a Savitar node to mesh data.
+    #
+    #   The vertices of the faces are looked up in a single copy. Meshes that
+    #   are in the file more than once, such as copies of an object on the build
+    #   plate, share their mesh data.
+    #   \param savitar_mesh_data The Savitar mesh to convert.
+    #   \return The mesh data, or None if the mesh has no faces.
+    def _getMeshData(self, savitar_mesh_data):
+        vertices_bytes = savitar_mesh_data.getVerticesAsBytes()
+        faces_bytes = savitar_mesh_data.getFacesAsBytes()
+        if not vertices_bytes or not faces_bytes:
+            return None
+
+        mesh_hash = hashlib.sha1(vertices_bytes)
+        mesh_hash.update(faces_bytes)
+        key = mesh_hash.digest()
+        if key in self._mesh_data_cache:
+            return self._mesh_data_cache[key]
+
+        vertices = numpy.frombuffer(vertices_bytes, dtype = numpy.float32).reshape(-1, 3)
+        faces = numpy.frombuffer(faces_bytes, dtype = numpy.int32).reshape(-1, 3)
+        mesh_builder = MeshBuilder()
+        # Every corner of a face gets a vertex of its own, so that each face is rendered flat with its own normal.
+        # With shared vertices, the normals would be averaged and the faces smoothed.
+        mesh_builder.setVertices(vertices[faces].reshape(-1, 3))
+        mesh_builder.calculateNormals(fast = True)
+        mesh_data = mesh_builder.build()
+
+        self._mesh_data_cache[key] = mesh_data
+        return mesh_data
+
     ##  Create a scale vector based on a unit string.
     #   The core spec defines the following:
     #   * micron
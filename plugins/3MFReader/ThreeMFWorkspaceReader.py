@@ -26,10 +26,12 @@ from cura.Settings.CuraContainerStack import _ContainerIndexes
 from cura.QualityManager import QualityManager
 
 from configparser import ConfigParser
+import concurrent.futures
 import zipfile
 import io
 import configparser
 import os
+import time
 
 i18n_catalog = i18nCatalog("cura")
 
@@ -61,6 +63,13 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
 
         self._id_mapping = {}
 
+        # The contents of the project file are read once and then shared between preRead() and read().
+        self._archive_file_name = None  # The project file that the cached contents are of.
+        self._archive_modified_time = None  # When that file was last modified, so a changed file is read again.
+        self._archive_files = {}  # The decoded Cura/ files in the project, by their name in the archive.
+        self._stack_types = {}  # The stack type of each .stack.cfg file, by its name in the archive.
+        self._preread_instance_containers = {}  # Instance containers deserialized by preRead(), by their name in the archive.
+
         # In Cura 2.5 and 2.6, the empty profiles used to have those long names
         self._old_empty_profile_id_dict = {"empty_%s" % k: "empty" for k in ["material", "variant"]}
 
@@ -76,7 +85,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
     #   In old versions, extruder stack files have the same suffix as container stack files ".stack.cfg".
     #
     def _determineGlobalAndExtruderStackFiles(self, project_file_name, file_list):
-        archive = zipfile.ZipFile(project_file_name, "r")
+        self._loadArchive(project_file_name)
 
         global_stack_file_list = [name for name in file_list if name.endswith(self._global_stack_suffix)]
         extruder_stack_file_list = [name for name in file_list if name.endswith(self._extruder_stack_suffix)]
@@ -84,20 +93,21 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         # separate container stack files and extruder stack files
         files_to_determine = [name for name in file_list if name.endswith(self._container_stack_suffix)]
         for file_name in files_to_determine:
-            # FIXME: HACK!
-            # We need to know the type of the stack file, but we can only know it if we deserialize it.
-            # The default ContainerStack.deserialize() will connect signals, which is not desired in this case.
-            # Since we know that the stack files are INI files, so we directly use the ConfigParser to parse them.
-            serialized = archive.open(file_name).read().decode("utf-8")
-            stack_config = ConfigParser()
-            stack_config.read_string(serialized)
+            if file_name not in self._stack_types:
+                # FIXME: HACK!
+                # We need to know the type of the stack file, but we can only know it if we deserialize it.
+                # The default ContainerStack.deserialize() will connect signals, which is not desired in this case.
+                # Since we know that the stack files are INI files, so we directly use the ConfigParser to parse them.
+                stack_config = ConfigParser()
+                stack_config.read_string(self._archive_files[file_name])
+                self._stack_types[file_name] = stack_config.get("metadata", "type", fallback = None)
 
             # sanity check
-            if not stack_config.has_option("metadata", "type"):
+            stack_type = self._stack_types[file_name]
+            if stack_type is None:
                 Logger.log("e", "%s in %s doesn't seem to be valid stack file", file_name, project_file_name)
                 continue
 
-            stack_type = stack_config.get("metadata", "type")
             if stack_type == "extruder_train":
                 extruder_stack_file_list.append(file_name)
             elif stack_type == "machine":
@@ -126,8 +136,9 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         variant_type_name = i18n_catalog.i18nc("@label", "Nozzle")
 
         # Check if there are any conflicts, so we can ask the user.
-        archive = zipfile.ZipFile(file_name, "r")
-        cura_file_names = [name for name in archive.namelist() if name.startswith("Cura/")]
+        self._loadArchive(file_name)
+        cura_file_names = list(self._archive_files.keys())
+        self._preread_instance_containers = {}
 
         # A few lists of containers in this project files.
         # When loading the global stack file, it may be associated with those containers, which may or may not be
@@ -150,7 +161,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
 
             if not definitions:
                 definition_container = DefinitionContainer(container_id)
-                definition_container.deserialize(archive.open(each_definition_container_file).read().decode("utf-8"), file_name = each_definition_container_file)
+                definition_container.deserialize(self._archive_files[each_definition_container_file], file_name = each_definition_container_file)
                 definition_container = definition_container.getMetaData()
 
             else:
@@ -183,7 +194,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
             material_container_files = [name for name in cura_file_names if name.endswith(self._material_container_suffix)]
             for material_container_file in material_container_files:
                 container_id = self._stripFileToId(material_container_file)
-                material_labels.append(self._getMaterialLabelFromSerialized(archive.open(material_container_file).read().decode("utf-8")))
+                material_labels.append(self._getMaterialLabelFromSerialized(self._archive_files[material_container_file]))
                 if self._container_registry.findContainersMetadata(id = container_id): #This material already exists.
                     containers_found_dict["material"] = True
                     if not self._container_registry.isReadOnly(container_id):  # Only non readonly materials can be in conflict
@@ -204,10 +215,11 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
             container_id = self._stripFileToId(each_instance_container_file)
             instance_container = InstanceContainer(container_id)
 
-            # Deserialize InstanceContainer by converting read data from bytes to string
-            instance_container.deserialize(archive.open(each_instance_container_file).read().decode("utf-8"),
+            instance_container.deserialize(self._archive_files[each_instance_container_file],
                                            file_name = each_instance_container_file)
             instance_container_list.append(instance_container)
+            # read() can take this one rather than deserializing the file again.
+            self._preread_instance_containers[each_instance_container_file] = instance_container
 
             container_type = instance_container.getMetaDataEntry("type")
             if container_type == "quality_changes":
@@ -252,7 +264,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         #  - the global stack DOESN'T exist but some/all of the extruder stacks exist
         # To simplify this, only check if the global stack exists or not
         container_id = self._stripFileToId(global_stack_file)
-        serialized = archive.open(global_stack_file).read().decode("utf-8")
+        serialized = self._archive_files[global_stack_file]
         machine_name = self._getMachineNameFromSerializedStack(serialized)
         stacks = self._container_registry.findContainerStacks(id = container_id)
         if stacks:
@@ -272,7 +284,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         if containers_found_dict["machine"] and not machine_conflict:
             for extruder_stack_file in extruder_stack_files:
                 container_id = self._stripFileToId(extruder_stack_file)
-                serialized = archive.open(extruder_stack_file).read().decode("utf-8")
+                serialized = self._archive_files[extruder_stack_file]
                 parser = configparser.ConfigParser()
                 parser.read_string(serialized)
 
@@ -306,7 +318,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         has_visible_settings_string = False
         try:
             temp_preferences = Preferences()
-            serialized = archive.open("Cura/preferences.cfg").read().decode("utf-8")
+            serialized = self._archive_files["Cura/preferences.cfg"]
             temp_preferences.deserialize(serialized)
 
             visible_settings_string = temp_preferences.getValue("general/visible_settings")
@@ -405,14 +417,29 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
     #
     #   \param file_name
     def read(self, file_name):
-        archive = zipfile.ZipFile(file_name, "r")
+        try:
+            return self._read(file_name)
+        finally:
+            self._clearArchive()  # Also when reading failed, so that the next read doesn't use these files.
+
+    def _read(self, file_name):
+        start_time = time.time()
 
-        cura_file_names = [name for name in archive.namelist() if name.startswith("Cura/")]
+        # The meshes don't depend on the settings, so parse them while the containers are being loaded.
+        # Only turning them into scene nodes has to wait for the new machine to be active.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+        scene_future = executor.submit(self._3mf_mesh_reader.parseScene, file_name)
+        executor.shutdown(wait = False)
+
+        self._loadArchive(file_name)
+        cura_file_names = list(self._archive_files.keys())
+        preread_instance_containers = self._preread_instance_containers
+        self._preread_instance_containers = {}
 
         # Create a shadow copy of the preferences (we don't want all of the preferences, but we do want to re-use its
         # parsing code.
         temp_preferences = Preferences()
-        serialized = archive.open("Cura/preferences.cfg").read().decode("utf-8")
+        serialized = self._archive_files["Cura/preferences.cfg"]
         temp_preferences.deserialize(serialized)
 
         # Copy a number of settings from the temp preferences to the global
@@ -450,7 +477,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
 
         global_stack_id_original = self._stripFileToId(global_stack_file)
         global_stack_id_new = global_stack_id_original
-        global_stack_name_original = self._getMachineNameFromSerializedStack(archive.open(global_stack_file).read().decode("utf-8"))
+        global_stack_name_original = self._getMachineNameFromSerializedStack(self._archive_files[global_stack_file])
         global_stack_name_new = global_stack_name_original
         global_stack_need_rename = False
 
@@ -483,7 +510,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
             definitions = self._container_registry.findDefinitionContainersMetadata(id = container_id)
             if not definitions:
                 definition_container = DefinitionContainer(container_id)
-                definition_container.deserialize(archive.open(definition_container_file).read().decode("utf-8"),
+                definition_container.deserialize(self._archive_files[definition_container_file],
                                                  file_name = definition_container_file)
                 self._container_registry.addContainer(definition_container)
             Job.yieldThread()
@@ -502,20 +529,20 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
 
                 if not materials:
                     material_container = xml_material_profile(container_id)
-                    material_container.deserialize(archive.open(material_container_file).read().decode("utf-8"),
+                    material_container.deserialize(self._archive_files[material_container_file],
                                                    file_name = material_container_file)
                     containers_to_add.append(material_container)
                 else:
                     material_container = materials[0]
                     if not self._container_registry.isReadOnly(container_id):  # Only create new materials if they are not read only.
                         if self._resolve_strategies["material"] == "override":
-                            material_container.deserialize(archive.open(material_container_file).read().decode("utf-8"),
+                            material_container.deserialize(self._archive_files[material_container_file],
                                                            file_name = material_container_file)
                         elif self._resolve_strategies["material"] == "new":
                             # Note that we *must* deserialize it with a new ID, as multiple containers will be
                             # auto created & added.
                             material_container = xml_material_profile(self.getNewId(container_id))
-                            material_container.deserialize(archive.open(material_container_file).read().decode("utf-8"),
+                            material_container.deserialize(self._archive_files[material_container_file],
                                                            file_name = material_container_file)
                             containers_to_add.append(material_container)
 
@@ -529,24 +556,29 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         quality_and_definition_changes_instance_containers = []
         for instance_container_file in instance_container_files:
             container_id = self._stripFileToId(instance_container_file)
-            serialized = archive.open(instance_container_file).read().decode("utf-8")
+            serialized = self._archive_files[instance_container_file]
 
-            # HACK! we ignore "quality" and "variant" instance containers!
-            parser = configparser.ConfigParser()
-            parser.read_string(serialized)
-            if not parser.has_option("metadata", "type"):
+            instance_container = preread_instance_containers.get(instance_container_file)
+            if instance_container is None:
+                # HACK! we ignore "quality" and "variant" instance containers!
+                parser = configparser.ConfigParser()
+                parser.read_string(serialized)
+                if not parser.has_option("metadata", "type"):
+                    Logger.log("w", "Cannot find metadata/type in %s, ignoring it", instance_container_file)
+                    continue
+                if parser.get("metadata", "type") in self._ignored_instance_container_types:
+                    continue
+
+                instance_container = InstanceContainer(container_id)
+                instance_container.deserialize(serialized, file_name = instance_container_file)
+                Job.yieldThread()
+            container_type = instance_container.getMetaDataEntry("type")
+            if container_type is None:
                 Logger.log("w", "Cannot find metadata/type in %s, ignoring it", instance_container_file)
                 continue
-            if parser.get("metadata", "type") in self._ignored_instance_container_types:
+            if container_type in self._ignored_instance_container_types:
                 continue
 
-            instance_container = InstanceContainer(container_id)
-
-            # Deserialize InstanceContainer by converting read data from bytes to string
-            instance_container.deserialize(serialized, file_name = instance_container_file)
-            container_type = instance_container.getMetaDataEntry("type")
-            Job.yieldThread()
-
             #
             # IMPORTANT:
             # If an instance container (or maybe other type of container) exists, and user chooses "Create New",
@@ -565,8 +597,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
                 else:
                     if self._resolve_strategies["machine"] == "override" or self._resolve_strategies["machine"] is None:
                         instance_container = user_containers[0]
-                        instance_container.deserialize(archive.open(instance_container_file).read().decode("utf-8"),
-                                                       file_name = instance_container_file)
+                        instance_container.deserialize(serialized, file_name = instance_container_file)
                         instance_container.setDirty(True)
                     elif self._resolve_strategies["machine"] == "new":
                         # The machine is going to get a spiffy new name, so ensure that the id's of user settings match.
@@ -599,8 +630,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
                     # selected strategy.
                     if self._resolve_strategies[container_type] == "override":
                         instance_container = changes_containers[0]
-                        instance_container.deserialize(archive.open(instance_container_file).read().decode("utf-8"),
-                                                       file_name = instance_container_file)
+                        instance_container.deserialize(serialized, file_name = instance_container_file)
                         instance_container.setDirty(True)
 
                     elif self._resolve_strategies[container_type] == "new":
@@ -667,7 +697,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
                 # There is a machine, check if it has authentication data. If so, keep that data.
                 network_authentication_id = stack.getMetaDataEntry("network_authentication_id")
                 network_authentication_key = stack.getMetaDataEntry("network_authentication_key")
-                stack.deserialize(archive.open(global_stack_file).read().decode("utf-8"), file_name = global_stack_file)
+                stack.deserialize(self._archive_files[global_stack_file], file_name = global_stack_file)
                 if network_authentication_id:
                     stack.addMetaDataEntry("network_authentication_id", network_authentication_id)
                 if network_authentication_key:
@@ -677,8 +707,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
                 # create a new global stack
                 stack = GlobalStack(global_stack_id_new)
                 # Deserialize stack by converting read data from bytes to string
-                stack.deserialize(archive.open(global_stack_file).read().decode("utf-8"),
-                                  file_name = global_stack_file)
+                stack.deserialize(self._archive_files[global_stack_file], file_name = global_stack_file)
 
                 # Ensure a unique ID and name
                 stack._id = global_stack_id_new
@@ -713,7 +742,7 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         try:
             for extruder_stack_file in extruder_stack_files:
                 container_id = self._stripFileToId(extruder_stack_file)
-                extruder_file_content = archive.open(extruder_stack_file, "r").read().decode("utf-8")
+                extruder_file_content = self._archive_files[extruder_stack_file]
 
                 if self._resolve_strategies["machine"] == "override":
                     # deserialize new extruder stack over the current ones (if any)
@@ -1006,10 +1035,18 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         # Notify everything/one that is to notify about changes.
         global_stack.containersChanged.emit(global_stack.getTop())
 
+        containers_time = time.time() - start_time
+
         # Load all the nodes / meshdata of the workspace
-        nodes = self._3mf_mesh_reader.read(file_name)
+        try:
+            scene_3mf = scene_future.result()
+        except Exception:
+            Logger.logException("w", "Failed to parse the meshes of %s in the background.", file_name)
+            scene_3mf = None  # The mesh reader will try again, and report the error properly.
+        nodes = self._3mf_mesh_reader.read(file_name, scene_3mf = scene_3mf)
         if nodes is None:
             nodes = []
+        Logger.log("d", "Loading workspace %s took %.3f s (containers: %.3f s)", file_name, time.time() - start_time, containers_time)
 
         base_file_name = os.path.basename(file_name)
         if base_file_name.endswith(".curaproject.3mf"):
@@ -1072,6 +1109,33 @@ class ThreeMFWorkspaceReader(WorkspaceReader):
         # replace the material in the given stack
         stack.material = new_material_containers[0]
 
+    ##  Read the settings files in a project file, if they haven't been read yet.
+    #
+    #   Each file is read and decoded only once. After that, preRead() and
+    #   read() take the contents from _archive_files.
+    def _loadArchive(self, file_name):
+        try:
+            modified_time = os.path.getmtime(file_name)
+        except OSError:
+            modified_time = None
+        if file_name == self._archive_file_name and modified_time == self._archive_modified_time:
+            return
+
+        self._clearArchive()
+        with zipfile.ZipFile(file_name, "r") as archive:
+            for name in archive.namelist():
+                if name.startswith("Cura/"):
+                    self._archive_files[name] = archive.read(name).decode("utf-8")
+        self._archive_file_name = file_name
+        self._archive_modified_time = modified_time
+
+    def _clearArchive(self):
+        self._archive_file_name = None
+        self._archive_modified_time = None
+        self._archive_files = {}
+        self._stack_types = {}
+        self._preread_instance_containers = {}
+
     def _stripFileToId(self, file):
         mime_type = MimeTypeDatabase.getMimeTypeForFile(file)
         file = mime_type.stripExtension(file)
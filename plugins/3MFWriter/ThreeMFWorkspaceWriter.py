@@ -3,9 +3,13 @@
 
 from UM.Workspace.WorkspaceWriter import WorkspaceWriter
 from UM.Application import Application
+from UM.Logger import Logger
 from UM.Preferences import Preferences
 from UM.Settings.ContainerRegistry import ContainerRegistry
 from cura.Settings.ExtruderManager import ExtruderManager
+import collections
+import concurrent.futures
+import time
 import zipfile
 from io import StringIO
 import configparser
@@ -21,62 +25,75 @@ class ThreeMFWorkspaceWriter(WorkspaceWriter):
         if not mesh_writer:  # We need to have the 3mf mesh writer, otherwise we can't save the entire workspace
             return False
 
+        start_time = time.time()
+
         # Indicate that the 3mf mesh writer should not close the archive just yet (we still need to add stuff to it).
         mesh_writer.setStoreArchive(True)
-        mesh_writer.write(stream, nodes, mode)
+        # Writing the meshes takes the most time, mostly compressing them. It doesn't need the containers, so do that
+        # in the background while the containers are serialized.
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers = 1)
+        mesh_future = executor.submit(mesh_writer.write, stream, nodes, mode)
+        executor.shutdown(wait = False)
+
+        serialized_files = collections.OrderedDict()  # File name in the archive -> (serialized data, time it took to serialize).
+        try:
+            global_container_stack = Application.getInstance().getGlobalContainerStack()
+
+            # Add global container stack data to the archive.
+            self._serializeContainer(global_container_stack, serialized_files)
+
+            # Also write all containers in the stack to the file
+            for container in global_container_stack.getContainers():
+                self._serializeContainer(container, serialized_files)
+
+            # Check if the machine has extruders and save all that data as well.
+            for extruder_stack in ExtruderManager.getInstance().getMachineExtruders(global_container_stack.getId()):
+                self._serializeContainer(extruder_stack, serialized_files)
+                for container in extruder_stack.getContainers():
+                    self._serializeContainer(container, serialized_files)
+
+            # Write preferences to archive
+            original_preferences = Preferences.getInstance() #Copy only the preferences that we use to the workspace.
+            temp_preferences = Preferences()
+            for preference in {"general/visible_settings", "cura/active_mode", "cura/categories_expanded"}:
+                temp_preferences.addPreference(preference, None)
+                temp_preferences.setValue(preference, original_preferences.getValue(preference))
+            preferences_string = StringIO()
+            temp_preferences.writeToFile(preferences_string)
+            serialized_files["Cura/preferences.cfg"] = (preferences_string.getvalue(), 0.0)
+
+            # Save Cura version
+            version_config_parser = configparser.ConfigParser()
+            version_config_parser.add_section("versions")
+            version_config_parser.set("versions", "cura_version", Application.getInstance().getVersion())
+            version_config_parser.set("versions", "build_type", Application.getInstance().getBuildType())
+            version_config_parser.set("versions", "is_debug_mode", str(Application.getInstance().getIsDebugMode()))
+
+            version_file_string = StringIO()
+            version_config_parser.write(version_file_string)
+            serialized_files["Cura/version.ini"] = (version_file_string.getvalue(), 0.0)
+        finally:
+            # The archive can only be written to when the meshes are done.
+            mesh_future.result()
 
         archive = mesh_writer.getArchive()
         if archive is None:  # This happens if there was no mesh data to write.
-            archive = zipfile.ZipFile(stream, "w", compression = zipfile.ZIP_DEFLATED)
-
-        global_container_stack = Application.getInstance().getGlobalContainerStack()
-
-        # Add global container stack data to the archive.
-        self._writeContainerToArchive(global_container_stack, archive)
-
-        # Also write all containers in the stack to the file
-        for container in global_container_stack.getContainers():
-            self._writeContainerToArchive(container, archive)
-
-        # Check if the machine has extruders and save all that data as well.
-        for extruder_stack in ExtruderManager.getInstance().getMachineExtruders(global_container_stack.getId()):
-            self._writeContainerToArchive(extruder_stack, archive)
-            for container in extruder_stack.getContainers():
-                self._writeContainerToArchive(container, archive)
-
-        # Write preferences to archive
-        original_preferences = Preferences.getInstance() #Copy only the preferences that we use to the workspace.
-        temp_preferences = Preferences()
-        for preference in {"general/visible_settings", "cura/active_mode", "cura/categories_expanded"}:
-            temp_preferences.addPreference(preference, None)
-            temp_preferences.setValue(preference, original_preferences.getValue(preference))
-        preferences_string = StringIO()
-        temp_preferences.writeToFile(preferences_string)
-        preferences_file = zipfile.ZipInfo("Cura/preferences.cfg")
-        archive.writestr(preferences_file, preferences_string.getvalue())
-
-        # Save Cura version
-        version_file = zipfile.ZipInfo("Cura/version.ini")
-        version_config_parser = configparser.ConfigParser()
-        version_config_parser.add_section("versions")
-        version_config_parser.set("versions", "cura_version", Application.getInstance().getVersion())
-        version_config_parser.set("versions", "build_type", Application.getInstance().getBuildType())
-        version_config_parser.set("versions", "is_debug_mode", str(Application.getInstance().getIsDebugMode()))
-
-        version_file_string = StringIO()
-        version_config_parser.write(version_file_string)
-        archive.writestr(version_file, version_file_string.getvalue())
+            archive = zipfile.ZipFile(stream, "w", compression = mesh_writer.getCompressType())
+
+        for file_name, (serialized_data, serialize_time) in serialized_files.items():
+            mesh_writer.writeToArchive(archive, file_name, serialized_data, serialize_time)
 
         # Close the archive & reset states.
         archive.close()
         mesh_writer.setStoreArchive(False)
+        Logger.log("d", "Saving the project took %.3f s", time.time() - start_time)
         return True
 
-    ##  Helper function that writes ContainerStacks, InstanceContainers and DefinitionContainers to the archive.
+    ##  Helper function that serializes ContainerStacks, InstanceContainers and DefinitionContainers for the archive.
     #   \param container That follows the \type{ContainerInterface} to archive.
-    #   \param archive The archive to write to.
+    #   \param serialized_files The files to write to the archive, by file name. The container is added to this.
     @staticmethod
-    def _writeContainerToArchive(container, archive):
+    def _serializeContainer(container, serialized_files):
         if isinstance(container, type(ContainerRegistry.getInstance().getEmptyInstanceContainer())):
             return  # Empty file, do nothing.
 
@@ -89,15 +106,12 @@ class ThreeMFWorkspaceWriter(WorkspaceWriter):
 
         file_name = "Cura/%s.%s" % (container.getId(), file_suffix)
 
-        if file_name in archive.namelist():
+        if file_name in serialized_files:
             return  # File was already saved, no need to do it again. Uranium guarantees unique ID's, so this should hold.
 
-        file_in_archive = zipfile.ZipInfo(file_name)
-        # For some reason we have to set the compress type of each file as well (it doesn't keep the type of the entire archive)
-        file_in_archive.compress_type = zipfile.ZIP_DEFLATED
-
+        start_time = time.time()
         # Do not include the network authentication keys
         ignore_keys = {"network_authentication_id", "network_authentication_key"}
         serialized_data = container.serialize(ignored_metadata_keys = ignore_keys)
 
-        archive.writestr(file_in_archive, serialized_data)
+        serialized_files[file_name] = (serialized_data, time.time() - start_time)
@@ -6,6 +6,7 @@ from UM.Math.Vector import Vector
 from UM.Logger import Logger
 from UM.Math.Matrix import Matrix
 from UM.Application import Application
+from UM.Preferences import Preferences
 import UM.Scene.SceneNode
 
 import Savitar
@@ -20,6 +21,7 @@ except ImportError:
     Logger.log("w", "Unable to load cElementTree, switching to slower version")
     import xml.etree.ElementTree as ET
 
+import time
 import zipfile
 import UM.Application
 
@@ -37,6 +39,10 @@ class ThreeMFWriter(MeshWriter):
         self._unit_matrix_string = self._convertMatrixToString(Matrix())
         self._archive = None
         self._store_archive = False
+        self._mesh_bytes_cache = {}  # The vertices and faces of each mesh written so far, by the ID of the mesh data.
+
+        # Storing the files in the archive without compressing them is much faster, but makes the archive much bigger.
+        Preferences.getInstance().addPreference("3mf_writer/fast_save", False)
 
     def _convertMatrixToString(self, matrix):
         result = ""
@@ -75,12 +81,9 @@ class ThreeMFWriter(MeshWriter):
         savitar_node.setTransformation(matrix_string)
         mesh_data = um_node.getMeshData()
         if mesh_data is not None:
-            savitar_node.getMeshData().setVerticesFromBytes(mesh_data.getVerticesAsByteArray())
-            indices_array = mesh_data.getIndicesAsByteArray()
-            if indices_array is not None:
-                savitar_node.getMeshData().setFacesFromBytes(indices_array)
-            else:
-                savitar_node.getMeshData().setFacesFromBytes(numpy.arange(mesh_data.getVertices().size / 3, dtype=numpy.int32).tostring())
+            vertices_bytes, faces_bytes = self._getMeshBytes(mesh_data)
+            savitar_node.getMeshData().setVerticesFromBytes(vertices_bytes)
+            savitar_node.getMeshData().setFacesFromBytes(faces_bytes)
 
         # Handle per object settings (if any)
         stack = um_node.callDecoration("getStack")
@@ -102,27 +105,60 @@ class ThreeMFWriter(MeshWriter):
 
         return savitar_node
 
+    ##  Get the vertices and faces of a mesh, as they are written to the file.
+    #
+    #   Copies of an object share their mesh data, so those are converted only
+    #   once.
+    def _getMeshBytes(self, mesh_data):
+        key = id(mesh_data)
+        if key not in self._mesh_bytes_cache:
+            vertices_bytes = mesh_data.getVerticesAsByteArray()
+            faces_bytes = mesh_data.getIndicesAsByteArray()
+            if faces_bytes is None:
+                faces_bytes = numpy.arange(mesh_data.getVertexCount(), dtype = numpy.int32).tobytes()
+            self._mesh_bytes_cache[key] = (mesh_data, vertices_bytes, faces_bytes)  # Keep the mesh data, so that its ID stays unique.
+        return self._mesh_bytes_cache[key][1:]
+
     def getArchive(self):
         return self._archive
 
+    ##  Get how files in the archive are compressed.
+    #
+    #   With fast saving enabled, files are stored without compression.
+    @staticmethod
+    def getCompressType():
+        if Preferences.getInstance().getValue("3mf_writer/fast_save"):
+            return zipfile.ZIP_STORED
+        return zipfile.ZIP_DEFLATED
+
+    ##  Write a file to an archive, with the compression of the archive.
+    #
+    #   \param archive The archive to write to.
+    #   \param file_name The name of the file in the archive.
+    #   \param data The contents of the file.
+    #   \param serialize_time (Optional) How long it took to serialize the
+    #   data, to report together with the time it took to write it.
+    @staticmethod
+    def writeToArchive(archive, file_name, data, serialize_time = 0.0):
+        file_in_archive = zipfile.ZipInfo(file_name)
+        # Because zipfile is stupid and ignores archive-level compression settings when writing with ZipInfo.
+        file_in_archive.compress_type = archive.compression
+        start_time = time.time()
+        archive.writestr(file_in_archive, data)
+        Logger.log("d", "Saved %s (%d bytes): serializing took %.3f s, compressing %.3f s", file_name, len(data), serialize_time, time.time() - start_time)
+
     def write(self, stream, nodes, mode = MeshWriter.OutputMode.BinaryMode):
         self._archive = None # Reset archive
-        archive = zipfile.ZipFile(stream, "w", compression = zipfile.ZIP_DEFLATED)
+        archive = zipfile.ZipFile(stream, "w", compression = self.getCompressType())
         try:
-            model_file = zipfile.ZipInfo("3D/3dmodel.model")
-            # Because zipfile is stupid and ignores archive-level compression settings when writing with ZipInfo.
-            model_file.compress_type = zipfile.ZIP_DEFLATED
+            start_time = time.time()
 
             # Create content types file
-            content_types_file = zipfile.ZipInfo("[Content_Types].xml")
-            content_types_file.compress_type = zipfile.ZIP_DEFLATED
             content_types = ET.Element("Types", xmlns = self._namespaces["content-types"])
             rels_type = ET.SubElement(content_types, "Default", Extension = "rels", ContentType = "application/vnd.openxmlformats-package.relationships+xml")
             model_type = ET.SubElement(content_types, "Default", Extension = "model", ContentType = "application/vnd.ms-package.3dmanufacturing-3dmodel+xml")
 
             # Create _rels/.rels file
-            relations_file = zipfile.ZipInfo("_rels/.rels")
-            relations_file.compress_type = zipfile.ZIP_DEFLATED
             relations_element = ET.Element("Relationships", xmlns = self._namespaces["relationships"])
             model_relation_element = ET.SubElement(relations_element, "Relationship", Target = "/3D/3dmodel.model", Id = "rel0", Type = "http://schemas.microsoft.com/3dmanufacturing/2013/01/3dmodel")
 
@@ -144,6 +180,7 @@ class ThreeMFWriter(MeshWriter):
                 translation_matrix.setByTranslation(translation_vector)
                 transformation_matrix.preMultiply(translation_matrix)
 
+            self._mesh_bytes_cache = {}
             root_node = UM.Application.Application.getInstance().getController().getScene().getRoot()
             for node in nodes:
                 if node == root_node:
@@ -159,13 +196,14 @@ class ThreeMFWriter(MeshWriter):
             parser = Savitar.ThreeMFParser()
             scene_string = parser.sceneToString(savitar_scene)
 
-            archive.writestr(model_file, scene_string)
-            archive.writestr(content_types_file, b'<?xml version="1.0" encoding="UTF-8"?> \n' + ET.tostring(content_types))
-            archive.writestr(relations_file, b'<?xml version="1.0" encoding="UTF-8"?> \n' + ET.tostring(relations_element))
+            self.writeToArchive(archive, "3D/3dmodel.model", scene_string, time.time() - start_time)
+            self.writeToArchive(archive, "[Content_Types].xml", b'<?xml version="1.0" encoding="UTF-8"?> \n' + ET.tostring(content_types))
+            self.writeToArchive(archive, "_rels/.rels", b'<?xml version="1.0" encoding="UTF-8"?> \n' + ET.tostring(relations_element))
         except Exception as e:
             Logger.logException("e", "Error writing zip file")
             return False
         finally:
+            self._mesh_bytes_cache = {}
             if not self._store_archive:
                 archive.close()
             else:
@@ -9,6 +9,8 @@ from UM.Application import Application
 from UM.Resources import Resources
 from UM.Logger import Logger
 
+from cura.Settings.ContainerSaveWorker import ContainerSaveWorker
+
 class AutoSave(Extension):
     def __init__(self):
         super().__init__()
@@ -47,8 +49,11 @@ class AutoSave(Extension):
         self._saving = True # To prevent the save process from triggering another autosave.
         Logger.log("d", "Autosaving preferences, instances and profiles")
 
-        Application.getInstance().saveSettings()
+        # Take a snapshot of the containers that changed, and write them to disk in the background.
+        ContainerSaveWorker.getInstance().queueDirtyContainers()
 
+        # The preferences are written right away. When Cura closes, Uranium writes them before the background writes
+        # are flushed, so a queued older copy could overwrite them.
         Preferences.getInstance().writeToFile(Resources.getStoragePath(Resources.Preferences, Application.getInstance().getApplicationName() + ".cfg"))
 
         self._saving = False
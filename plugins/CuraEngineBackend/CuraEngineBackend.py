@@ -19,6 +19,11 @@ from PyQt5.QtCore import QObject, pyqtSlot
 from cura.Settings.ExtruderManager import ExtruderManager
 from . import ProcessSlicedLayersJob
 from . import StartSliceJob
+from .EngineProcess import EngineProcess, parsePrintTimes
+from .SliceMessageCache import SliceMessageCache
+from .SliceResultCache import SliceResultCache, SliceResultDiskCache
+from .StoreSliceResultJob import StoreSliceResultJob
+from .SpeculativeSlicer import SpeculativeSlicer
 
 import os
 import sys
@@ -96,13 +101,24 @@ class CuraEngineBackend(QObject, Backend):
         self._is_error_check_scheduled = False
 
         # Listeners for receiving messages from the back-end.
-        self._message_handlers["cura.proto.Layer"] = self._onLayerMessage
-        self._message_handlers["cura.proto.LayerOptimized"] = self._onOptimizedLayerMessage
-        self._message_handlers["cura.proto.Progress"] = self._onProgressMessage
-        self._message_handlers["cura.proto.GCodeLayer"] = self._onGCodeLayerMessage
-        self._message_handlers["cura.proto.GCodePrefix"] = self._onGCodePrefixMessage
-        self._message_handlers["cura.proto.PrintTimeMaterialEstimates"] = self._onPrintTimeMaterialEstimates
-        self._message_handlers["cura.proto.SlicingFinished"] = self._onSlicingFinishedMessage
+        # All messages arrive on the main thread, so each handler only stores what it got. Anything that updates the
+        # interface is done at most a few times per second.
+        self._message_statistics = {}  # For each message type: how many were received, and how long handling them took.
+        self._addMessageHandler("cura.proto.Layer", self._onLayerMessage)
+        self._addMessageHandler("cura.proto.LayerOptimized", self._onOptimizedLayerMessage)
+        self._addMessageHandler("cura.proto.Progress", self._onProgressMessage)
+        self._addMessageHandler("cura.proto.GCodeLayer", self._onGCodeLayerMessage)
+        self._addMessageHandler("cura.proto.GCodePrefix", self._onGCodePrefixMessage)
+        self._addMessageHandler("cura.proto.PrintTimeMaterialEstimates", self._onPrintTimeMaterialEstimates)
+        self._addMessageHandler("cura.proto.SlicingFinished", self._onSlicingFinishedMessage)
+
+        # The engine sends progress much more often than the interface can show it. Only show the latest progress,
+        # at a fixed rate.
+        self._progress = None  # The latest progress that the engine sent and that wasn't shown yet.
+        self._progress_timer = QTimer()
+        self._progress_timer.setSingleShot(True)
+        self._progress_timer.setInterval(100)
+        self._progress_timer.timeout.connect(self._onProgressTimeout)
 
         self._start_slice_job = None
         self._slicing = False  # Are we currently slicing?
@@ -112,6 +128,7 @@ class CuraEngineBackend(QObject, Backend):
         self._process_layers_job = None  # The currently active job to process layers, or None if it is not processing layers.
         self._need_slicing = False
         self._engine_is_fresh = True  # Is the newly started engine used before or not?
+        self._message_cache = SliceMessageCache()  # Parts of the slice message that the next slice can use again.
 
         self._backend_log_max_lines = 20000  # Maximum number of lines to buffer
         self._error_message = None  # Pop-up message that shows errors.
@@ -128,6 +145,23 @@ class CuraEngineBackend(QObject, Backend):
         self._slice_start_time = None
 
         Preferences.getInstance().addPreference("general/auto_slice", True)
+        # Keep an idle engine running when the user starts using a tool, instead of starting a new one.
+        Preferences.getInstance().addPreference("backend/keep_engine_warm", False)
+        # How many MB of memory the results of recent slices may take, so that going back to an earlier configuration
+        # doesn't need to slice again. 0 to not keep any results.
+        Preferences.getInstance().addPreference("backend/slice_result_memory", 0)
+        # How many MB of disk space the results of slices may take, so that they can be used again after a restart.
+        # 0 to not store any results on disk.
+        Preferences.getInstance().addPreference("backend/slice_result_disk_space", 0)
+        self._result_cache = SliceResultCache(self._getPreferenceBytes("backend/slice_result_memory"))
+        self._updateResultDiskCache()
+        self._slice_hash = None  # Hash of the slice message that the engine is slicing, to store the result with.
+        self._print_estimates = None  # The print times and material amounts of the current slice.
+        # Slice the scene with recently used settings while the backend is idle, so that going back to those settings
+        # shows the result right away. This only works if slice results are kept.
+        Preferences.getInstance().addPreference("backend/speculative_slicing", False)
+        self._speculative_slicer = SpeculativeSlicer(self._result_cache, self.createEngineProcess)
+        self._speculation = None  # The SliceConfiguration and SliceScene of the current slice, to slice with other settings when it's done.
 
         self._use_timer = False
         # When you update a setting and other settings get changed through inheritance, many propertyChanged signals are fired.
@@ -145,6 +179,7 @@ class CuraEngineBackend(QObject, Backend):
     #   Called when closing the application.
     def close(self):
         # Terminate CuraEngine if it is still running at this point
+        self._speculative_slicer.cancel()
         self._terminate()
 
     ##  Get the command that is used to call the engine.
@@ -154,6 +189,27 @@ class CuraEngineBackend(QObject, Backend):
         json_path = Resources.getPath(Resources.DefinitionContainers, "fdmprinter.def.json")
         return [Preferences.getInstance().getValue("backend/location"), "connect", "127.0.0.1:{0}".format(self._port), "-j", json_path, ""]
 
+    ##  Start an extra engine process, separate from the one that slices the
+    #   scene, e.g. to slice the scene with other settings in the background
+    #   or to slice several jobs at the same time without an interface.
+    #
+    #   \return An EngineProcess that is connected and ready to slice.
+    def createEngineProcess(self):
+        json_path = Resources.getPath(Resources.DefinitionContainers, "fdmprinter.def.json")
+        protocol_file = os.path.abspath(os.path.join(PluginRegistry.getInstance().getPluginPath(self.getPluginId()), "Cura.proto"))
+        return EngineProcess([Preferences.getInstance().getValue("backend/location"), "connect"], ["-j", json_path], protocol_file)
+
+    ##  Fill in a slice message for the current scene and settings, right
+    #   away on the calling thread.
+    #
+    #   \param slice_message The message to fill in, e.g. from
+    #   EngineProcess.createSliceMessage().
+    #   \return The StartJobResult, and the hash of the message.
+    def buildSliceMessage(self, slice_message):
+        job = StartSliceJob.StartSliceJob(slice_message, self._message_cache)
+        job.run()
+        return job.getResult(), job.getSliceHash()
+
     ##  Emitted when we get a message containing print duration and material amount.
     #   This also implies the slicing has finished.
     #   \param time The amount of time the print will take.
@@ -168,6 +224,8 @@ class CuraEngineBackend(QObject, Backend):
 
     @pyqtSlot()
     def stopSlicing(self):
+        self._clearProgress()
+        self._speculative_slicer.cancel()  # The scene or the settings changed, so the engine is needed for the next slice.
         self.backendStateChange.emit(BackendState.NotStarted)
         if self._slicing:  # We were already slicing. Stop the old job.
             self._terminate()
@@ -201,6 +259,10 @@ class CuraEngineBackend(QObject, Backend):
 
         self._stored_layer_data = []
         self._stored_optimized_layer_data = []
+        self._message_statistics = {}
+        self._slice_hash = None
+        self._print_estimates = None
+        self._speculation = None
 
         if self._process is None:
             self._createSocket()
@@ -215,7 +277,7 @@ class CuraEngineBackend(QObject, Backend):
         self.slicingStarted.emit()
 
         slice_message = self._socket.createMessage("cura.proto.Slice")
-        self._start_slice_job = StartSliceJob.StartSliceJob(slice_message)
+        self._start_slice_job = StartSliceJob.StartSliceJob(slice_message, self._message_cache, self._result_cache)
         self._start_slice_job.start()
         self._start_slice_job.finished.connect(self._onStartSliceCompleted)
 
@@ -223,6 +285,8 @@ class CuraEngineBackend(QObject, Backend):
     #   Start the engine process by calling _createSocket()
     def _terminate(self):
         self._slicing = False
+        self._slice_hash = None
+        self._clearProgress()
         self._stored_layer_data = []
         self._stored_optimized_layer_data = []
         if self._start_slice_job is not None:
@@ -340,6 +404,19 @@ class CuraEngineBackend(QObject, Backend):
             else:
                 self.backendStateChange.emit(BackendState.NotStarted)
             return
+        if self._isSpeculativeSlicingEnabled():
+            self._speculation = (job.getSliceConfiguration(), job.getSliceScene())
+            self._speculative_slicer.addConfiguration(job.getSliceConfiguration())
+
+        # The same scene was sliced with the same settings before. Use that result instead of slicing again.
+        slice_hash = job.getSliceHash()
+        result = job.getCachedResult()
+        if result is not None:
+            Logger.log("d", "Using the stored result of an earlier slice with hash %s", slice_hash)
+            self._useSliceResult(result)
+            return
+        self._slice_hash = slice_hash
+
         # Preparation completed, send it to the backend.
         self._socket.sendMessage(job.getSliceMessage())
 
@@ -347,6 +424,8 @@ class CuraEngineBackend(QObject, Backend):
         self.backendStateChange.emit(BackendState.Processing)
 
         Logger.log("d", "Sending slice message took %s seconds", time() - self._slice_start_time )
+        hits, misses = self._message_cache.getStatistics()
+        Logger.log("d", "Settings of the slice message were reused %d times and built %d times", hits, misses)
 
     ##  Determine enable or disable auto slicing. Return True for enable timer and False otherwise.
     #   It disables when
@@ -452,6 +531,7 @@ class CuraEngineBackend(QObject, Backend):
     # \param property The property of the setting instance that has changed.
     def _onSettingChanged(self, instance, property):
         if property == "value":  # Only reslice if the value has changed.
+            self._message_cache.invalidate()
             self.needsSlicing()
             self._onChanged()
 
@@ -482,34 +562,153 @@ class CuraEngineBackend(QObject, Backend):
     #
     #   \param message The protobuf message containing the slicing progress.
     def _onProgressMessage(self, message):
-        self.processingProgress.emit(message.amount)
+        self._progress = message.amount
+        if not self._progress_timer.isActive():
+            self._progress_timer.start()
+
+    ##  Show the latest progress that the engine sent.
+    def _onProgressTimeout(self):
+        if self._progress is None:
+            return
+        self.processingProgress.emit(self._progress)
         self.backendStateChange.emit(BackendState.Processing)
+        self._progress = None
+
+    ##  Forget about progress that wasn't shown yet, since it's no longer
+    #   valid.
+    def _clearProgress(self):
+        self._progress_timer.stop()
+        self._progress = None
 
     ##  Called when the engine sends a message that slicing is finished.
     #
     #   \param message The protobuf message signalling that slicing is finished.
     def _onSlicingFinishedMessage(self, message):
+        if self._slice_hash is not None and self._print_estimates is not None and self._result_cache.isEnabled():
+            # Store the g-code before the estimates are filled in, since the material costs could change.
+            store_job = StoreSliceResultJob(self._result_cache, self._slice_hash, list(self._scene.gcode_list), list(self._stored_optimized_layer_data), *self._print_estimates)
+            store_job.start()
+        self._slice_hash = None
+        self._finishSlice()
+
+    ##  Show a slice result as it was sent by the engine or stored.
+    #
+    #   The g-code of the result must be in the scene, the layers must be in
+    #   the stored optimized layer data and the print time and material
+    #   estimates must have been sent out.
+    def _finishSlice(self):
+        self._clearProgress()
         self.backendStateChange.emit(BackendState.Done)
         self.processingProgress.emit(1.0)
 
-        for line in self._scene.gcode_list:
+        for index, line in enumerate(self._scene.gcode_list):
             replaced = line.replace("{print_time}", str(Application.getInstance().getPrintInformation().currentPrintTime.getDisplayString(DurationFormat.Format.ISO8601)))
             replaced = replaced.replace("{filament_amount}", str(Application.getInstance().getPrintInformation().materialLengths))
             replaced = replaced.replace("{filament_weight}", str(Application.getInstance().getPrintInformation().materialWeights))
             replaced = replaced.replace("{filament_cost}", str(Application.getInstance().getPrintInformation().materialCosts))
             replaced = replaced.replace("{jobname}", str(Application.getInstance().getPrintInformation().jobName))
 
-            self._scene.gcode_list[self._scene.gcode_list.index(line)] = replaced
+            self._scene.gcode_list[index] = replaced
 
         self._slicing = False
         self._need_slicing = False
         Logger.log("d", "Slicing took %s seconds", time() - self._slice_start_time )
+        for message_type, statistics in sorted(self.getMessageStatistics().items()):
+            if message_type == "stored":  # Not a message type, but the number of layers waiting to be processed.
+                continue
+            Logger.log("d", "Received %d %s messages, %.1f per second, handling them took %.3f seconds", statistics["count"], message_type, statistics["rate"], statistics["handling_time"])
         if self._layer_view_active and (self._process_layers_job is None or not self._process_layers_job.isRunning()):
             self._process_layers_job = ProcessSlicedLayersJob.ProcessSlicedLayersJob(self._stored_optimized_layer_data)
             self._process_layers_job.finished.connect(self._onProcessLayersFinished)
             self._process_layers_job.start()
             self._stored_optimized_layer_data = []
 
+        if self._speculation is not None and self._isSpeculativeSlicingEnabled():
+            configuration, scene = self._speculation
+            self._speculative_slicer.start(scene, configuration)
+        self._speculation = None
+
+    ##  Whether to slice the scene with recently used settings while idle.
+    def _isSpeculativeSlicingEnabled(self):
+        if Application.getInstance().getCommandLineOption("external-backend", False):  # Don't start engines behind the back of whoever runs it.
+            return False
+        return bool(Preferences.getInstance().getValue("backend/speculative_slicing")) and self._result_cache.isEnabled()
+
+    ##  Show the stored result of an earlier slice as if the engine just sliced
+    #   it.
+    #
+    #   \param result The SliceResult to show.
+    def _useSliceResult(self, result):
+        self.printDurationMessage.emit(dict(result.print_times), list(result.material_amounts))
+        self._scene.gcode_list = list(result.gcode_list)
+        self._stored_optimized_layer_data = list(result.layers)
+        self._finishSlice()
+
+    ##  Get a size preference in MB as a number of bytes.
+    def _getPreferenceBytes(self, preference):
+        try:
+            return max(int(float(Preferences.getInstance().getValue(preference)) * 1024 * 1024), 0)
+        except (TypeError, ValueError):
+            return 0
+
+    ##  Start or stop storing slice results on disk, according to the
+    #   preferences.
+    def _updateResultDiskCache(self):
+        size_budget = self._getPreferenceBytes("backend/slice_result_disk_space")
+        if size_budget == 0:
+            self._result_cache.setDiskCache(None)
+            return
+
+        # A different engine could slice the same message differently.
+        engine_location = Preferences.getInstance().getValue("backend/location")
+        try:
+            engine_time = os.path.getmtime(engine_location)
+        except EnvironmentError:
+            engine_time = 0
+        version = "{cura_version}-{engine_location}-{engine_time}".format(cura_version = Application.getInstance().getVersion(), engine_location = engine_location, engine_time = engine_time)
+        self._result_cache.setDiskCache(SliceResultDiskCache(Resources.getStoragePath(Resources.Cache, "slice_results"), size_budget, version))
+
+    ##  Register a function to handle a type of message from the engine.
+    #
+    #   The messages are counted, and the time it takes to handle them is
+    #   measured. See getMessageStatistics().
+    #   \param message_type The type name of the protobuf message.
+    #   \param handler The function to call with each message of this type.
+    def _addMessageHandler(self, message_type, handler):
+        def measuredHandler(message):
+            start_time = time()
+            handler(message)
+            end_time = time()
+
+            statistics = self._message_statistics.setdefault(message_type, {"count": 0, "handling_time": 0.0, "first_time": start_time, "last_time": start_time})
+            statistics["count"] += 1
+            statistics["handling_time"] += end_time - start_time
+            statistics["last_time"] = start_time
+        self._message_handlers[message_type] = measuredHandler
+
+    ##  Get statistics about the messages received from the engine during the
+    #   last slice, for profiling.
+    #
+    #   \return For each message type, a dictionary with the number of
+    #   messages received, how many per second were received, and the total
+    #   time it took to handle them. The pseudo-type "stored" has the number of
+    #   layers waiting to be processed.
+    def getMessageStatistics(self):
+        result = {}
+        for message_type, statistics in self._message_statistics.items():
+            duration = statistics["last_time"] - statistics["first_time"]
+            result[message_type] = {
+                "count": statistics["count"],
+                "rate": statistics["count"] / duration if duration > 0 else 0.0,
+                "handling_time": statistics["handling_time"]
+            }
+        result["stored"] = {
+            "count": len(self._stored_layer_data) + len(self._stored_optimized_layer_data),
+            "rate": 0.0,
+            "handling_time": 0.0
+        }
+        return result
+
     ##  Called when a g-code message is received from the engine.
     #
     #   \param message The protobuf message containing g-code, encoded as UTF-8.
@@ -551,26 +750,14 @@ class CuraEngineBackend(QObject, Backend):
             material_amounts.append(message.getRepeatedMessage("materialEstimates", index).material_amount)
 
         times = self._parseMessagePrintTimes(message)
+        self._print_estimates = (dict(times), list(material_amounts))
         self.printDurationMessage.emit(times, material_amounts)
 
     ##  Called for parsing message to retrieve estimated time per feature
     #
     #   \param message The protobuf message containing the print time per feature
     def _parseMessagePrintTimes(self, message):
-        result = {
-            "inset_0": message.time_inset_0,
-            "inset_x": message.time_inset_x,
-            "skin": message.time_skin,
-            "infill": message.time_infill,
-            "support_infill": message.time_support_infill,
-            "support_interface": message.time_support_interface,
-            "support": message.time_support,
-            "skirt": message.time_skirt,
-            "travel": message.time_travel,
-            "retract": message.time_retract,
-            "none": message.time_none
-        }
-        return result
+        return parsePrintTimes(message)
 
     ##  Called when the back-end connects to the front-end.
     def _onBackendConnected(self):
@@ -587,6 +774,9 @@ class CuraEngineBackend(QObject, Backend):
     def _onToolOperationStarted(self, tool):
         self._tool_active = True  # Do not react on scene change
         self.disableTimer()
+        # An idle engine can be used for the next slice if it is kept warm. Only one that's still slicing must be stopped.
+        if Preferences.getInstance().getValue("backend/keep_engine_warm") and not self._slicing:
+            return
         # Restart engine as soon as possible, we know we want to slice afterwards
         if not self._engine_is_fresh:
             self._terminate()
@@ -634,23 +824,29 @@ class CuraEngineBackend(QObject, Backend):
     def _onGlobalStackChanged(self):
         if self._global_container_stack:
             self._global_container_stack.propertyChanged.disconnect(self._onSettingChanged)
-            self._global_container_stack.containersChanged.disconnect(self._onChanged)
+            self._global_container_stack.containersChanged.disconnect(self._onStackContainersChanged)
             extruders = list(ExtruderManager.getInstance().getMachineExtruders(self._global_container_stack.getId()))
 
             for extruder in extruders:
                 extruder.propertyChanged.disconnect(self._onSettingChanged)
-                extruder.containersChanged.disconnect(self._onChanged)
+                extruder.containersChanged.disconnect(self._onStackContainersChanged)
 
         self._global_container_stack = Application.getInstance().getGlobalContainerStack()
 
         if self._global_container_stack:
             self._global_container_stack.propertyChanged.connect(self._onSettingChanged)  # Note: Only starts slicing when the value changed.
-            self._global_container_stack.containersChanged.connect(self._onChanged)
+            self._global_container_stack.containersChanged.connect(self._onStackContainersChanged)
             extruders = list(ExtruderManager.getInstance().getMachineExtruders(self._global_container_stack.getId()))
             for extruder in extruders:
                 extruder.propertyChanged.connect(self._onSettingChanged)
-                extruder.containersChanged.connect(self._onChanged)
-            self._onChanged()
+                extruder.containersChanged.connect(self._onStackContainersChanged)
+            self._onStackContainersChanged()
+
+    ##  Called when a profile, material or other container in the global stack
+    #   or an extruder stack was replaced.
+    def _onStackContainersChanged(self, *args):
+        self._message_cache.invalidate()
+        self._onChanged()
 
     def _onProcessLayersFinished(self, job):
         self._process_layers_job = None
@@ -669,6 +865,14 @@ class CuraEngineBackend(QObject, Backend):
             self._change_timer.timeout.disconnect(self.slice)
 
     def _onPreferencesChanged(self, preference):
+        if preference == "backend/slice_result_memory":
+            self._result_cache.setMemoryBudget(self._getPreferenceBytes("backend/slice_result_memory"))
+        elif preference in ("backend/slice_result_disk_space", "backend/location"):
+            self._updateResultDiskCache()
+        if preference in ("backend/speculative_slicing", "backend/slice_result_memory", "backend/slice_result_disk_space", "backend/location"):
+            if not self._isSpeculativeSlicingEnabled():
+                self._speculative_slicer.cancel()
+            return
         if preference != "general/auto_slice":
             return
         auto_slice = self.determineAutoSlicing()
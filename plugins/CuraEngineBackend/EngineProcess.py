@@ -0,0 +1,161 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import socket
+import subprocess
+import time
+
+import Arcus
+
+from UM.Logger import Logger
+
+
+##  Get the print time of each feature from a PrintTimeMaterialEstimates
+#   message.
+#
+#   \param message The protobuf message containing the print time per feature.
+#   \return A dictionary of the print time in seconds for each feature.
+def parsePrintTimes(message):
+    return {
+        "inset_0": message.time_inset_0,
+        "inset_x": message.time_inset_x,
+        "skin": message.time_skin,
+        "infill": message.time_infill,
+        "support_infill": message.time_support_infill,
+        "support_interface": message.time_support_interface,
+        "support": message.time_support,
+        "skirt": message.time_skirt,
+        "travel": message.time_travel,
+        "retract": message.time_retract,
+        "none": message.time_none
+    }
+
+
+##  Raised when an engine process fails to slice.
+class EngineError(Exception):
+    pass
+
+
+##  What an engine process sent back for a slice.
+class EngineResult:
+    ##  \param gcode_list The g-code, as a list of pieces.
+    #   \param print_times For each feature, the time it takes to print.
+    #   \param material_amounts For each extruder, the amount of material used.
+    #   \param layers The LayerOptimized messages, if they were kept.
+    def __init__(self, gcode_list, print_times, material_amounts, layers = None):
+        self.gcode_list = gcode_list
+        self.print_times = print_times
+        self.material_amounts = material_amounts
+        self.layers = layers if layers is not None else []
+
+
+##  An engine process with its own connection, to slice without the scene and
+#   the backend of the application.
+#
+#   This is used to slice next to the slice of the scene, e.g. the same scene
+#   with other settings in the background, or several jobs at the same time
+#   without an interface. The process is started once and can be used for
+#   several slices, like the backend does. All methods other than
+#   createSliceMessage() block, so they should be called from a worker
+#   thread.
+class EngineProcess:
+    ##  Start an engine process and wait for it to connect.
+    #
+    #   \param command The command to start the engine with, without the
+    #   address to connect to. For CuraEngine this is [location, "connect"].
+    #   \param arguments The arguments to put after the address.
+    #   \param protocol_file The file with the protobuf messages to use.
+    #   \param timeout How many seconds to wait for the engine to connect.
+    def __init__(self, command, arguments, protocol_file, timeout = 30):
+        self._socket = Arcus.Socket()
+        if not self._socket.registerAllMessageTypes(protocol_file):
+            raise EngineError("Could not register the messages of {protocol_file}".format(protocol_file = protocol_file))
+
+        port = self._findFreePort()
+        self._socket.listen("127.0.0.1", port)
+        self._process = subprocess.Popen(command + ["127.0.0.1:{0}".format(port)] + arguments, stdout = subprocess.DEVNULL, stderr = subprocess.DEVNULL)
+        self._waitForState(Arcus.SocketState.Connected, timeout)
+
+    ##  Create an empty slice message to fill in and pass to slice().
+    def createSliceMessage(self):
+        return self._socket.createMessage("cura.proto.Slice")
+
+    ##  Slice a message and wait for the result.
+    #
+    #   \param slice_message The slice message, made by createSliceMessage().
+    #   \param timeout How many seconds the slice may take at most.
+    #   \param keep_layers Whether to keep the layer data, to show the result
+    #   in the layer view later.
+    #   \return The EngineResult.
+    def slice(self, slice_message, timeout = 3600, keep_layers = False):
+        gcode_list = []
+        layers = []
+        print_times = {}
+        material_amounts = []
+        end_time = time.time() + timeout
+
+        self._socket.sendMessage(slice_message)
+        while True:
+            self._checkHealth()
+            message = self._socket.takeNextMessage()
+            if message is None:
+                if time.time() > end_time:
+                    self.close()  # It's still busy, so it can't be used for anything else.
+                    raise EngineError("Slicing took more than {timeout} seconds".format(timeout = timeout))
+                time.sleep(0.01)
+                continue
+
+            message_type = message.getTypeName()
+            if message_type == "cura.proto.GCodeLayer":
+                gcode_list.append(message.data.decode("utf-8", "replace"))
+            elif message_type == "cura.proto.GCodePrefix":
+                gcode_list.insert(0, message.data.decode("utf-8", "replace"))
+            elif message_type == "cura.proto.PrintTimeMaterialEstimates":
+                print_times = parsePrintTimes(message)
+                material_amounts = [message.getRepeatedMessage("materialEstimates", index).material_amount for index in range(message.repeatedMessageCount("materialEstimates"))]
+            elif message_type == "cura.proto.LayerOptimized":
+                if keep_layers:
+                    layers.append(message)
+            elif message_type == "cura.proto.SlicingFinished":
+                return EngineResult(gcode_list, print_times, material_amounts, layers)
+            # Progress is not needed without an interface.
+
+    ##  Whether the engine process is still running and connected.
+    def isAlive(self):
+        return self._process.poll() is None and self._socket.getState() == Arcus.SocketState.Connected
+
+    ##  Stop the engine process.
+    def close(self):
+        self._socket.close()
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout = 5)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        Logger.log("d", "Engine process stopped with return code %s", self._process.returncode)
+
+    def _checkHealth(self):
+        state = self._socket.getState()
+        if state == Arcus.SocketState.Error:
+            raise EngineError("Connection to the engine failed: {error}".format(error = self._socket.getLastError()))
+        if state == Arcus.SocketState.Closed or self._process.poll() is not None:
+            raise EngineError("The engine stopped with return code {code}".format(code = self._process.poll()))
+
+    def _waitForState(self, state, timeout):
+        end_time = time.time() + timeout
+        while self._socket.getState() != state:
+            if self._socket.getState() == Arcus.SocketState.Error or self._process.poll() is not None:
+                self.close()
+                raise EngineError("The engine did not connect")
+            if time.time() > end_time:
+                self.close()
+                raise EngineError("The engine did not connect within {timeout} seconds".format(timeout = timeout))
+            time.sleep(0.01)
+
+    ##  Find a port that nothing listens on, by letting the system pick one.
+    @staticmethod
+    def _findFreePort():
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as free_socket:
+            free_socket.bind(("127.0.0.1", 0))
+            return free_socket.getsockname()[1]
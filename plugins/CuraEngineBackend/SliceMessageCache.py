@@ -0,0 +1,86 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading
+
+
+##  Remembers the parts of the slice message that don't change between slices,
+#   so that they don't need to be built again every time.
+#
+#   The engine needs the complete slice message for every slice. But building
+#   it means evaluating every setting of every stack, which is most of the
+#   time it takes to start a slice. The settings part of the message only
+#   changes when a setting changes, and the vertices of an object only change
+#   when it is rotated or scaled.
+#
+#   The backend calls invalidate() whenever a setting changes. A StartSliceJob
+#   takes the revision before it reads any setting, and what it built is only
+#   stored if no setting changed in the meantime.
+class SliceMessageCache:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._revision = 0
+        self._settings = {}  # For each part of the message (e.g. the global settings): what to put in the message.
+        self._vertices = {}  # For each (mesh data ID, rotation and scale): the mesh data and its transformed vertices.
+        self._hits = 0
+        self._misses = 0
+
+    ##  Forget all settings, because one of them changed.
+    def invalidate(self):
+        with self._lock:
+            self._revision += 1
+            self._settings.clear()
+
+    ##  Get a number that changes whenever a setting changes.
+    def getRevision(self) -> int:
+        with self._lock:
+            return self._revision
+
+    ##  Get a stored part of the message.
+    #
+    #   \param key The part of the message, e.g. ("extruder", stack ID).
+    #   \param revision The revision that the caller read the settings at.
+    #   \return What was stored for that part of the message, or None if it
+    #   was not stored or the settings changed since.
+    def getSettings(self, key, revision):
+        with self._lock:
+            if revision == self._revision and key in self._settings:
+                self._hits += 1
+                return self._settings[key]
+            self._misses += 1
+            return None
+
+    ##  Store a part of the message.
+    #
+    #   \param key The part of the message, e.g. ("extruder", stack ID).
+    #   \param revision The revision that the caller read the settings at. If
+    #   the settings changed since, nothing is stored.
+    #   \param value What to put in that part of the message.
+    def putSettings(self, key, revision, value):
+        with self._lock:
+            if revision == self._revision:
+                self._settings[key] = value
+
+    ##  Get the transformed vertices of a mesh that were stored by the last
+    #   slice.
+    #
+    #   \param key The ID of the mesh data and its rotation and scale.
+    #   \return The mesh data and the vertices, or None if they weren't stored.
+    def getVertices(self, key):
+        with self._lock:
+            return self._vertices.get(key)
+
+    ##  Replace the stored vertices with those that the last slice used.
+    #
+    #   Meshes that are no longer sliced are forgotten this way. The mesh data
+    #   is kept together with the vertices so that its ID can't be reused.
+    def setVertices(self, vertices):
+        with self._lock:
+            self._vertices = dict(vertices)
+
+    ##  Get how often the stored settings could be used.
+    #
+    #   \return A tuple of the number of hits and the number of misses.
+    def getStatistics(self):
+        with self._lock:
+            return self._hits, self._misses
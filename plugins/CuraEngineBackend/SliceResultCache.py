@@ -0,0 +1,360 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import collections
+import os
+import pickle
+import threading
+import time
+
+from UM.Logger import Logger
+
+
+##  A path segment of a sliced layer that was kept after slicing.
+#
+#   This has the same fields as the PathSegment message from the engine, so
+#   ProcessSlicedLayersJob can process it in the same way.
+class CachedPathSegment:
+    def __init__(self, extruder, point_type, points, line_type, line_width, line_thickness, line_feedrate):
+        self.extruder = extruder
+        self.point_type = point_type
+        self.points = points
+        self.line_type = line_type
+        self.line_width = line_width
+        self.line_thickness = line_thickness
+        self.line_feedrate = line_feedrate
+
+    ##  Copy a PathSegment message.
+    @classmethod
+    def fromMessage(cls, message):
+        return cls(message.extruder, message.point_type, message.points, message.line_type, message.line_width, message.line_thickness, message.line_feedrate)
+
+    ##  Get the fields as a tuple, to store on disk.
+    def toData(self):
+        return self.extruder, self.point_type, self.points, self.line_type, self.line_width, self.line_thickness, self.line_feedrate
+
+    ##  Get roughly how much memory this takes, in bytes.
+    def getSize(self):
+        return len(self.points) + len(self.line_type) + len(self.line_width) + len(self.line_thickness) + len(self.line_feedrate)
+
+
+##  A sliced layer that was kept after slicing.
+#
+#   This has the same interface as the LayerOptimized message from the engine,
+#   so ProcessSlicedLayersJob can process it in the same way.
+class CachedLayer:
+    def __init__(self, id, height, thickness, path_segments):
+        self.id = id
+        self.height = height
+        self.thickness = thickness
+        self._path_segments = path_segments
+
+    ##  Copy a LayerOptimized message.
+    @classmethod
+    def fromMessage(cls, message):
+        path_segments = [CachedPathSegment.fromMessage(message.getRepeatedMessage("path_segment", index)) for index in range(message.repeatedMessageCount("path_segment"))]
+        return cls(message.id, message.height, message.thickness, path_segments)
+
+    ##  Get the fields as a tuple, to store on disk.
+    def toData(self):
+        return self.id, self.height, self.thickness, [path_segment.toData() for path_segment in self._path_segments]
+
+    ##  Create a layer from the tuple that toData() returned.
+    @classmethod
+    def fromData(cls, data):
+        id, height, thickness, path_segments = data
+        return cls(id, height, thickness, [CachedPathSegment(*path_segment) for path_segment in path_segments])
+
+    def repeatedMessageCount(self, field_name):
+        if field_name != "path_segment":
+            return 0
+        return len(self._path_segments)
+
+    def getRepeatedMessage(self, field_name, index):
+        if field_name != "path_segment":
+            raise IndexError("No repeated field {field_name}".format(field_name = field_name))
+        return self._path_segments[index]
+
+    ##  Get roughly how much memory this takes, in bytes.
+    def getSize(self):
+        return sum(path_segment.getSize() for path_segment in self._path_segments)
+
+
+##  Everything the engine sent for one slice.
+class SliceResult:
+    ##  Creates a slice result.
+    #
+    #   \param gcode_list The g-code of each layer, before the print time and
+    #   material estimates were filled in.
+    #   \param layers The CachedLayers to show in the layer view.
+    #   \param print_times For each feature, the time it takes to print.
+    #   \param material_amounts For each extruder, the amount of material used.
+    def __init__(self, gcode_list, layers, print_times, material_amounts):
+        self.gcode_list = gcode_list
+        self.layers = layers
+        self.print_times = print_times
+        self.material_amounts = material_amounts
+        self._size = sum(len(line) for line in gcode_list) + sum(layer.getSize() for layer in layers)
+
+    ##  Get roughly how much memory this takes, in bytes.
+    def getSize(self):
+        return self._size
+
+    ##  Get the result as plain Python objects, to store on disk.
+    def toData(self):
+        return self.gcode_list, [layer.toData() for layer in self.layers], self.print_times, self.material_amounts
+
+    ##  Create a result from what toData() returned.
+    @classmethod
+    def fromData(cls, data):
+        gcode_list, layers, print_times, material_amounts = data
+        return cls(gcode_list, [CachedLayer.fromData(layer) for layer in layers], print_times, material_amounts)
+
+
+##  Stores the results of slices in files, so that they can be used again
+#   after Cura is restarted.
+#
+#   Each result is stored in its own file, named after the hash of the slice
+#   message. When the files take more space than the budget allows, the files
+#   that were used longest ago are removed. The modification time of a file is
+#   updated when it is used.
+class SliceResultDiskCache:
+    ##  Increase this when the format of the files changes.
+    CacheVersion = 1
+
+    ##  Creates a cache in a directory.
+    #
+    #   \param directory The directory to store the files in.
+    #   \param size_budget How many bytes the files may take together.
+    #   \param version A version string for the application and the engine.
+    #   Files written by a different version are not used.
+    def __init__(self, directory, size_budget, version):
+        self._lock = threading.Lock()
+        self._directory = directory
+        self._size_budget = size_budget
+        self._version = "{cache_version}-{version}".format(cache_version = self.CacheVersion, version = version)
+        self._files = None  # For each slice hash: the size of its file, the least recently used first. Read when first needed.
+        self._total_size = 0  # The size of all files together.
+
+    ##  Change how many bytes the files may take together.
+    def setSizeBudget(self, size_budget):
+        with self._lock:
+            self._size_budget = size_budget
+            self._evict()
+
+    ##  Read the result of an earlier slice from its file.
+    #
+    #   \param slice_hash The hash of the slice message.
+    #   \return The SliceResult, or None if there is no usable file for it.
+    def get(self, slice_hash):
+        with self._lock:
+            self._readDirectory()
+            if slice_hash not in self._files:
+                return None
+            file_path = self._getFilePath(slice_hash)
+            try:
+                with open(file_path, "rb") as f:
+                    version, data = pickle.load(f)
+                if version != self._version:
+                    raise ValueError("Written by version {version}".format(version = version))
+                result = SliceResult.fromData(data)
+                os.utime(file_path)
+            except Exception as e:  # Corrupt, unreadable or outdated. Slice again and overwrite it.
+                Logger.log("w", "Could not read stored slice result {file_path}: {error}".format(file_path = file_path, error = str(e)))
+                self._removeFile(slice_hash)
+                return None
+            self._files.move_to_end(slice_hash)
+            return result
+
+    ##  Whether there is a file for the result of a slice, without reading it.
+    #
+    #   \param slice_hash The hash of the slice message.
+    def contains(self, slice_hash):
+        with self._lock:
+            self._readDirectory()
+            return slice_hash in self._files
+
+    ##  Write the result of a slice to a file.
+    #
+    #   \param slice_hash The hash of the slice message.
+    #   \param result The SliceResult.
+    def put(self, slice_hash, result):
+        with self._lock:
+            self._readDirectory()
+            file_path = self._getFilePath(slice_hash)
+            try:
+                os.makedirs(self._directory, exist_ok = True)
+                temporary_path = file_path + ".tmp"
+                with open(temporary_path, "wb") as f:
+                    pickle.dump((self._version, result.toData()), f, protocol = pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary_path, file_path)  # Never leave a half-written file behind.
+                size = os.path.getsize(file_path)
+            except EnvironmentError as e:
+                Logger.log("w", "Could not store slice result {file_path}: {error}".format(file_path = file_path, error = str(e)))
+                return
+            self._total_size -= self._files.pop(slice_hash, 0)
+            self._files[slice_hash] = size
+            self._total_size += size
+            self._evict()
+
+    def _getFilePath(self, slice_hash):
+        return os.path.join(self._directory, slice_hash + ".slice")
+
+    ##  Find the files that are in the cache directory, if that wasn't done
+    #   yet.
+    def _readDirectory(self):
+        if self._files is not None:
+            return
+        files = []
+        if os.path.isdir(self._directory):
+            for file_name in os.listdir(self._directory):
+                if not file_name.endswith(".slice"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self._directory, file_name))
+                except EnvironmentError:
+                    continue
+                files.append((stat.st_mtime, file_name[:-len(".slice")], stat.st_size))
+        self._files = collections.OrderedDict((slice_hash, size) for _, slice_hash, size in sorted(files))
+        self._total_size = sum(self._files.values())
+        self._evict()
+
+    def _removeFile(self, slice_hash):
+        self._total_size -= self._files.pop(slice_hash, 0)
+        try:
+            os.remove(self._getFilePath(slice_hash))
+        except EnvironmentError:
+            pass  # Already gone.
+
+    ##  Remove the least recently used files until the rest fits in the size
+    #   budget.
+    def _evict(self):
+        while self._files and self._total_size > self._size_budget:
+            self._removeFile(next(iter(self._files)))
+
+
+##  Keeps the results of the most recent slices in memory, so that slicing
+#   the same scene with the same settings again can be skipped.
+#
+#   The results are identified by the hash of the slice message that produced
+#   them. When the results take more memory than the budget allows, the ones
+#   that were used longest ago are removed. Optionally, the results are also
+#   stored on disk, where they are found when they are no longer in memory.
+class SliceResultCache:
+    ##  Creates an empty cache.
+    #
+    #   \param memory_budget How many bytes the results may take together. If
+    #   0, nothing is kept.
+    def __init__(self, memory_budget = 0):
+        self._lock = threading.Lock()
+        self._results = collections.OrderedDict()  # Slice hash -> SliceResult, the least recently used first.
+        self._memory_budget = memory_budget
+        self._disk_cache = None  # Optional SliceResultDiskCache for the results that don't fit in memory or survive a restart.
+        self._disk_hits = 0
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+
+    ##  Change how many bytes the results may take together.
+    def setMemoryBudget(self, memory_budget):
+        with self._lock:
+            self._memory_budget = memory_budget
+            self._evict()
+
+    def getMemoryBudget(self):
+        return self._memory_budget
+
+    ##  Also store the results on disk.
+    #
+    #   \param disk_cache The SliceResultDiskCache to store the results in, or
+    #   None to only keep them in memory.
+    def setDiskCache(self, disk_cache):
+        self._disk_cache = disk_cache
+
+    ##  Whether any results are kept at all.
+    def isEnabled(self):
+        return self._memory_budget > 0 or self._disk_cache is not None
+
+    ##  Get the result of an earlier slice.
+    #
+    #   \param slice_hash The hash of the slice message.
+    #   \return The SliceResult, or None if that message wasn't sliced before.
+    def get(self, slice_hash):
+        with self._lock:
+            result = self._results.get(slice_hash)
+            if result is not None:
+                self._results.move_to_end(slice_hash)
+                self._hits += 1
+                return result
+            disk_cache = self._disk_cache
+
+        if disk_cache is not None:
+            result = disk_cache.get(slice_hash)
+        with self._lock:
+            if result is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            self._disk_hits += 1
+            self._putInMemory(slice_hash, result)
+            return result
+
+    ##  Whether the result of a slice is kept, without counting a hit or a
+    #   miss.
+    #
+    #   \param slice_hash The hash of the slice message.
+    def contains(self, slice_hash):
+        with self._lock:
+            if slice_hash in self._results:
+                return True
+            disk_cache = self._disk_cache
+        return disk_cache is not None and disk_cache.contains(slice_hash)
+
+    ##  Keep the result of a slice.
+    #
+    #   \param slice_hash The hash of the slice message.
+    #   \param result The SliceResult.
+    def put(self, slice_hash, result):
+        with self._lock:
+            self._putInMemory(slice_hash, result)
+            disk_cache = self._disk_cache
+        if disk_cache is not None:
+            start_time = time.time()
+            disk_cache.put(slice_hash, result)
+            Logger.log("d", "Writing slice result to disk took %s seconds", time.time() - start_time)
+
+    ##  Forget all results.
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self._size = 0
+
+    ##  Get statistics about the results in the cache.
+    #
+    #   \return A dictionary with the number of results, their total size in
+    #   bytes and the number of hits and misses.
+    def getStatistics(self):
+        with self._lock:
+            return {
+                "count": len(self._results),
+                "size": self._size,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses
+            }
+
+    def _putInMemory(self, slice_hash, result):
+        if result.getSize() > self._memory_budget:  # Would push out everything else, and still not fit.
+            return
+        if slice_hash in self._results:
+            self._size -= self._results.pop(slice_hash).getSize()
+        self._results[slice_hash] = result
+        self._size += result.getSize()
+        self._evict()
+
+    ##  Remove the least recently used results until the rest fits in the
+    #   memory budget.
+    def _evict(self):
+        while self._results and self._size > self._memory_budget:
+            _, result = self._results.popitem(last = False)
+            self._size -= result.getSize()
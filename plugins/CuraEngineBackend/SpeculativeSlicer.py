@@ -0,0 +1,228 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import collections
+import hashlib
+import threading
+import time
+
+from UM.Logger import Logger
+
+from .EngineProcess import EngineError
+from .StoreSliceResultJob import StoreSliceResultJob
+
+
+##  Combine the hashes of the settings part and the scene part of a slice
+#   message into the hash of the whole message.
+#
+#   \param settings_digest The digest of the settings part.
+#   \param scene_digest The digest of the objects.
+#   \return The hash that slice results are stored with.
+def combineSliceHash(settings_digest, scene_digest):
+    return hashlib.sha1(settings_digest + scene_digest).hexdigest()
+
+
+##  The settings part of a slice message: everything other than the objects.
+#
+#   A configuration that was sliced before can be sliced again with another
+#   scene, without the stacks that it was made from.
+class SliceConfiguration:
+    ##  \param global_settings The global settings, as (key, encoded value).
+    #   \param limits The limit_to_extruder list, as (key, extruder).
+    #   \param extruders For each extruder, its position and its settings as
+    #   (key, encoded value).
+    #   \param digest The digest of the hashed settings.
+    def __init__(self, global_settings, limits, extruders, digest):
+        self.global_settings = global_settings
+        self.limits = limits
+        self.extruders = extruders
+        self.digest = digest
+
+    ##  Get the encoded value of a global setting, or None if it isn't sent.
+    def getGlobalSetting(self, key):
+        for setting_key, value in self.global_settings:
+            if setting_key == key:
+                return value
+        return None
+
+
+##  The objects of a slice message.
+class SliceScene:
+    ##  \param object_lists For each group of objects: the settings of the
+    #   group and, for each object, its ID, its vertices and its settings. All
+    #   settings are (key, encoded value).
+    #   \param print_sequence The encoded print_sequence setting that the
+    #   objects were grouped with.
+    #   \param digest The digest of the hashed objects.
+    def __init__(self, object_lists, print_sequence, digest):
+        self.object_lists = object_lists
+        self.print_sequence = print_sequence
+        self.digest = digest
+
+    ##  Whether any object has settings of its own, other than its extruder.
+    #
+    #   The values of per-object settings are resolved with the configuration
+    #   that the scene was sliced with. They would be different with another
+    #   configuration.
+    def hasObjectSettings(self):
+        for group_settings, objects in self.object_lists:
+            if any(key != "extruder_nr" for key, _ in group_settings):
+                return True
+            for _, _, settings in objects:
+                if any(key != "extruder_nr" for key, _ in settings):
+                    return True
+        return False
+
+
+##  Fill in a slice message from a configuration and a scene.
+#
+#   \param slice_message The empty slice message to fill in.
+#   \param configuration The SliceConfiguration to slice with.
+#   \param scene The SliceScene to slice.
+def fillSliceMessage(slice_message, configuration, scene):
+    global_settings_message = slice_message.getMessage("global_settings")
+    for key, value in configuration.global_settings:
+        setting_message = global_settings_message.addRepeatedMessage("settings")
+        setting_message.name = key
+        setting_message.value = value
+
+    for key, extruder in configuration.limits:
+        setting_extruder = slice_message.addRepeatedMessage("limit_to_extruder")
+        setting_extruder.name = key
+        setting_extruder.extruder = extruder
+
+    for position, settings in configuration.extruders:
+        extruder_message = slice_message.addRepeatedMessage("extruders")
+        extruder_message.id = position
+        for key, value in settings:
+            setting = extruder_message.getMessage("settings").addRepeatedMessage("settings")
+            setting.name = key
+            setting.value = value
+
+    for group_settings, objects in scene.object_lists:
+        group_message = slice_message.addRepeatedMessage("object_lists")
+        _addSettings(group_message, group_settings)
+        for object_id, vertices, settings in objects:
+            obj = group_message.addRepeatedMessage("objects")
+            obj.id = object_id
+            obj.vertices = vertices
+            _addSettings(obj, settings)
+
+def _addSettings(message, settings):
+    for key, value in settings:
+        setting = message.addRepeatedMessage("settings")
+        setting.name = key
+        setting.value = value
+
+
+##  Slices the current scene with configurations that were sliced recently,
+#   while the backend is idle.
+#
+#   The results are put in the SliceResultCache. When the user switches back
+#   to one of those configurations, for instance the previous quality
+#   profile, the result is found by its hash and shown without slicing.
+#
+#   Each slice runs in a separate engine process, started from a background
+#   thread. cancel() stops the engine right away, for instance when the scene
+#   changes and the next slice needs the processor.
+class SpeculativeSlicer:
+    ##  How many recent configurations are remembered.
+    _max_configurations = 3
+
+    ##  \param result_cache The SliceResultCache to store the results in.
+    #   \param create_engine A function that starts an EngineProcess and
+    #   returns it. It is called from a background thread.
+    def __init__(self, result_cache, create_engine):
+        self._result_cache = result_cache
+        self._create_engine = create_engine
+        self._configurations = collections.OrderedDict()  # Settings digest -> SliceConfiguration, the least recently sliced first.
+
+        self._lock = threading.Lock()
+        self._generation = 0  # Increased by cancel(). A thread that was started for an older generation stops.
+        self._engine = None  # The engine that is slicing right now, if any.
+
+    ##  Remember a configuration that was sliced, to slice later scenes with.
+    def addConfiguration(self, configuration):
+        self._configurations.pop(configuration.digest, None)
+        self._configurations[configuration.digest] = configuration
+        while len(self._configurations) > self._max_configurations:
+            self._configurations.popitem(last = False)
+
+    ##  Start slicing a scene with the other recent configurations.
+    #
+    #   Anything that was still being sliced is cancelled first. This must be
+    #   called on the main thread.
+    #   \param scene The SliceScene that was just sliced.
+    #   \param configuration The SliceConfiguration that it was sliced with.
+    def start(self, scene, configuration):
+        self.cancel()
+        if scene.hasObjectSettings():
+            return
+
+        slices = []
+        for other_configuration in reversed(list(self._configurations.values())):  # The most recent first.
+            if other_configuration.digest == configuration.digest:
+                continue
+            if other_configuration.getGlobalSetting("print_sequence") != scene.print_sequence:  # The objects would be grouped differently.
+                continue
+            slices.append((combineSliceHash(other_configuration.digest, scene.digest), other_configuration))
+        if not slices:
+            return
+
+        with self._lock:
+            generation = self._generation
+        thread = threading.Thread(target = self._run, args = (generation, scene, slices), name = "SpeculativeSlicer", daemon = True)
+        thread.start()
+
+    ##  Stop slicing, and stop the engine if it is busy.
+    def cancel(self):
+        with self._lock:
+            self._generation += 1
+            engine = self._engine
+            self._engine = None
+        if engine is not None:
+            engine.close()
+
+    def _isCancelled(self, generation):
+        with self._lock:
+            return generation != self._generation
+
+    def _run(self, generation, scene, slices):
+        for slice_hash, configuration in slices:
+            if self._isCancelled(generation):
+                return
+            if self._result_cache.contains(slice_hash):
+                continue
+
+            start_time = time.time()
+            try:
+                engine = self._create_engine()
+            except Exception:
+                Logger.logException("w", "Could not start an engine to slice in the background")
+                return
+            with self._lock:
+                if generation != self._generation:
+                    engine.close()
+                    return
+                self._engine = engine
+
+            try:
+                slice_message = engine.createSliceMessage()
+                fillSliceMessage(slice_message, configuration, scene)
+                result = engine.slice(slice_message, keep_layers = True)
+            except EngineError as e:
+                if not self._isCancelled(generation):
+                    Logger.log("w", "Slicing in the background failed: %s", str(e))
+                return
+            finally:
+                with self._lock:
+                    owned = self._engine is engine
+                    if owned:
+                        self._engine = None
+                if owned:  # Otherwise cancel() stopped it.
+                    engine.close()
+
+            if self._isCancelled(generation):
+                return
+            StoreSliceResultJob(self._result_cache, slice_hash, result.gcode_list, result.layers, result.print_times, result.material_amounts).run()
+            Logger.log("d", "Sliced %s in the background in %s seconds", slice_hash, time.time() - start_time)
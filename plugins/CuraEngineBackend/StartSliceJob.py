@@ -1,6 +1,7 @@
 # Copyright (c) 2017 Ultimaker B.V.
 # Cura is released under the terms of the LGPLv3 or higher.
 
+import hashlib
 import numpy
 from string import Formatter
 from enum import IntEnum
@@ -19,6 +20,9 @@ from UM.Settings.SettingRelation import RelationType
 from cura.OneAtATimeIterator import OneAtATimeIterator
 from cura.Settings.ExtruderManager import ExtruderManager
 
+from .SliceMessageCache import SliceMessageCache
+from .SpeculativeSlicer import SliceConfiguration, SliceScene, combineSliceHash
+
 class StartJobResult(IntEnum):
     Finished = 1
     Error = 2
@@ -45,13 +49,74 @@ class GcodeStartEndFormatter(Formatter):
 
 ##  Job class that builds up the message of scene data to send to CuraEngine.
 class StartSliceJob(Job):
-    def __init__(self, slice_message):
+    ##  The extra g-code tokens with the current time, which change every
+    #   second.
+    _time_tokens = ("time", "date", "day")
+
+    ##  Creates the job.
+    #
+    #   \param slice_message The message to fill in.
+    #   \param message_cache (Optional) The parts of the message that were
+    #   built by earlier slices. If not given, the whole message is built.
+    #   \param result_cache (Optional) The SliceResultCache to look for an
+    #   earlier result of the same message in.
+    def __init__(self, slice_message, message_cache = None, result_cache = None):
         super().__init__()
 
         self._scene = Application.getInstance().getController().getScene()
         self._slice_message = slice_message
         self._is_cancelled = False
 
+        self._message_cache = message_cache if message_cache is not None else SliceMessageCache()
+        self._settings_revision = self._message_cache.getRevision()  # Taken before reading any setting.
+
+        # Hashes of everything that's put in the message, to recognise a slice that was done before. The settings and
+        # the objects are hashed apart, so that the objects can be sliced again with other settings.
+        self._settings_hash = hashlib.sha1()
+        self._scene_hash = hashlib.sha1()
+        self._current_hash = self._settings_hash
+        self._result_cache = result_cache
+        self._cached_result = None
+
+        self._slice_configuration = None
+        self._slice_scene = None
+
+    ##  Get a hash of the contents of the slice message.
+    #
+    #   Two slice messages with the same hash give the same slice result. This
+    #   is only complete when the job finished successfully.
+    def getSliceHash(self) -> str:
+        return combineSliceHash(self._settings_hash.digest(), self._scene_hash.digest())
+
+    ##  Get the settings part of the slice message, to slice other scenes with.
+    #
+    #   \return A SliceConfiguration, or None if the job didn't finish.
+    def getSliceConfiguration(self):
+        return self._slice_configuration
+
+    ##  Get the objects of the slice message, to slice with other settings.
+    #
+    #   \return A SliceScene, or None if the job didn't finish.
+    def getSliceScene(self):
+        return self._slice_scene
+
+    ##  Get the result of an earlier slice of the same message, if it was
+    #   stored.
+    #
+    #   \return A SliceResult, or None if the engine needs to slice.
+    def getCachedResult(self):
+        return self._cached_result
+
+    ##  Add some parts of the slice message to the hash of its contents.
+    def _addToHash(self, *parts):
+        for part in parts:
+            if isinstance(part, str):
+                part = part.encode("utf-8")
+            elif not isinstance(part, bytes):
+                part = str(part).encode("utf-8")
+            self._current_hash.update(len(part).to_bytes(8, "little"))  # Prevent different splits of the same bytes from giving the same hash.
+            self._current_hash.update(part)
+
     def getSliceMessage(self):
         return self._slice_message
 
@@ -156,46 +221,77 @@ class StartSliceJob(Job):
                 self.setResult(StartJobResult.NothingToSlice)
                 return
 
-            self._buildGlobalSettingsMessage(stack)
-            self._buildGlobalInheritsStackMessage(stack)
+            global_settings = self._buildGlobalSettingsMessage(stack)
+            limits = self._buildGlobalInheritsStackMessage(stack)
 
             # Build messages for extruder stacks
+            extruders = []
             for extruder_stack in ExtruderManager.getInstance().getMachineExtruders(stack.getId()):
-                self._buildExtruderMessage(extruder_stack)
+                extruders.append(self._buildExtruderMessage(extruder_stack))
+            configuration = SliceConfiguration(global_settings, limits, extruders, self._settings_hash.digest())
+
+            self._current_hash = self._scene_hash
+            object_lists = []
 
+            # Copies of an object share their mesh data. The protocol needs the vertices of every object, but copies
+            # that are only moved can share the rotated and flattened vertices: (mesh, rotation and scale) -> vertices.
+            # Objects that weren't rotated or scaled since the last slice can use the vertices of that slice.
+            untranslated_vertices = {}
             for group in object_groups:
                 group_message = self._slice_message.addRepeatedMessage("object_lists")
+                self._addToHash("object_list")
+                group_settings = []
                 if group[0].getParent().callDecoration("isGroup"):
-                    self._handlePerObjectSettings(group[0].getParent(), group_message)
+                    group_settings = self._handlePerObjectSettings(group[0].getParent(), group_message)
+                objects = []
+                object_lists.append((group_settings, objects))
                 for object in group:
                     mesh_data = object.getMeshData()
                     rot_scale = object.getWorldTransformation().getTransposed().getData()[0:3, 0:3]
                     translate = object.getWorldTransformation().getData()[:3, 3]
 
-                    # This effectively performs a limited form of MeshData.getTransformed that ignores normals.
-                    verts = mesh_data.getVertices()
-                    verts = verts.dot(rot_scale)
-                    verts += translate
-
-                    # Convert from Y up axes to Z up axes. Equals a 90 degree rotation.
-                    verts[:, [1, 2]] = verts[:, [2, 1]]
-                    verts[:, 1] *= -1
+                    key = (id(mesh_data), rot_scale.tobytes())
+                    if key not in untranslated_vertices:
+                        cached = self._message_cache.getVertices(key)
+                        if cached is not None:
+                            untranslated_vertices[key] = cached
+                    if key not in untranslated_vertices:
+                        # This effectively performs a limited form of MeshData.getTransformed that ignores normals.
+                        verts = mesh_data.getVertices()
+                        verts = verts.dot(rot_scale)
+
+                        indices = mesh_data.getIndices()
+                        if indices is not None:
+                            verts = numpy.take(verts, indices.flatten(), axis=0)
+
+                        # Convert from Y up axes to Z up axes. Equals a 90 degree rotation.
+                        verts[:, [1, 2]] = verts[:, [2, 1]]
+                        verts[:, 1] *= -1
+                        # Keep the mesh data, so that its ID stays unique.
+                        untranslated_vertices[key] = (mesh_data, verts, hashlib.sha1(verts.tobytes()).digest())
+
+                    # Translate after converting the axes, so that the same vertices can be used for every copy.
+                    flat_verts = numpy.array(untranslated_vertices[key][1])
+                    flat_verts += translate[[0, 2, 1]] * numpy.array([1, -1, 1])
 
                     obj = group_message.addRepeatedMessage("objects")
                     obj.id = id(object)
 
-                    indices = mesh_data.getIndices()
-                    if indices is not None:
-                        flat_verts = numpy.take(verts, indices.flatten(), axis=0)
-                    else:
-                        flat_verts = numpy.array(verts)
-
                     obj.vertices = flat_verts
+                    self._addToHash("object", untranslated_vertices[key][2], translate.tobytes())
 
-                    self._handlePerObjectSettings(object, obj)
+                    objects.append((obj.id, flat_verts, self._handlePerObjectSettings(object, obj)))
 
                     Job.yieldThread()
 
+            self._message_cache.setVertices(untranslated_vertices)
+            self._slice_configuration = configuration
+            self._slice_scene = SliceScene(object_lists, configuration.getGlobalSetting("print_sequence"), self._scene_hash.digest())
+
+        # Reading a stored result from disk can take a while, so look for it here rather than on the main thread.
+        if self._result_cache is not None and self._result_cache.isEnabled():
+            self._cached_result = self._result_cache.get(self.getSliceHash())
+
         self.setResult(StartJobResult.Finished)
 
     def cancel(self):
@@ -239,11 +335,46 @@ class StartSliceJob(Job):
             Logger.logException("w", "Unable to do token replacement on start/end gcode")
             return str(value)
 
+    ##  Check whether a piece of g-code uses the tokens for the current time,
+    #   in which case it has to be expanded again for every slice.
+    def _usesTimeTokens(self, value: str) -> bool:
+        return any("{" + token + "}" in str(value) for token in self._time_tokens)
+
+    ##  Add a setting that is sent to the engine to the hash of the message.
+    #
+    #   The tokens for the current time are left out, so that slicing the same
+    #   scene again gives the same hash. If the start or end g-code uses them,
+    #   the expanded g-code is still part of the hash.
+    def _addSettingToHash(self, key, value):
+        if key not in self._time_tokens:
+            self._addToHash(key, value)
+
     ##  Create extruder message from stack
+    #
+    #   \return The position of the extruder and its settings, as sent.
     def _buildExtruderMessage(self, stack):
         message = self._slice_message.addRepeatedMessage("extruders")
         message.id = int(stack.getMetaDataEntry("position"))
+        self._addToHash("extruder", message.id)
+
+        cache_key = ("extruder", stack.getId())
+        settings_message = self._message_cache.getSettings(cache_key, self._settings_revision)
+        if settings_message is None:
+            settings_message = self._getExtruderSettings(stack)
+            if not self._usesTimeTokens(stack.getProperty("machine_extruder_start_code", "value")) and not self._usesTimeTokens(stack.getProperty("machine_extruder_end_code", "value")):
+                self._message_cache.putSettings(cache_key, self._settings_revision, settings_message)
+        for key, value in settings_message:
+            setting = message.getMessage("settings").addRepeatedMessage("settings")
+            setting.name = key
+            setting.value = value
+            self._addSettingToHash(key, value)
+        return message.id, settings_message
 
+    ##  Get the settings to send for an extruder.
+    #
+    #   \param stack The extruder stack to get the settings from.
+    #   \return A list of setting keys and their encoded values.
+    def _getExtruderSettings(self, stack):
         settings = self._buildReplacementTokens(stack)
 
         # Also send the material GUID. This is a setting in fdmprinter, but we have no interface for it.
@@ -253,20 +384,48 @@ class StartSliceJob(Job):
         settings["machine_extruder_start_code"] = self._expandGcodeTokens(settings["machine_extruder_start_code"], settings)
         settings["machine_extruder_end_code"] = self._expandGcodeTokens(settings["machine_extruder_end_code"], settings)
 
+        result = []
         for key, value in settings.items():
             # Do not send settings that are not settable_per_extruder.
             if not stack.getProperty(key, "settable_per_extruder"):
                 continue
-            setting = message.getMessage("settings").addRepeatedMessage("settings")
-            setting.name = key
-            setting.value = str(value).encode("utf-8")
+            result.append((key, str(value).encode("utf-8")))
             Job.yieldThread()
+        return result
 
     ##  Sends all global settings to the engine.
     #
     #   The settings are taken from the global stack. This does not include any
     #   per-extruder settings or per-object settings.
+    #
+    #   \return The settings as sent: a list of keys and their encoded values.
     def _buildGlobalSettingsMessage(self, stack):
+        # The start g-code uses the temperatures of the first used extruder, which depends on the scene.
+        extruder_stack = Application.getInstance().getExtruderManager().getUsedExtruderStacks()[0]
+
+        cache_key = ("global", stack.getId(), extruder_stack.getId())
+        settings_message = self._message_cache.getSettings(cache_key, self._settings_revision)
+        if settings_message is None:
+            settings_message = self._getGlobalSettings(stack, extruder_stack)
+            if not self._usesTimeTokens(stack.getProperty("machine_start_gcode", "value")) and not self._usesTimeTokens(stack.getProperty("machine_end_gcode", "value")):
+                self._message_cache.putSettings(cache_key, self._settings_revision, settings_message)
+
+        # Add all sub-messages for each individual setting.
+        self._addToHash("global_settings")
+        for key, value in settings_message:
+            setting_message = self._slice_message.getMessage("global_settings").addRepeatedMessage("settings")
+            setting_message.name = key
+            setting_message.value = value
+            self._addSettingToHash(key, value)
+        return settings_message
+
+    ##  Get the global settings to send.
+    #
+    #   \param stack The global stack to get the settings from.
+    #   \param extruder_stack The first used extruder, of which the settings
+    #   are used in the start and end g-code.
+    #   \return A list of setting keys and their encoded values.
+    def _getGlobalSettings(self, stack, extruder_stack):
         settings = self._buildReplacementTokens(stack)
 
         # Pre-compute material material_bed_temp_prepend and material_print_temp_prepend
@@ -277,19 +436,17 @@ class StartSliceJob(Job):
         settings["material_print_temp_prepend"] = all(("{" + setting + "}" not in start_gcode for setting in print_temperature_settings))
 
         # Find the correct temperatures from the first used extruder
-        extruder_stack = Application.getInstance().getExtruderManager().getUsedExtruderStacks()[0]
         extruder_0_settings = self._buildReplacementTokens(extruder_stack)
 
         # Replace the setting tokens in start and end g-code.
         settings["machine_start_gcode"] = self._expandGcodeTokens(settings["machine_start_gcode"], extruder_0_settings)
         settings["machine_end_gcode"] = self._expandGcodeTokens(settings["machine_end_gcode"], extruder_0_settings)
 
-        # Add all sub-messages for each individual setting.
+        result = []
         for key, value in settings.items():
-            setting_message = self._slice_message.getMessage("global_settings").addRepeatedMessage("settings")
-            setting_message.name = key
-            setting_message.value = str(value).encode("utf-8")
+            result.append((key, str(value).encode("utf-8")))
             Job.yieldThread()
+        return result
 
     ##  Sends for some settings which extruder they should fallback to if not
     #   set.
@@ -299,24 +456,37 @@ class StartSliceJob(Job):
     #
     #   \param stack The global stack with all settings, from which to read the
     #   limit_to_extruder property.
+    #   \return The limits as sent: a list of keys and their extruders.
     def _buildGlobalInheritsStackMessage(self, stack):
-        for key in stack.getAllKeys():
-            extruder = int(round(float(stack.getProperty(key, "limit_to_extruder"))))
-            if extruder >= 0: #Set to a specific extruder.
-                setting_extruder = self._slice_message.addRepeatedMessage("limit_to_extruder")
-                setting_extruder.name = key
-                setting_extruder.extruder = extruder
-            Job.yieldThread()
+        cache_key = ("limit_to_extruder", stack.getId())
+        limits = self._message_cache.getSettings(cache_key, self._settings_revision)
+        if limits is None:
+            limits = []
+            for key in stack.getAllKeys():
+                extruder = int(round(float(stack.getProperty(key, "limit_to_extruder"))))
+                if extruder >= 0: #Set to a specific extruder.
+                    limits.append((key, extruder))
+                Job.yieldThread()
+            self._message_cache.putSettings(cache_key, self._settings_revision, limits)
+
+        self._addToHash("limit_to_extruder")
+        for key, extruder in limits:
+            setting_extruder = self._slice_message.addRepeatedMessage("limit_to_extruder")
+            setting_extruder.name = key
+            setting_extruder.extruder = extruder
+            self._addToHash(key, extruder)
+        return limits
 
     ##  Check if a node has per object settings and ensure that they are set correctly in the message
     #   \param node \type{SceneNode} Node to check.
     #   \param message object_lists message to put the per object settings in
+    #   \return The settings as sent: a list of keys and their encoded values.
     def _handlePerObjectSettings(self, node, message):
         stack = node.callDecoration("getStack")
 
         # Check if the node has a stack attached to it and the stack has any settings in the top container.
         if not stack:
-            return
+            return []
 
         # Check all settings for relations, so we can also calculate the correct values for dependent settings.
         top_of_stack = stack.getTop()  # Cache for efficiency.
@@ -333,7 +503,8 @@ class StartSliceJob(Job):
             changed_setting_keys.add("extruder_nr")
 
         # Get values for all changed settings
-        for key in changed_setting_keys:
+        result = []
+        for key in sorted(changed_setting_keys):  # Sorted, so that the hash of the message doesn't depend on the order of the set.
             setting = message.addRepeatedMessage("settings")
             setting.name = key
             extruder = int(round(float(stack.getProperty(key, "limit_to_extruder"))))
@@ -344,9 +515,13 @@ class StartSliceJob(Job):
             else:
                 limited_stack = stack
 
-            setting.value = str(limited_stack.getProperty(key, "value")).encode("utf-8")
+            value = str(limited_stack.getProperty(key, "value")).encode("utf-8")
+            setting.value = value
+            self._addSettingToHash(key, value)
+            result.append((key, value))
 
             Job.yieldThread()
+        return result
 
     ##  Recursive function to put all settings that require each other for value changes in a list
     #   \param relations_set \type{set} Set of keys (strings) of settings that are influenced
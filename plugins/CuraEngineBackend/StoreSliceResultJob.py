@@ -0,0 +1,45 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+from time import time
+
+from UM.Job import Job
+from UM.Logger import Logger
+
+from .SliceResultCache import CachedLayer, SliceResult
+
+
+##  Copies the result of a slice from the engine's messages and puts it in the
+#   slice result cache.
+#
+#   Copying all layers takes a while for big prints, so this is done in the
+#   background after the slice is shown.
+class StoreSliceResultJob(Job):
+    ##  Creates the job.
+    #
+    #   \param cache The SliceResultCache to put the result in.
+    #   \param slice_hash The hash of the slice message that was sliced.
+    #   \param gcode_list The g-code of each layer, before the print time and
+    #   material estimates were filled in.
+    #   \param layer_messages The LayerOptimized messages from the engine.
+    #   \param print_times For each feature, the time it takes to print.
+    #   \param material_amounts For each extruder, the amount of material used.
+    def __init__(self, cache, slice_hash, gcode_list, layer_messages, print_times, material_amounts):
+        super().__init__()
+        self._cache = cache
+        self._slice_hash = slice_hash
+        self._gcode_list = gcode_list
+        self._layer_messages = layer_messages
+        self._print_times = print_times
+        self._material_amounts = material_amounts
+
+    def run(self):
+        start_time = time()
+        layers = []
+        for message in self._layer_messages:
+            layers.append(CachedLayer.fromMessage(message))
+            Job.yieldThread()
+
+        result = SliceResult(self._gcode_list, layers, self._print_times, self._material_amounts)
+        self._cache.put(self._slice_hash, result)
+        Logger.log("d", "Storing slice result of %d bytes took %s seconds", result.getSize(), time() - start_time)
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+##  Stand-in for CuraEngine in tests.
+#
+#   It is started like "CuraEngine connect 127.0.0.1:port", and answers every
+#   slice message with a g-code prefix, a g-code layer and an optimized layer
+#   for every object list, made-up estimates and a message that slicing is
+#   finished. The g-code contains the value of the layer_height setting and
+#   the number of objects, so tests can check that the right message was
+#   sliced. If the message has a fake_engine_exit setting, it exits halfway,
+#   like a crashing engine.
+
+import os
+import sys
+import time
+
+import Arcus
+
+protocol_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Cura.proto")
+
+def main():
+    host, port = sys.argv[sys.argv.index("connect") + 1].split(":")
+    socket = Arcus.Socket()
+    socket.registerAllMessageTypes(protocol_file)
+    socket.connect(host, int(port))
+
+    while socket.getState() not in (Arcus.SocketState.Closed, Arcus.SocketState.Error):
+        message = socket.takeNextMessage()
+        if message is None:
+            time.sleep(0.01)
+            continue
+        if message.getTypeName() != "cura.proto.Slice":
+            continue
+
+        layer_height = ""
+        exit_halfway = False
+        global_settings = message.getMessage("global_settings")
+        for index in range(global_settings.repeatedMessageCount("settings")):
+            setting = global_settings.getRepeatedMessage("settings", index)
+            if setting.name == "layer_height":
+                layer_height = setting.value.decode("utf-8")
+            elif setting.name == "fake_engine_exit":
+                exit_halfway = True
+
+        prefix = socket.createMessage("cura.proto.GCodePrefix")
+        prefix.data = ";FLAVOR:Fake\n;PRINT.TIME:{print_time}\n".encode("utf-8")
+        socket.sendMessage(prefix)
+        if exit_halfway:
+            os._exit(1)
+        for index in range(message.repeatedMessageCount("object_lists")):
+            object_list = message.getRepeatedMessage("object_lists", index)
+            layer = socket.createMessage("cura.proto.GCodeLayer")
+            layer.data = ";LAYER_HEIGHT:{layer_height}\n;OBJECTS:{objects}\n".format(layer_height = layer_height, objects = object_list.repeatedMessageCount("objects")).encode("utf-8")
+            socket.sendMessage(layer)
+            optimized_layer = socket.createMessage("cura.proto.LayerOptimized")
+            optimized_layer.id = index
+            socket.sendMessage(optimized_layer)
+
+        estimates = socket.createMessage("cura.proto.PrintTimeMaterialEstimates")
+        estimates.time_infill = 3600.0
+        estimates.time_travel = 60.0
+        material_estimate = estimates.addRepeatedMessage("materialEstimates")
+        material_estimate.id = 0
+        material_estimate.material_amount = 1000.0
+        socket.sendMessage(estimates)
+        socket.sendMessage(socket.createMessage("cura.proto.SlicingFinished"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import unittest.mock #To mock the timer, the signals and the clock.
+
+import pytest #To register tests with.
+
+from CuraEngineBackend.CuraEngineBackend import CuraEngineBackend #The class we're testing.
+
+##  A message from the engine with only the fields that the handlers use.
+class MockMessage:
+    def __init__(self, amount = 0.0, data = b""):
+        self.amount = amount
+        self.data = data
+
+##  A back-end with only what the message handlers use, without starting an
+#   engine or connecting to the application.
+@pytest.fixture()
+def backend():
+    result = CuraEngineBackend.__new__(CuraEngineBackend)
+    result._message_handlers = {}
+    result._message_statistics = {}
+    result._stored_layer_data = []
+    result._stored_optimized_layer_data = []
+    result._scene = unittest.mock.MagicMock()
+    result._scene.gcode_list = []
+    result._progress = None
+    result._progress_timer = unittest.mock.MagicMock()
+    result._progress_timer.isActive.return_value = False
+    result.processingProgress = unittest.mock.MagicMock()
+    result.backendStateChange = unittest.mock.MagicMock()
+    result._speculation = None
+
+    result._addMessageHandler("cura.proto.Layer", result._onLayerMessage)
+    result._addMessageHandler("cura.proto.LayerOptimized", result._onOptimizedLayerMessage)
+    result._addMessageHandler("cura.proto.Progress", result._onProgressMessage)
+    result._addMessageHandler("cura.proto.GCodeLayer", result._onGCodeLayerMessage)
+    result._addMessageHandler("cura.proto.GCodePrefix", result._onGCodePrefixMessage)
+    return result
+
+##  Tests that the handlers store the layers and the g-code as they arrive.
+def test_ingestMessages(backend):
+    layers = [MockMessage(), MockMessage()]
+    optimized_layer = MockMessage()
+    backend._message_handlers["cura.proto.Layer"](layers[0])
+    backend._message_handlers["cura.proto.Layer"](layers[1])
+    backend._message_handlers["cura.proto.LayerOptimized"](optimized_layer)
+    backend._message_handlers["cura.proto.GCodeLayer"](MockMessage(data = "G1 X10\n".encode("utf-8")))
+    backend._message_handlers["cura.proto.GCodePrefix"](MockMessage(data = ";FLAVOR:Griffin\n".encode("utf-8")))
+
+    assert backend._stored_layer_data == layers
+    assert backend._stored_optimized_layer_data == [optimized_layer]
+    assert backend._scene.gcode_list == [";FLAVOR:Griffin\n", "G1 X10\n"]
+
+##  Tests that only the latest progress is shown, once per timer interval.
+def test_throttleProgress(backend):
+    for amount in (0.1, 0.2, 0.3):
+        backend._message_handlers["cura.proto.Progress"](MockMessage(amount = amount))
+        backend._progress_timer.isActive.return_value = True #Started by the first message.
+
+    backend._progress_timer.start.assert_called_once_with()
+    backend.processingProgress.emit.assert_not_called()
+
+    backend._onProgressTimeout()
+    backend._onProgressTimeout() #No new progress since.
+    backend.processingProgress.emit.assert_called_once_with(0.3)
+
+##  Tests that progress which wasn't shown yet is dropped when it's cleared.
+def test_clearProgress(backend):
+    backend._message_handlers["cura.proto.Progress"](MockMessage(amount = 0.5))
+
+    backend._clearProgress()
+    backend._onProgressTimeout()
+
+    backend._progress_timer.stop.assert_called_once_with()
+    backend.processingProgress.emit.assert_not_called()
+
+##  Tests that the messages are counted and timed for each type, next to the
+#   number of stored layers.
+def test_getMessageStatistics(backend):
+    # Each message is handled in 0.5 seconds, and they arrive 2 seconds apart.
+    clock = [0.0, 0.5, 2.0, 2.5, 4.0, 4.5]
+    with unittest.mock.patch("CuraEngineBackend.CuraEngineBackend.time", side_effect = clock):
+        for _ in range(3):
+            backend._message_handlers["cura.proto.Layer"](MockMessage())
+
+    statistics = backend.getMessageStatistics()
+
+    assert statistics["cura.proto.Layer"] == {"count": 3, "rate": pytest.approx(3 / 4.0), "handling_time": pytest.approx(1.5)}
+    assert statistics["stored"] == {"count": 3, "rate": 0.0, "handling_time": 0.0}
+    assert "cura.proto.Progress" not in statistics #No messages of this type.
+
+##  Tests that finishing a slice logs the statistics of the message types, but
+#   not of the stored layers, which aren't messages.
+def test_finishSliceLogsStatistics(backend):
+    backend._message_handlers["cura.proto.Layer"](MockMessage())
+    backend._slice_start_time = 0
+    backend._layer_view_active = False
+
+    with unittest.mock.patch("CuraEngineBackend.CuraEngineBackend.Application"), unittest.mock.patch("CuraEngineBackend.CuraEngineBackend.Logger") as logger:
+        backend._finishSlice()
+
+    logged_types = [call[0][3] for call in logger.log.call_args_list if call[0][1].startswith("Received")]
+    assert logged_types == ["cura.proto.Layer"]
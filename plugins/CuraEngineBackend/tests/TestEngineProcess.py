@@ -0,0 +1,108 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import concurrent.futures #To slice with several engines at the same time.
+import os.path #To find the fake engine and the protocol.
+import sys #To start the fake engine with the same Python.
+import unittest.mock #To run the batch slicer without the application.
+
+import pytest #To register tests with.
+
+pytest.importorskip("Arcus")
+
+from CuraEngineBackend.EngineProcess import EngineError, EngineProcess #The class we're testing.
+from cura.BatchSlicer import BatchSlicer
+
+fake_engine = os.path.join(os.path.dirname(os.path.abspath(__file__)), "FakeEngine.py")
+protocol_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Cura.proto")
+
+##  Starts a fake engine process.
+def createEngine():
+    return EngineProcess([sys.executable, fake_engine, "connect"], [], protocol_file, timeout = 10)
+
+##  Creates a slice message with a layer height and a number of objects.
+#
+#   If exit_halfway is set, the fake engine exits while slicing it.
+def createSliceMessage(engine, layer_height, object_count, exit_halfway = False):
+    message = engine.createSliceMessage()
+    setting = message.getMessage("global_settings").addRepeatedMessage("settings")
+    setting.name = "layer_height"
+    setting.value = str(layer_height).encode("utf-8")
+    if exit_halfway:
+        setting = message.getMessage("global_settings").addRepeatedMessage("settings")
+        setting.name = "fake_engine_exit"
+        setting.value = b"1"
+    object_list = message.addRepeatedMessage("object_lists")
+    for _ in range(object_count):
+        object_list.addRepeatedMessage("objects")
+    return message
+
+##  Tests that one engine can slice several messages after each other.
+def test_sliceSequential():
+    engine = createEngine()
+    try:
+        for layer_height, object_count in ((0.1, 1), (0.2, 3)):
+            result = engine.slice(createSliceMessage(engine, layer_height, object_count), timeout = 10)
+
+            assert result.gcode_list[0].startswith(";FLAVOR:Fake")
+            assert ";LAYER_HEIGHT:{0}\n;OBJECTS:{1}\n".format(layer_height, object_count) in result.gcode_list
+            assert result.print_times["infill"] == 3600.0
+            assert result.material_amounts == [1000.0]
+        assert engine.isAlive()
+    finally:
+        engine.close()
+    assert not engine.isAlive()
+
+##  Tests that the layers are only kept when asked for.
+def test_sliceKeepLayers():
+    engine = createEngine()
+    try:
+        result = engine.slice(createSliceMessage(engine, 0.1, 1), timeout = 10)
+        assert result.layers == []
+
+        result = engine.slice(createSliceMessage(engine, 0.1, 1), timeout = 10, keep_layers = True)
+        assert [layer.id for layer in result.layers] == [0]
+    finally:
+        engine.close()
+
+##  Tests that several engines can slice at the same time.
+def test_sliceParallel():
+    engines = [createEngine() for _ in range(3)]
+    try:
+        messages = [createSliceMessage(engine, 0.1 * (index + 1), index + 1) for index, engine in enumerate(engines)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers = len(engines)) as executor:
+            results = list(executor.map(lambda engine_message: engine_message[0].slice(engine_message[1], timeout = 10), zip(engines, messages)))
+
+        for index, result in enumerate(results):
+            assert ";OBJECTS:{0}\n".format(index + 1) in result.gcode_list[1]
+    finally:
+        for engine in engines:
+            engine.close()
+
+##  Tests that an engine that exits while slicing raises an error.
+def test_sliceEngineExits():
+    engine = createEngine()
+    try:
+        with pytest.raises(EngineError):
+            engine.slice(createSliceMessage(engine, 0.1, 1, exit_halfway = True), timeout = 10)
+        assert not engine.isAlive()
+    finally:
+        engine.close()
+
+##  Tests that the batch slicer replaces an engine that exits while slicing,
+#   also when it was the only one.
+def test_batchSlicerEngineExits(tmpdir):
+    jobs = [{"name": name, "output": str(tmpdir.join(name + ".gcode"))} for name in ("first", "crash", "third", "fourth")]
+    slicer = BatchSlicer(jobs, worker_count = 1)
+    def prepareJob(job, engine, backend, entry):
+        entry["prepare_time"] = 0
+        return createSliceMessage(engine, 0.1, 1, exit_halfway = job["name"] == "crash"), unittest.mock.MagicMock()
+    slicer._prepareJob = prepareJob
+    application = unittest.mock.MagicMock()
+    application.getBackend.return_value.createEngineProcess = createEngine
+
+    with unittest.mock.patch("UM.Application.Application.getInstance", return_value = application):
+        assert not slicer.run()
+
+    assert [entry["success"] for entry in slicer.getReport()] == [True, False, True, True]
+    assert tmpdir.join("fourth.gcode").read().startswith(";FLAVOR:Fake")
@@ -0,0 +1,50 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import pytest #To register tests with.
+
+from CuraEngineBackend.SliceMessageCache import SliceMessageCache #The class we're testing.
+
+@pytest.fixture
+def cache():
+    return SliceMessageCache()
+
+##  Tests getting settings that were stored at the current revision.
+def test_getSettingsStored(cache):
+    revision = cache.getRevision()
+    cache.putSettings(("extruder", "extruder_0"), revision, [("layer_height", b"0.1")])
+
+    assert cache.getSettings(("extruder", "extruder_0"), revision) == [("layer_height", b"0.1")]
+    assert cache.getSettings(("extruder", "extruder_1"), revision) is None
+    assert cache.getStatistics() == (1, 1)
+
+##  Tests that changing a setting forgets everything that was stored.
+def test_invalidate(cache):
+    revision = cache.getRevision()
+    cache.putSettings(("global", "machine"), revision, [("layer_height", b"0.1")])
+    cache.invalidate()
+
+    assert cache.getSettings(("global", "machine"), revision) is None
+    assert cache.getSettings(("global", "machine"), cache.getRevision()) is None
+
+##  Tests that settings that were read before a setting changed are not stored.
+#
+#   This happens when a setting changes while a slice job is building the
+#   message.
+def test_putSettingsOutdated(cache):
+    revision = cache.getRevision()
+    cache.invalidate()
+    cache.putSettings(("global", "machine"), revision, [("layer_height", b"0.1")])
+
+    assert cache.getSettings(("global", "machine"), cache.getRevision()) is None
+
+##  Tests that only the vertices that the last slice used are kept, and that
+#   they survive changing a setting.
+def test_setVertices(cache):
+    cache.setVertices({("mesh_a", b""): ("mesh_a", [0, 1, 2]), ("mesh_b", b""): ("mesh_b", [3, 4, 5])})
+    cache.invalidate()
+    assert cache.getVertices(("mesh_a", b"")) == ("mesh_a", [0, 1, 2])
+
+    cache.setVertices({("mesh_b", b""): ("mesh_b", [3, 4, 5])})
+    assert cache.getVertices(("mesh_a", b"")) is None
+    assert cache.getVertices(("mesh_b", b"")) == ("mesh_b", [3, 4, 5])
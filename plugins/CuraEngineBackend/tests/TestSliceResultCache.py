@@ -0,0 +1,108 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import pytest #To register tests with.
+
+from CuraEngineBackend.SliceResultCache import CachedLayer, CachedPathSegment, SliceResult, SliceResultCache, SliceResultDiskCache #The classes we're testing.
+
+##  Creates a slice result that takes about the given number of bytes.
+def createResult(size):
+    return SliceResult(["x" * size], [], {"infill": 10.0}, [100.0])
+
+##  Tests that a stored result is found again by its hash.
+def test_getStored():
+    cache = SliceResultCache(memory_budget = 1000)
+    result = createResult(100)
+    cache.put("abc", result)
+
+    assert cache.get("abc") is result
+    assert cache.get("def") is None
+    assert cache.getStatistics() == {"count": 1, "size": 100, "hits": 1, "disk_hits": 0, "misses": 1}
+
+##  Tests that looking whether a result is kept doesn't count as using it.
+def test_contains():
+    cache = SliceResultCache(memory_budget = 1000)
+    cache.put("abc", createResult(100))
+
+    assert cache.contains("abc")
+    assert not cache.contains("def")
+    assert cache.getStatistics()["hits"] == 0
+    assert cache.getStatistics()["misses"] == 0
+
+##  Tests that nothing is stored without a memory budget.
+def test_noBudget():
+    cache = SliceResultCache()
+    cache.put("abc", createResult(100))
+
+    assert cache.get("abc") is None
+
+##  Tests that the least recently used results are removed to stay within the
+#   memory budget.
+def test_evictLeastRecentlyUsed():
+    cache = SliceResultCache(memory_budget = 250)
+    cache.put("a", createResult(100))
+    cache.put("b", createResult(100))
+    cache.get("a")  # Now "b" is the least recently used.
+    cache.put("c", createResult(100))
+
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+    assert cache.get("c") is not None
+
+    cache.setMemoryBudget(100)
+    assert cache.get("a") is None
+    assert cache.get("c") is not None
+
+##  Tests that a stored layer can be read like a LayerOptimized message.
+def test_cachedLayer():
+    path_segment = CachedPathSegment(1, 0, b"\x00" * 16, b"\x01", b"\x00" * 4, b"\x00" * 4, b"\x00" * 4)
+    layer = CachedLayer(3, 600.0, 200.0, [path_segment])
+
+    assert layer.repeatedMessageCount("path_segment") == 1
+    assert layer.getRepeatedMessage("path_segment", 0).extruder == 1
+    assert layer.getSize() == 29
+
+##  Tests that results are found on disk, also by a new cache in the same
+#   directory, and that files of another version are not used.
+def test_diskCache(tmpdir):
+    result = SliceResult([";LAYER:0\n"], [CachedLayer(0, 200.0, 200.0, [CachedPathSegment(0, 0, b"\x00" * 16, b"\x01", b"\x00" * 4, b"\x00" * 4, b"\x00" * 4)])], {"infill": 10.0}, [100.0])
+    cache = SliceResultCache()
+    cache.setDiskCache(SliceResultDiskCache(str(tmpdir), 1024 * 1024, "1.0"))
+    cache.put("abc", result)
+
+    restarted_cache = SliceResultCache(memory_budget = 1000)
+    restarted_cache.setDiskCache(SliceResultDiskCache(str(tmpdir), 1024 * 1024, "1.0"))
+    assert restarted_cache.contains("abc")
+    loaded = restarted_cache.get("abc")
+    assert loaded.gcode_list == result.gcode_list
+    assert loaded.layers[0].getRepeatedMessage("path_segment", 0).points == b"\x00" * 16
+    assert restarted_cache.getStatistics()["disk_hits"] == 1
+
+    upgraded_cache = SliceResultCache()
+    upgraded_cache.setDiskCache(SliceResultDiskCache(str(tmpdir), 1024 * 1024, "2.0"))
+    assert upgraded_cache.get("abc") is None
+
+##  Tests that the least recently used files are removed to stay within the
+#   size budget.
+def test_diskCacheEvict(tmpdir):
+    disk_cache = SliceResultDiskCache(str(tmpdir), 1024 * 1024, "1.0")
+    disk_cache.put("a", createResult(400 * 1024))
+    disk_cache.put("b", createResult(400 * 1024))
+    disk_cache.get("a")  # Now "b" is the least recently used.
+    disk_cache.put("c", createResult(400 * 1024))
+
+    assert disk_cache.get("a") is not None
+    assert disk_cache.get("b") is None
+    assert disk_cache.get("c") is not None
+
+##  Tests that storing the same result again replaces its file, instead of
+#   counting its size twice.
+def test_diskCacheOverwrite(tmpdir):
+    disk_cache = SliceResultDiskCache(str(tmpdir), 1024 * 1024, "1.0")
+    for _ in range(3):
+        disk_cache.put("a", createResult(400 * 1024))
+    disk_cache.put("b", createResult(400 * 1024))
+
+    assert disk_cache.get("a") is not None
+    assert disk_cache.get("b") is not None
+    assert disk_cache._total_size == sum(disk_cache._files.values())
@@ -0,0 +1,137 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading #To wait for the background slices.
+import unittest.mock #To mock the result cache.
+
+from CuraEngineBackend.EngineProcess import EngineError, EngineResult
+from CuraEngineBackend.SpeculativeSlicer import SliceConfiguration, SliceScene, SpeculativeSlicer, combineSliceHash, fillSliceMessage #The classes we're testing.
+
+##  A slice message with only what fillSliceMessage uses.
+class FakeMessage:
+    def __init__(self):
+        self.messages = {}
+        self.repeated = {}
+
+    def getMessage(self, name):
+        return self.messages.setdefault(name, FakeMessage())
+
+    def addRepeatedMessage(self, name):
+        message = FakeMessage()
+        self.repeated.setdefault(name, []).append(message)
+        return message
+
+##  Stands in for an EngineProcess. Slicing waits until the test allows it.
+class FakeEngine:
+    def __init__(self):
+        self.sliced = []
+        self.closed = threading.Event()
+        self.slicing = threading.Event()
+        self.may_finish = threading.Event()
+
+    def createSliceMessage(self):
+        return FakeMessage()
+
+    def slice(self, slice_message, keep_layers = False):
+        self.sliced.append(slice_message)
+        self.slicing.set()
+        while not self.may_finish.wait(0.01):
+            if self.closed.is_set():
+                raise EngineError("The engine stopped")
+        return EngineResult([";FLAVOR:Fake\n"], {"infill": 10.0}, [100.0])
+
+    def close(self):
+        self.closed.set()
+
+def createConfiguration(digest, print_sequence = b"all_at_once"):
+    return SliceConfiguration([("layer_height", digest), ("print_sequence", print_sequence)], [("support_enable", 0)], [(0, [("material_guid", b"abc")])], digest)
+
+def createScene(object_settings = None):
+    return SliceScene([([], [(1, b"vertices", object_settings or [])])], b"all_at_once", b"scene")
+
+##  Creates a slicer with a mocked cache and engines that finish right away,
+#   unless the test says otherwise.
+def createSlicer(engines):
+    result_cache = unittest.mock.MagicMock()
+    result_cache.contains.return_value = False
+    stored = threading.Event()
+    result_cache.put.side_effect = lambda slice_hash, result: stored.set()
+    slicer = SpeculativeSlicer(result_cache, lambda: engines.pop(0))
+    return slicer, result_cache, stored
+
+##  Tests that the scene is sliced with an earlier configuration and stored
+#   with the hash that slicing that configuration would give.
+def test_sliceEarlierConfiguration():
+    engine = FakeEngine()
+    engine.may_finish.set()
+    slicer, result_cache, stored = createSlicer([engine])
+    earlier = createConfiguration(b"0.1")
+    current = createConfiguration(b"0.2")
+    slicer.addConfiguration(earlier)
+    slicer.addConfiguration(current)
+
+    slicer.start(createScene(), current)
+
+    assert stored.wait(5)
+    slice_hash, result = result_cache.put.call_args[0]
+    assert slice_hash == combineSliceHash(b"0.1", b"scene")
+    assert result.gcode_list == [";FLAVOR:Fake\n"]
+    assert len(engine.sliced) == 1
+    assert engine.closed.wait(5)
+
+##  Tests that cancelling stops the engine and doesn't store anything.
+def test_cancel():
+    engine = FakeEngine()
+    slicer, result_cache, _ = createSlicer([engine])
+    current = createConfiguration(b"0.2")
+    slicer.addConfiguration(createConfiguration(b"0.1"))
+    slicer.addConfiguration(current)
+    slicer.start(createScene(), current)
+    assert engine.slicing.wait(5)
+
+    slicer.cancel()
+
+    assert engine.closed.is_set()
+    engine.may_finish.set()
+    result_cache.put.assert_not_called()
+
+##  Tests that scenes with per-object settings, configurations that group the
+#   objects differently and results that are already kept are not sliced.
+def test_skip():
+    create_engine = unittest.mock.MagicMock()
+    result_cache = unittest.mock.MagicMock()
+    slicer = SpeculativeSlicer(result_cache, create_engine)
+    current = createConfiguration(b"0.2")
+    slicer.addConfiguration(createConfiguration(b"0.1", print_sequence = b"one_at_a_time"))
+    slicer.addConfiguration(current)
+    slicer.start(createScene(), current)
+
+    slicer.addConfiguration(createConfiguration(b"0.3"))
+    slicer.start(createScene([("infill_sparse_density", b"100")]), current)
+
+    create_engine.assert_not_called()
+
+##  Tests that only the most recent configurations are kept.
+def test_addConfigurationLimit():
+    slicer = SpeculativeSlicer(unittest.mock.MagicMock(), unittest.mock.MagicMock())
+    for index in range(SpeculativeSlicer._max_configurations + 1):
+        slicer.addConfiguration(createConfiguration(str(index).encode("utf-8")))
+    slicer.addConfiguration(createConfiguration(b"1")) #Used again, so it's the most recent.
+
+    assert list(slicer._configurations) == [str(index).encode("utf-8") for index in range(2, SpeculativeSlicer._max_configurations + 1)] + [b"1"]
+
+##  Tests that a message is filled in like StartSliceJob does.
+def test_fillSliceMessage():
+    message = FakeMessage()
+
+    fillSliceMessage(message, createConfiguration(b"0.1"), createScene([("extruder_nr", b"0")]))
+
+    global_settings = message.messages["global_settings"].repeated["settings"]
+    assert [(setting.name, setting.value) for setting in global_settings] == [("layer_height", b"0.1"), ("print_sequence", b"all_at_once")]
+    assert [(limit.name, limit.extruder) for limit in message.repeated["limit_to_extruder"]] == [("support_enable", 0)]
+    extruder = message.repeated["extruders"][0]
+    assert extruder.id == 0
+    assert extruder.messages["settings"].repeated["settings"][0].value == b"abc"
+    obj = message.repeated["object_lists"][0].repeated["objects"][0]
+    assert (obj.id, obj.vertices) == (1, b"vertices")
+    assert obj.repeated["settings"][0].name == "extruder_nr"
@@ -0,0 +1,56 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import hashlib #To start the hash of a job.
+
+from CuraEngineBackend.StartSliceJob import StartSliceJob #The class we're testing.
+
+##  Creates a job with only the hash of its message, without a scene.
+def createJob():
+    job = StartSliceJob.__new__(StartSliceJob)
+    job._settings_hash = hashlib.sha1()
+    job._scene_hash = hashlib.sha1()
+    job._current_hash = job._settings_hash
+    return job
+
+##  Tests that the tokens for the current time don't change the hash, so that
+#   slicing the same scene later gives the same hash.
+def test_addSettingToHashTimeTokens():
+    job = createJob()
+    job._addSettingToHash("layer_height", b"0.1")
+    later_job = createJob()
+    later_job._addSettingToHash("layer_height", b"0.1")
+
+    job._addSettingToHash("time", b"10:00:00")
+    job._addSettingToHash("date", b"01-01-2017")
+    job._addSettingToHash("day", b"Sun")
+    later_job._addSettingToHash("time", b"11:30:00")
+    later_job._addSettingToHash("date", b"02-01-2017")
+    later_job._addSettingToHash("day", b"Mon")
+
+    assert job.getSliceHash() == later_job.getSliceHash()
+
+##  Tests that other settings do change the hash.
+def test_addSettingToHash():
+    job = createJob()
+    job._addSettingToHash("layer_height", b"0.1")
+    other_job = createJob()
+    other_job._addSettingToHash("layer_height", b"0.2")
+
+    assert job.getSliceHash() != other_job.getSliceHash()
+
+##  Tests that the same objects with the same settings give the same hash,
+#   whichever job hashed them, so that a scene can be sliced again with other
+#   settings.
+def test_sceneHash():
+    job = createJob()
+    job._addSettingToHash("layer_height", b"0.1")
+    job._current_hash = job._scene_hash
+    job._addToHash("object", b"vertices")
+    other_job = createJob()
+    other_job._addSettingToHash("layer_height", b"0.2")
+    other_job._current_hash = other_job._scene_hash
+    other_job._addToHash("object", b"vertices")
+
+    assert job._scene_hash.digest() == other_job._scene_hash.digest()
+    assert job.getSliceHash() != other_job.getSliceHash()
@@ -3,7 +3,7 @@
 
 import numpy
 
-from PyQt5.QtGui import QImage, qRed, qGreen, qBlue
+from PyQt5.QtGui import QImage
 from PyQt5.QtCore import Qt
 
 from UM.Mesh.MeshReader import MeshReader
@@ -12,6 +12,7 @@ from UM.Scene.SceneNode import SceneNode
 from UM.Math.Vector import Vector
 from UM.Job import Job
 from UM.Logger import Logger
+from UM.Preferences import Preferences
 from .ImageReaderUI import ImageReaderUI
 
 
@@ -21,6 +22,9 @@ class ImageReader(MeshReader):
         self._supported_extensions = [".jpg", ".jpeg", ".bmp", ".gif", ".png"]
         self._ui = ImageReaderUI(self)
 
+        # Leave out the vertices inside flat areas of the height map, to get fewer faces for images with large flat areas.
+        Preferences.getInstance().addPreference("image_reader/decimate_flat_regions", False)
+
     def preRead(self, file_name, *args, **kwargs):
         img = QImage(file_name)
 
@@ -45,9 +49,10 @@ class ImageReader(MeshReader):
 
     def read(self, file_name):
         size = max(self._ui.getWidth(), self._ui.getDepth())
-        return self._generateSceneNode(file_name, size, self._ui.peak_height, self._ui.base_height, self._ui.smoothing, 512, self._ui.image_color_invert)
+        decimate = Preferences.getInstance().getValue("image_reader/decimate_flat_regions")
+        return self._generateSceneNode(file_name, size, self._ui.peak_height, self._ui.base_height, self._ui.smoothing, 512, self._ui.image_color_invert, decimate)
 
-    def _generateSceneNode(self, file_name, xz_size, peak_height, base_height, blur_iterations, max_size, image_color_invert):
+    def _generateSceneNode(self, file_name, xz_size, peak_height, base_height, blur_iterations, max_size, image_color_invert, decimate = False):
         scene_node = SceneNode()
 
         mesh = MeshBuilder()
@@ -93,121 +98,167 @@ class ImageReader(MeshReader):
         texel_width = 1.0 / (width_minus_one) * scale_vector.x
         texel_height = 1.0 / (height_minus_one) * scale_vector.z
 
-        height_data = numpy.zeros((height, width), dtype=numpy.float32)
-
-        for x in range(0, width):
-            for y in range(0, height):
-                qrgb = img.pixel(x, y)
-                avg = float(qRed(qrgb) + qGreen(qrgb) + qBlue(qrgb)) / (3 * 255)
-                height_data[y, x] = avg
+        height_data = self._getBrightness(img)
 
         Job.yieldThread()
 
         if image_color_invert:
             height_data = 1 - height_data
 
-        for _ in range(0, blur_iterations):
-            copy = numpy.pad(height_data, ((1, 1), (1, 1)), mode= "edge")
-
-            height_data += copy[1:-1, 2:]
-            height_data += copy[1:-1, :-2]
-            height_data += copy[2:, 1:-1]
-            height_data += copy[:-2, 1:-1]
-
-            height_data += copy[2:, 2:]
-            height_data += copy[:-2, 2:]
-            height_data += copy[2:, :-2]
-            height_data += copy[:-2, :-2]
-
-            height_data /= 9
-
-            Job.yieldThread()
+        height_data = self._blur(height_data, blur_iterations)
 
         height_data *= scale_vector.y
         height_data += base_height
 
-        heightmap_face_count = 2 * height_minus_one * width_minus_one
-        total_face_count = heightmap_face_count + (width_minus_one * 2) * (height_minus_one * 2) + 2
-
-        mesh.reserveFaceCount(total_face_count)
-
-        # initialize to texel space vertex offsets.
-        # 6 is for 6 vertices for each texel quad.
-        heightmap_vertices = numpy.zeros((width_minus_one * height_minus_one, 6, 3), dtype = numpy.float32)
-        heightmap_vertices = heightmap_vertices + numpy.array([[
-            [0, base_height, 0],
-            [0, base_height, texel_height],
-            [texel_width, base_height, texel_height],
-            [texel_width, base_height, texel_height],
-            [texel_width, base_height, 0],
-            [0, base_height, 0]
-        ]], dtype = numpy.float32)
-
-        offsetsz, offsetsx = numpy.mgrid[0: height_minus_one, 0: width - 1]
-        offsetsx = numpy.array(offsetsx, numpy.float32).reshape(-1, 1) * texel_width
-        offsetsz = numpy.array(offsetsz, numpy.float32).reshape(-1, 1) * texel_height
-
-        # offsets for each texel quad
-        heightmap_vertex_offsets = numpy.concatenate([offsetsx, numpy.zeros((offsetsx.shape[0], offsetsx.shape[1]), dtype=numpy.float32), offsetsz], 1)
-        heightmap_vertices += heightmap_vertex_offsets.repeat(6, 0).reshape(-1, 6, 3)
-
-        # apply height data to y values
-        heightmap_vertices[:, 0, 1] = heightmap_vertices[:, 5, 1] = height_data[:-1, :-1].reshape(-1)
-        heightmap_vertices[:, 1, 1] = height_data[1:, :-1].reshape(-1)
-        heightmap_vertices[:, 2, 1] = heightmap_vertices[:, 3, 1] = height_data[1:, 1:].reshape(-1)
-        heightmap_vertices[:, 4, 1] = height_data[:-1, 1:].reshape(-1)
-
-        heightmap_indices = numpy.array(numpy.mgrid[0:heightmap_face_count * 3], dtype=numpy.int32).reshape(-1, 3)
-
-        mesh._vertices[0:(heightmap_vertices.size // 3), :] = heightmap_vertices.reshape(-1, 3)
-        mesh._indices[0:(heightmap_indices.size // 3), :] = heightmap_indices
-
-        mesh._vertex_count = heightmap_vertices.size // 3
-        mesh._face_count = heightmap_indices.size // 3
-
         geo_width = width_minus_one * texel_width
         geo_height = height_minus_one * texel_height
 
-        # bottom
-        mesh.addFaceByPoints(0, 0, 0, 0, 0, geo_height, geo_width, 0, geo_height)
-        mesh.addFaceByPoints(geo_width, 0, geo_height, geo_width, 0, 0, 0, 0, 0)
-
-        # north and south walls
-        for n in range(0, width_minus_one):
-            x = n * texel_width
-            nx = (n + 1) * texel_width
-
-            hn0 = height_data[0, n]
-            hn1 = height_data[0, n + 1]
-
-            hs0 = height_data[height_minus_one, n]
-            hs1 = height_data[height_minus_one, n + 1]
-
-            mesh.addFaceByPoints(x, 0, 0, nx, 0, 0, nx, hn1, 0)
-            mesh.addFaceByPoints(nx, hn1, 0, x, hn0, 0, x, 0, 0)
-
-            mesh.addFaceByPoints(x, 0, geo_height, nx, 0, geo_height, nx, hs1, geo_height)
-            mesh.addFaceByPoints(nx, hs1, geo_height, x, hs0, geo_height, x, 0, geo_height)
-
-        # west and east walls
-        for n in range(0, height_minus_one):
-            y = n * texel_height
-            ny = (n + 1) * texel_height
-
-            hw0 = height_data[n, 0]
-            hw1 = height_data[n + 1, 0]
-
-            he0 = height_data[n, width_minus_one]
-            he1 = height_data[n + 1, width_minus_one]
-
-            mesh.addFaceByPoints(0, 0, y, 0, 0, ny, 0, hw1, ny)
-            mesh.addFaceByPoints(0, hw1, ny, 0, hw0, y, 0, 0, y)
-
-            mesh.addFaceByPoints(geo_width, 0, y, geo_width, 0, ny, geo_width, he1, ny)
-            mesh.addFaceByPoints(geo_width, he1, ny, geo_width, he0, y, geo_width, 0, y)
+        faces = [
+            self._createHeightMapFaces(height_data, texel_width, texel_height, decimate),
+            # bottom
+            numpy.array([
+                [[0, 0, 0], [0, 0, geo_height], [geo_width, 0, geo_height]],
+                [[geo_width, 0, geo_height], [geo_width, 0, 0], [0, 0, 0]]
+            ], dtype = numpy.float32),
+            # north and south walls
+            self._createWallFaces(height_data[0, :], texel_width, [0, 1, 2], 0),
+            self._createWallFaces(height_data[height_minus_one, :], texel_width, [0, 1, 2], geo_height),
+            # west and east walls
+            self._createWallFaces(height_data[:, 0], texel_height, [2, 1, 0], 0),
+            self._createWallFaces(height_data[:, width_minus_one], texel_height, [2, 1, 0], geo_width)
+        ]
+        vertices = numpy.concatenate(faces).reshape(-1, 3)
+
+        mesh.reserveFaceCount(vertices.shape[0] // 3)
+        mesh._vertices[0:vertices.shape[0], :] = vertices
+        mesh._indices[0:vertices.shape[0] // 3, :] = numpy.arange(vertices.shape[0], dtype = numpy.int32).reshape(-1, 3)
+        mesh._vertex_count = vertices.shape[0]
+        mesh._face_count = vertices.shape[0] // 3
 
         mesh.calculateNormals(fast=True)
 
         scene_node.setMeshData(mesh.build())
 
         return scene_node
+
+    ##  Get the brightness of each pixel of an image.
+    #
+    #   \return An array with one row per line of the image, with values from
+    #   0 (black) to 1 (white).
+    def _getBrightness(self, img):
+        img = img.convertToFormat(QImage.Format_ARGB32)
+        bits = img.constBits()
+        bits.setsize(img.byteCount())
+        # Each line is stored as 32-bit ARGB values, but lines may be padded at the end.
+        pixels = numpy.frombuffer(bits, dtype = numpy.uint32).reshape(img.height(), img.bytesPerLine() // 4)[:, :img.width()]
+
+        total = (pixels >> 16) & 0xFF  # Red.
+        total += (pixels >> 8) & 0xFF  # Green.
+        total += pixels & 0xFF  # Blue.
+        return (total / (3 * 255)).astype(numpy.float32)
+
+    ##  Smooth a height map by repeatedly averaging each value with its eight
+    #   neighbours.
+    #
+    #   The average of the 3x3 neighbourhood is computed as an average over the
+    #   rows followed by an average over the columns. Values outside the height
+    #   map are taken from the nearest edge.
+    def _blur(self, height_data, iterations):
+        if iterations <= 0:
+            return height_data
+
+        rows, columns = height_data.shape
+        padded = numpy.empty((rows + 2, columns + 2), dtype = height_data.dtype)
+        row_sums = numpy.empty((rows + 2, columns), dtype = height_data.dtype)
+        for _ in range(0, iterations):
+            padded[1:-1, 1:-1] = height_data
+            padded[0, 1:-1] = height_data[0]
+            padded[-1, 1:-1] = height_data[-1]
+            padded[:, 0] = padded[:, 1]
+            padded[:, -1] = padded[:, -2]
+
+            numpy.add(padded[:, :-2], padded[:, 1:-1], out = row_sums)
+            row_sums += padded[:, 2:]
+            numpy.add(row_sums[:-2], row_sums[1:-1], out = height_data)
+            height_data += row_sums[2:]
+            height_data /= 9
+
+            Job.yieldThread()
+        return height_data
+
+    ##  Find the vertices of the height map that the surface needs.
+    #
+    #   A vertex can be left out if the four quads around it are flat, that is
+    #   if all their corners have the same height. The vertices on the edges of
+    #   the height map are always needed, because the walls use them.
+    #
+    #   \return A boolean array with the shape of the height map.
+    def _findNeededVertices(self, height_data):
+        flat = (height_data[:-1, :-1] == height_data[:-1, 1:]) & (height_data[:-1, :-1] == height_data[1:, :-1]) & (height_data[:-1, :-1] == height_data[1:, 1:])
+        needed = numpy.ones(height_data.shape, dtype = numpy.bool_)
+        needed[1:-1, 1:-1] = ~(flat[:-1, :-1] & flat[:-1, 1:] & flat[1:, :-1] & flat[1:, 1:])
+        return needed
+
+    ##  Create the triangles of the surface of the height map.
+    #
+    #   Each row of quads is a strip between two lines of vertices. The strip
+    #   is triangulated from left to right, where each triangle has two
+    #   neighbouring vertices of one line and one vertex of the other line. If
+    #   all vertices are used, this cuts every quad into two triangles.
+    #
+    #   With decimation, the vertices inside flat areas are left out and the
+    #   triangles span the flat area instead. Both strips next to a line use the
+    #   same vertices of that line, so that no vertex ends up in the middle of
+    #   the edge of another triangle.
+    #
+    #   \param decimate Whether to leave out the vertices inside flat areas.
+    #   \return An array with the three vertices of each triangle.
+    def _createHeightMapFaces(self, height_data, texel_width, texel_height, decimate):
+        columns = height_data.shape[1]
+        if decimate:
+            needed = self._findNeededVertices(height_data)
+        else:
+            needed = numpy.ones(height_data.shape, dtype = numpy.bool_)
+        # For each vertex, the column of the nearest needed vertex on the same line at or to the left of it.
+        last_needed = numpy.maximum.accumulate(numpy.where(needed, numpy.arange(columns), -1), axis = 1)
+
+        # A triangle for each edge between two needed vertices on the upper line of a strip, ending at a needed vertex...
+        upper_rows, upper_ends = numpy.nonzero(needed[:-1, 1:])
+        upper_ends += 1
+        # ... and for each edge on the lower line.
+        lower_rows, lower_ends = numpy.nonzero(needed[1:, 1:])
+        lower_ends += 1
+
+        corner_lines = numpy.concatenate([
+            numpy.stack([upper_rows, upper_rows, upper_rows + 1], axis = 1),
+            numpy.stack([lower_rows, lower_rows + 1, lower_rows + 1], axis = 1)
+        ])
+        corner_columns = numpy.concatenate([
+            numpy.stack([upper_ends, last_needed[upper_rows, upper_ends - 1], last_needed[upper_rows + 1, upper_ends]], axis = 1),
+            numpy.stack([last_needed[lower_rows, lower_ends - 1], last_needed[lower_rows + 1, lower_ends - 1], lower_ends], axis = 1)
+        ])
+        return numpy.stack([corner_columns * texel_width, height_data[corner_lines, corner_columns], corner_lines * texel_height], axis = 2).astype(numpy.float32)
+
+    ##  Create the triangles of one side wall, from the bottom up to the edge
+    #   of the height map.
+    #
+    #   \param heights The heights along the edge of the height map.
+    #   \param texel_size The distance between two heights along the edge.
+    #   \param axes The axes (0 for X, 1 for Y, 2 for Z) of the coordinate along
+    #   the wall, the height and the distance of the wall to the origin.
+    #   \param offset The distance of the wall to the origin.
+    #   \return An array with the three vertices of each triangle.
+    def _createWallFaces(self, heights, texel_size, axes, offset):
+        count = heights.shape[0] - 1
+        position0 = numpy.arange(count) * texel_size
+        position1 = numpy.arange(1, count + 1) * texel_size
+        zeros = numpy.zeros(count)
+        offsets = numpy.full(count, offset)
+
+        # The coordinates of each corner as (along the wall, height, distance to the wall).
+        bottom0 = numpy.stack([position0, zeros, offsets], axis = 1)
+        bottom1 = numpy.stack([position1, zeros, offsets], axis = 1)
+        top0 = numpy.stack([position0, heights[:-1], offsets], axis = 1)
+        top1 = numpy.stack([position1, heights[1:], offsets], axis = 1)
+        faces = numpy.stack([bottom0, bottom1, top1, top1, top0, bottom0], axis = 1).reshape(-1, 3, 3)
+        return faces[:, :, numpy.argsort(axes)].astype(numpy.float32)
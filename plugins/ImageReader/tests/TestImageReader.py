@@ -0,0 +1,162 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import collections #To count the edges of the triangles.
+import unittest.mock #To mock the preferences.
+
+import numpy #To check the resulting faces.
+import pytest #To register tests with.
+
+from PyQt5.QtGui import QImage, qRgb, qRed, qGreen, qBlue #To create the images to read.
+
+from ImageReader.ImageReader import ImageReader #The class we're testing.
+
+##  Gives an image reader, without its preference being registered.
+@pytest.fixture()
+def image_reader():
+    with unittest.mock.patch("UM.Preferences.Preferences.getInstance"):
+        return ImageReader()
+
+##  Creates a small image file with a flat background and a few uneven pixels.
+def createImageFile(tmpdir):
+    image = QImage(12, 9, QImage.Format_RGB32)
+    image.fill(qRgb(40, 40, 40))
+    for x, y, gray in [(3, 2, 200), (4, 2, 180), (4, 3, 90), (8, 6, 255), (10, 0, 10), (0, 5, 120)]:
+        image.setPixel(x, y, qRgb(gray, gray // 2, 255 - gray))
+    file_name = str(tmpdir.join("image.png"))
+    image.save(file_name)
+    return file_name
+
+##  Creates the faces of an image the way the reader did before it was
+#   vectorised, pixel by pixel. Only images that don't need to be scaled down
+#   are supported.
+def createReferenceFaces(file_name, xz_size, peak_height, base_height, blur_iterations, image_color_invert):
+    image = QImage(file_name)
+    width = image.width()
+    height = image.height()
+    aspect = height / width
+    scale_x, scale_y, scale_z = xz_size, peak_height, xz_size
+    if width > height:
+        scale_z *= aspect
+    elif height > width:
+        scale_x /= aspect
+    texel_width = 1.0 / (width - 1) * scale_x
+    texel_height = 1.0 / (height - 1) * scale_z
+
+    height_data = numpy.zeros((height, width), dtype = numpy.float32)
+    for x in range(0, width):
+        for y in range(0, height):
+            qrgb = image.pixel(x, y)
+            height_data[y, x] = float(qRed(qrgb) + qGreen(qrgb) + qBlue(qrgb)) / (3 * 255)
+    if image_color_invert:
+        height_data = 1 - height_data
+    for _ in range(0, blur_iterations):
+        copy = numpy.pad(height_data, ((1, 1), (1, 1)), mode = "edge")
+        for row_offset in (0, 1, 2):
+            for column_offset in (0, 1, 2):
+                if (row_offset, column_offset) != (1, 1):
+                    height_data += copy[row_offset:row_offset + height, column_offset:column_offset + width]
+        height_data /= 9
+    height_data *= scale_y
+    height_data += base_height
+
+    faces = []
+    for z in range(0, height - 1):
+        for x in range(0, width - 1):
+            corner_00 = (x * texel_width, height_data[z, x], z * texel_height)
+            corner_10 = (x * texel_width, height_data[z + 1, x], (z + 1) * texel_height)
+            corner_11 = ((x + 1) * texel_width, height_data[z + 1, x + 1], (z + 1) * texel_height)
+            corner_01 = ((x + 1) * texel_width, height_data[z, x + 1], z * texel_height)
+            faces += [(corner_00, corner_10, corner_11), (corner_11, corner_01, corner_00)]
+
+    geo_width = (width - 1) * texel_width
+    geo_height = (height - 1) * texel_height
+    faces += [((0, 0, 0), (0, 0, geo_height), (geo_width, 0, geo_height)), ((geo_width, 0, geo_height), (geo_width, 0, 0), (0, 0, 0))]
+    for n in range(0, width - 1):
+        x = n * texel_width
+        nx = (n + 1) * texel_width
+        for z, row in ((0, 0), (geo_height, height - 1)):
+            faces += [((x, 0, z), (nx, 0, z), (nx, height_data[row, n + 1], z)), ((nx, height_data[row, n + 1], z), (x, height_data[row, n], z), (x, 0, z))]
+    for n in range(0, height - 1):
+        z = n * texel_height
+        nz = (n + 1) * texel_height
+        for x, column in ((0, 0), (geo_width, width - 1)):
+            faces += [((x, 0, z), (x, 0, nz), (x, height_data[n + 1, column], nz)), ((x, height_data[n + 1, column], nz), (x, height_data[n, column], z), (x, 0, z))]
+    return faces
+
+##  Puts faces in a fixed order, with the smallest vertex of each face first
+#   without changing the direction of the face, so that they can be compared.
+def sortFaces(faces):
+    result = []
+    for face in numpy.round(numpy.array(faces, dtype = numpy.float64), 3).tolist():
+        vertices = [tuple(vertex) for vertex in face]
+        first = vertices.index(min(vertices))
+        result.append(tuple(vertices[first:] + vertices[:first]))
+    return sorted(result)
+
+##  Tests that the vectorised reader creates the same faces as reading the
+#   pixels one by one did.
+@pytest.mark.parametrize("blur_iterations", [0, 2])
+@pytest.mark.parametrize("image_color_invert", [False, True])
+def test_generateSceneNodeMatchesLoops(image_reader, tmpdir, blur_iterations, image_color_invert):
+    file_name = createImageFile(tmpdir)
+
+    scene_node = image_reader._generateSceneNode(file_name, 120, 10, 1, blur_iterations, 512, image_color_invert)
+
+    mesh_data = scene_node.getMeshData()
+    faces = mesh_data.getVertices()[mesh_data.getIndices()]
+    assert sortFaces(faces) == sortFaces(createReferenceFaces(file_name, 120, 10, 1, blur_iterations, image_color_invert))
+
+##  Gives a height map of mostly flat plateaus of different heights, with a few
+#   uneven spots.
+def createHeightMap():
+    height_data = numpy.zeros((20, 30), dtype = numpy.float32)
+    height_data[3:12, 4:20] = 2
+    height_data[8:18, 15:27] = 5
+    height_data[5, 7] = 3
+    height_data[14, 2] = 1
+    height_data[0, 10:15] = 4
+    return height_data
+
+##  Tests that decimation leaves out vertices in flat areas, while the surface
+#   keeps its shape and the triangles still connect without holes or
+#   T-junctions.
+def test_createHeightMapFacesDecimate(image_reader):
+    height_data = createHeightMap()
+    rows, columns = height_data.shape
+    full_faces = image_reader._createHeightMapFaces(height_data, 1, 1, decimate = False)
+
+    faces = image_reader._createHeightMapFaces(height_data, 1, 1, decimate = True)
+
+    assert len(faces) < len(full_faces) / 2
+
+    #The faces cover the height map exactly once, all facing the same way.
+    areas = numpy.cross(faces[:, 1] - faces[:, 0], faces[:, 2] - faces[:, 0])[:, 1]
+    assert numpy.all(areas > 0)
+    assert areas.sum() / 2 == pytest.approx((rows - 1) * (columns - 1))
+
+    #Each face is flat, or is one of the faces without decimation.
+    full_face_set = set(sortFaces(full_faces))
+    for face in faces:
+        assert numpy.all(face[:, 1] == face[0, 1]) or sortFaces([face])[0] in full_face_set
+
+    #Each edge inside the height map is shared by two faces in opposite directions. Each edge on the border is one pixel
+    #long and belongs to a single face, so that it connects to the walls.
+    edges = collections.Counter()
+    for face in faces.tolist():
+        for start, end in ((face[0], face[1]), (face[1], face[2]), (face[2], face[0])):
+            edges[(start[0], start[2], end[0], end[2])] += 1
+    for (start_x, start_z, end_x, end_z), count in edges.items():
+        assert count == 1
+        on_border = (start_x == end_x and start_x in (0, columns - 1)) or (start_z == end_z and start_z in (0, rows - 1))
+        if on_border:
+            assert abs(end_x - start_x) + abs(end_z - start_z) == 1
+            assert (end_x, end_z, start_x, start_z) not in edges
+        else:
+            assert edges[(end_x, end_z, start_x, start_z)] == 1
+
+##  Without flat areas, decimation doesn't change anything.
+def test_createHeightMapFacesDecimateUneven(image_reader):
+    height_data = numpy.arange(5 * 7, dtype = numpy.float32).reshape(5, 7) ** 1.5
+
+    assert sortFaces(image_reader._createHeightMapFaces(height_data, 2, 3, decimate = True)) == sortFaces(image_reader._createHeightMapFaces(height_data, 2, 3, decimate = False))
@@ -40,6 +40,7 @@ class PerObjectSettingVisibilityHandler(UM.Settings.Models.SettingVisibilityHand
         if not self._node:
             return
 
+        self._stack = self._node.callDecoration("getStack") #The node may have a different stack since it was selected, for instance when its extruder changed.
         if not self._stack:
             self._node.addDecorator(SettingOverrideDecorator())
             self._stack = self._node.callDecoration("getStack")
@@ -69,7 +69,8 @@ class PerObjectSettingsTool(Tool):
         stack = selected_object.callDecoration("getStack") #Don't try to get the active extruder since it may be None anyway.
         if not stack:
             selected_object.addDecorator(SettingOverrideDecorator())
-        selected_object.callDecoration("setActiveExtruder", extruder_stack_id)
+        selected_object.callDecoration("setActiveExtruder", extruder_stack_id) #Gives the object a stack of its own if it shared one with its copies.
+        self.propertyChanged.emit() #The ID of the stack may have changed.
 
     def setMeshType(self, mesh_type):
         selected_object = Selection.getSelectedObject(0)
@@ -547,12 +547,11 @@ class X3DReader(MeshReader):
         
 
     def processGeometryIndexedTriangleSet(self, node):
-        index = readIntArray(node, "index", [])
+        index = readIndexArray(node, "index")
         num_faces = len(index) // 3
-        ccw = int(self.startCoordMesh(node, num_faces))
-        
-        for i in range(0, num_faces*3, 3):
-            self.addTri(index[i + 1 - ccw], index[i + ccw], index[i+2])
+        ccw = self.startCoordMesh(node, num_faces)
+
+        self.addTrisFlip(index[:num_faces * 3].reshape(-1, 3), ccw)
     
     def processGeometryIndexedTriangleStripSet(self, node):
         strips = readIndex(node, "index")
@@ -573,9 +572,8 @@ class X3DReader(MeshReader):
                 self.addTri(fan[0], fan[i + 1 - ccw], fan[i + ccw])
    
     def processGeometryTriangleSet(self, node):
-        ccw = int(self.startCoordMesh(node, lambda num_vert: num_vert // 3))
-        for i in range(0, self.getVertexCount(), 3):
-            self.addTri(i + 1 - ccw, i + ccw, i+2)
+        ccw = self.startCoordMesh(node, lambda num_vert: num_vert // 3)
+        self.addTrisFlip(numpy.arange(self.num_faces_reserved * 3).reshape(-1, 3), ccw)
     
     def processGeometryTriangleStripSet(self, node):
         strips = readIntArray(node, "stripCount", [])
@@ -603,16 +601,14 @@ class X3DReader(MeshReader):
     
     def processGeometryQuadSet(self, node):
         ccw = self.startCoordMesh(node, lambda num_vert: 2*(num_vert // 4))
-        for i in range(0, self.getVertexCount(), 4):
-            self.addQuadFlip(i, i+1, i+2, i+3, ccw)
+        self.addQuadsFlip(numpy.arange(self.num_faces_reserved * 2).reshape(-1, 4), ccw)
             
     def processGeometryIndexedQuadSet(self, node):
-        index = readIntArray(node, "index", [])
+        index = readIndexArray(node, "index")
         num_quads = len(index) // 4
         ccw = self.startCoordMesh(node, num_quads*2)
-        
-        for i in range(0, num_quads*4, 4):
-            self.addQuadFlip(index[i], index[i+1], index[i+2], index[i+3], ccw)
+
+        self.addQuadsFlip(index[:num_quads * 4].reshape(-1, 4), ccw)
             
     # 2D polygon geometries
     # Won't work for now, since Cura expects every mesh to have a nontrivial convex hull
@@ -658,22 +654,31 @@ class X3DReader(MeshReader):
             self.addVertex(*vert)
         
         # The front face is on the +Z side, so CCW is a variable
-        for i in range(0, num_faces*3, 3):
-            a = Vector(*verts[i+2]) - Vector(*verts[i])
-            b = Vector(*verts[i+1]) - Vector(*verts[i])
-            self.addTriFlip(i, i+1, i+2, a.x*b.y > a.y*b.x)
+        corners = self.verts[:2, :num_faces * 3].T.reshape(-1, 3, 2)
+        a = corners[:, 2] - corners[:, 0]
+        b = corners[:, 1] - corners[:, 0]
+        ccw = a[:, 0] * b[:, 1] > a[:, 1] * b[:, 0]
+        tris = numpy.arange(num_faces * 3).reshape(-1, 3)
+        self.addTris(numpy.where(ccw[:, numpy.newaxis], tris, tris[:, [1, 0, 2]]))
     
     # General purpose polygon mesh
 
     def processGeometryIndexedFaceSet(self, node):
-        faces = readIndex(node, "coordIndex")
-        ccw = self.startCoordMesh(node, sum([len(face) - 2 for face in faces]))
-            
-        for face in faces:
-            if len(face) == 3:
-                self.addTriFlip(face[0], face[1], face[2], ccw)
-            elif len(face) > 3:
-                self.addFace(face, ccw)
+        index = readIndexArray(node, "coordIndex")
+        # Find the -1-separated runs. Append a separator, so that the last face also ends with one.
+        separators = numpy.flatnonzero(numpy.append(index, -1) == -1)
+        starts = numpy.concatenate([[0], separators[:-1] + 1])
+        lengths = separators - starts
+        ccw = self.startCoordMesh(node, int(numpy.maximum(lengths - 2, 0).sum()))
+
+        # Triangles and quads are by far the most common, so add all of those at once.
+        tri_starts = starts[lengths == 3]
+        self.addTrisFlip(index[tri_starts[:, numpy.newaxis] + numpy.arange(3)], ccw)
+        quad_starts = starts[lengths == 4]
+        self.addQuadsSplit(index[quad_starts[:, numpy.newaxis] + numpy.arange(4)], ccw)
+
+        for start, length in zip(starts[lengths > 4], lengths[lengths > 4]):
+            self.addFace(index[start:start + length].tolist(), ccw)
                 
     geometry_importers = {
         "IndexedFaceSet": processGeometryIndexedFaceSet,
@@ -708,13 +713,12 @@ class X3DReader(MeshReader):
                         # be separated by commas or whitespace as per spec of 
                         # XML encoding of X3D 
                         # Ref  ISO/IEC 19776-1:2015 : Section 5.1.2
-                        co = [float(x) for vec in pt.split(',') for x in vec.split()]
+                        co = numpy.array(pt.replace(",", " ").split(), dtype=numpy.float32)
                         num_verts = len(co) // 3
                         self.verts = numpy.empty((4, num_verts), dtype=numpy.float32)
                         self.verts[3,:] = numpy.ones((num_verts), dtype=numpy.float32)
                         # Group by three
-                        for i in range(num_verts):
-                            self.verts[:3,i] = co[3*i:3*i+3]
+                        self.verts[:3, :] = co[:num_verts * 3].reshape(-1, 3).T
     
     # Mesh builder helpers
     
@@ -728,6 +732,7 @@ class X3DReader(MeshReader):
     def reserveFaceCount(self, num_faces):
         self.faces = numpy.zeros((num_faces, 3), dtype=numpy.int32)
         self.num_faces = 0
+        self.num_faces_reserved = num_faces
         
     def getVertexCount(self):
         return self.verts.shape[1]
@@ -751,6 +756,41 @@ class X3DReader(MeshReader):
         else:
             self.addTri(b, a, c)
         
+    # Adds many triangles at once, given as an n by 3 array of indices
+    def addTris(self, tris):
+        n = len(tris)
+        self.faces[self.num_faces:self.num_faces + n] = self.index_base + tris
+        self.num_faces += n
+
+    def addTrisFlip(self, tris, ccw):
+        if ccw:
+            self.addTris(tris)
+        else:
+            self.addTris(tris[:, [1, 0, 2]])
+
+    # Adds many quads at once, given as an n by 4 array of indices, like addQuadFlip
+    def addQuadsFlip(self, quads, ccw):
+        tris = numpy.empty((len(quads) * 2, 3), dtype=numpy.int32)
+        if ccw:
+            tris[0::2] = quads[:, [0, 1, 2]]
+            tris[1::2] = quads[:, [2, 3, 0]]
+        else:
+            tris[0::2] = quads[:, [0, 2, 1]]
+            tris[1::2] = quads[:, [2, 0, 3]]
+        self.addTris(tris)
+
+    # Adds many quads at once, given as an n by 4 array of indices.
+    # Unlike addQuadsFlip, the quads don't need to be convex: each quad is cut
+    # along the diagonal that lies inside of it.
+    def addQuadsSplit(self, quads, ccw):
+        corners = [self.verts[0:3, quads[:, i]].T for i in range(4)]
+        # Cutting along the ac diagonal gives triangles abc and cda. If the
+        # quad is concave at b or d, those face opposite ways; cut along bd.
+        abc_normal = numpy.cross(corners[1] - corners[0], corners[2] - corners[0])
+        cda_normal = numpy.cross(corners[3] - corners[2], corners[0] - corners[2])
+        cut_bd = numpy.einsum("ij,ij->i", abc_normal, cda_normal) < 0
+        self.addQuadsFlip(numpy.where(cut_bd[:, numpy.newaxis], quads[:, [1, 2, 3, 0]], quads), ccw)
+
     # Needs to be convex, but not necessaily planar
     # Assumed ccw, cut along the ac diagonal
     def addQuad(self, a, b, c, d):
@@ -859,6 +899,16 @@ def readRotation(node, attr, default):
     v = readFloatArray(node, attr, default)
     return (v[3], Vector(v[0], v[1], v[2]))
 
+# Reads an integer array into a numpy array
+def readIndexArray(node, attr):
+    s = node.attrib.get(attr)
+    if not s:
+        return numpy.zeros((0, ), dtype=numpy.int32)
+    try:
+        return numpy.array(s.split(), dtype=numpy.int32)
+    except ValueError: # Not plain decimals, e.g. hexadecimal
+        return numpy.array(readIntArray(node, attr, []), dtype=numpy.int32)
+
 # Returns the -1-separated runs
 def readIndex(node, attr):
     v = readIntArray(node, attr, [])
@@ -0,0 +1,77 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import xml.etree.ElementTree as ET #To create the geometry nodes to import.
+
+import numpy #To check the resulting faces.
+import pytest #To register tests with.
+
+from X3DReader.X3DReader import X3DReader #The class we're testing.
+
+##  Creates an IndexedFaceSet node from a list of faces and a list of points.
+def createIndexedFaceSet(faces, points, ccw = True, last_separator = True):
+    coord_index = " -1 ".join(" ".join(str(index) for index in face) for face in faces)
+    if last_separator:
+        coord_index += " -1"
+    point = ", ".join("{0} {1} {2}".format(*point) for point in points)
+    return ET.fromstring("<IndexedFaceSet ccw=\"{ccw}\" coordIndex=\"{coord_index}\"><Coordinate point=\"{point}\"/></IndexedFaceSet>".format(ccw = str(ccw).lower(), coord_index = coord_index, point = point))
+
+##  Imports a geometry node, returning the vertices and the triangles.
+def importGeometry(geometry):
+    reader = X3DReader()
+    reader.defs = {}
+    reader.index_base = 0
+    reader.geometry_importers[geometry.tag](reader, geometry)
+    return reader.verts[:3].T, reader.faces[:reader.num_faces]
+
+##  The (signed) area of each triangle, seen from above.
+def getAreas(verts, faces):
+    return numpy.cross(verts[faces[:, 1]] - verts[faces[:, 0]], verts[faces[:, 2]] - verts[faces[:, 0]])[:, 1]
+
+##  Concave quads must be cut along the diagonal that lies inside of them,
+#   whichever corner is the concave one.
+@pytest.mark.parametrize("ccw", [True, False])
+@pytest.mark.parametrize("concave_corner", [0, 1, 2, 3])
+def test_indexedFaceSetConcaveQuad(ccw, concave_corner):
+    corners = [(0, 0, 0), (10, 0, 0), (2, 0, 2), (0, 0, 10)] #Concave at the third corner.
+    corners = corners[2 - concave_corner:] + corners[:2 - concave_corner]
+    verts, faces = importGeometry(createIndexedFaceSet([[0, 1, 2, 3]], corners, ccw = ccw))
+
+    areas = getAreas(verts, faces)
+    assert len(faces) == 2
+    assert numpy.all(numpy.sign(areas) == numpy.sign(areas[0])) #The triangles don't fold over each other.
+    assert abs(areas.sum()) == pytest.approx(40) #Twice the area of the quad.
+
+##  Triangles, quads and bigger polygons can be mixed, and the last face doesn't
+#   need to end with a -1.
+@pytest.mark.parametrize("last_separator", [True, False])
+def test_indexedFaceSetMixed(last_separator):
+    points = [(0, 0, 0), (10, 0, 0), (10, 0, 10), (0, 0, 10), (5, 0, 15), (-5, 0, 5)]
+    faces = [[0, 1, 2], [0, 1, 2, 3], [0, 1, 2, 4, 3, 5], [3, 2, 1]]
+    verts, result = importGeometry(createIndexedFaceSet(faces, points, last_separator = last_separator))
+
+    assert len(result) == 1 + 2 + 4 + 1
+    assert [0, 1, 2] in result.tolist()
+    assert [3, 2, 1] in result.tolist()
+
+##  Benchmarks importing a large mesh of triangles and quads, like the ones
+#   exported by CAD programs.
+def test_indexedFaceSetLarge():
+    size = 200
+    x, z = numpy.meshgrid(numpy.arange(size), numpy.arange(size))
+    points = numpy.stack([x.ravel(), numpy.sin(x.ravel() * 0.1) * z.ravel() * 0.01, z.ravel()], axis = 1)
+    faces = []
+    for row in range(size - 1):
+        for column in range(size - 1):
+            corner = row * size + column
+            if (row + column) % 3 == 0:
+                faces.append([corner, corner + 1, corner + size + 1])
+                faces.append([corner, corner + size + 1, corner + size])
+            else:
+                faces.append([corner, corner + 1, corner + size + 1, corner + size])
+    geometry = createIndexedFaceSet(faces, points)
+
+    verts, result = importGeometry(geometry)
+
+    assert len(result) == 2 * (size - 1) * (size - 1)
+    assert numpy.all(getAreas(verts, result) < 0)
@@ -6,7 +6,7 @@ import io
 import json #To parse the product-to-id mapping file.
 import os.path #To find the product-to-id mapping.
 import sys
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import xml.etree.ElementTree as ET
 
 from UM.Resources import Resources
@@ -279,22 +279,39 @@ class XmlMaterialProfile(InstanceContainer):
 
     # Recursively resolve loading inherited files
     def _resolveInheritance(self, file_name):
-        xml = self._loadFile(file_name)
+        xml, inherited_files = self._resolveInheritedDocument(file_name)
+        self._inherited_files.extend(inherited_files)
+        return xml
+
+    # Load a material file and merge it with the files it inherits from.
+    # Many materials inherit from the same base material, so the resolved documents are cached per file until one of
+    # the files they were built from changes. The returned document is shared and must not be modified. _mergeXML only
+    # modifies a copy of it.
+    # Returns the resolved document and the paths of all files it was built from.
+    def _resolveInheritedDocument(self, file_name):
+        path = Resources.getPath(CuraApplication.getInstance().ResourceTypes.MaterialInstanceContainer, file_name + ".xml.fdm_material")
+        cached = _resolved_documents.get(path)
+        if cached is not None:
+            xml, file_stamps = cached
+            if all(os.path.getmtime(inherited_path) == modified_time for inherited_path, modified_time in file_stamps):
+                return xml, [inherited_path for inherited_path, _ in file_stamps]
+
+        file_stamps = [(path, os.path.getmtime(path))]
+        xml = self._loadFile(path)
 
         inherits = xml.find("./um:inherits", self.__namespaces)
         if inherits is not None:
-            inherited = self._resolveInheritance(inherits.text)
+            inherited, inherited_files = self._resolveInheritedDocument(inherits.text)
             xml = self._mergeXML(inherited, xml)
+            file_stamps.extend((inherited_path, os.path.getmtime(inherited_path)) for inherited_path in inherited_files)
 
-        return xml
-
-    def _loadFile(self, file_name):
-        path = Resources.getPath(CuraApplication.getInstance().ResourceTypes.MaterialInstanceContainer, file_name + ".xml.fdm_material")
+        _resolved_documents[path] = (xml, file_stamps)
+        return xml, [inherited_path for inherited_path, _ in file_stamps]
 
+    def _loadFile(self, path):
         with open(path, encoding="utf-8") as f:
             contents = f.read()
 
-        self._inherited_files.append(path)
         return ET.fromstring(contents)
 
     # The XML material profile can have specific settings for machines.
@@ -399,12 +416,24 @@ class XmlMaterialProfile(InstanceContainer):
 
     @classmethod
     def getVersionFromSerialized(cls, serialized: str) -> Optional[int]:
-        data = ET.fromstring(serialized)
+        # Only the attributes of the root element are needed, so stop parsing as soon as that element starts instead of
+        # building the whole document.
+        parser = ET.XMLPullParser(events = ("start",))
+        root = None
+        for offset in range(0, len(serialized), 4096):
+            parser.feed(serialized[offset:offset + 4096])
+            for _, element in parser.read_events():
+                root = element
+                break
+            if root is not None:
+                break
+        if root is None:
+            root = ET.fromstring(serialized)  # Let the parser raise a proper error for invalid documents.
 
         version = XmlMaterialProfile.Version
         # get setting version
-        if "version" in data.attrib:
-            setting_version = cls.xmlVersionToSettingVersion(data.attrib["version"])
+        if "version" in root.attrib:
+            setting_version = cls.xmlVersionToSettingVersion(root.attrib["version"])
         else:
             setting_version = cls.xmlVersionToSettingVersion("1.2")
 
@@ -560,7 +589,7 @@ class XmlMaterialProfile(InstanceContainer):
                             new_material = XmlMaterialProfile(new_material_id)
                             is_new_material = True
 
-                        new_material.setMetaData(copy.deepcopy(self.getMetaData()))
+                        new_material.setMetaData(dict(self.getMetaData()))  # Shares the nested entries (e.g. properties) with the base file, like deserializeMetadata does.
                         new_material.getMetaData()["id"] = new_material_id
                         new_material.getMetaData()["name"] = self.getName()
                         new_material.setDefinition(machine_id)
@@ -614,7 +643,7 @@ class XmlMaterialProfile(InstanceContainer):
                             new_hotend_material = XmlMaterialProfile(new_hotend_id)
                             is_new_material = True
 
-                        new_hotend_material.setMetaData(copy.deepcopy(self.getMetaData()))
+                        new_hotend_material.setMetaData(dict(self.getMetaData()))
                         new_hotend_material.getMetaData()["id"] = new_hotend_id
                         new_hotend_material.getMetaData()["name"] = self.getName()
                         new_hotend_material.getMetaData()["variant"] = variant_containers[0]["id"]
@@ -854,13 +883,18 @@ class XmlMaterialProfile(InstanceContainer):
     #   IDs.
     #
     #   This loads the mapping from a file.
+    #   The file is only read once, since it is needed for every material. Each
+    #   call gets its own copy, so callers can't change the stored mapping.
     @classmethod
     def getProductIdMap(cls) -> Dict[str, List[str]]:
-        product_to_id_file = os.path.join(os.path.dirname(sys.modules[cls.__module__].__file__), "product_to_id.json")
-        with open(product_to_id_file) as f:
-            product_to_id_map = json.load(f)
-        product_to_id_map = {key: [value] for key, value in product_to_id_map.items()}
-        return product_to_id_map
+        if cls.__product_id_map is None:
+            product_to_id_file = os.path.join(os.path.dirname(sys.modules[cls.__module__].__file__), "product_to_id.json")
+            with open(product_to_id_file) as f:
+                product_to_id_map = json.load(f)
+            XmlMaterialProfile.__product_id_map = product_to_id_map
+        return {key: [value] for key, value in cls.__product_id_map.items()}
+
+    __product_id_map = None  # type: Optional[Dict[str, str]]
 
     ##  Parse the value of the "material compatible" property.
     @classmethod
@@ -898,6 +932,10 @@ class XmlMaterialProfile(InstanceContainer):
         "um": "http://www.ultimaker.com/material"
     }
 
+# Material files that other materials inherit from, merged with their own parents. Maps the path of the file to the
+# resolved document and the paths and modification times of all files it was built from.
+_resolved_documents = {}  # type: Dict[str, Tuple[ET.Element, List[Tuple[str, float]]]]
+
 ##  Helper function for pretty-printing XML because ETree is stupid
 def _indent(elem, level = 0):
     i = "\n" + level * "  "
@@ -0,0 +1,61 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import glob #To find the bundled material files.
+import os.path #To find the bundled material files.
+import xml.etree.ElementTree as ET #To compare against a full parse.
+
+import pytest #To register tests with.
+
+from XmlMaterialProfile.XmlMaterialProfile import XmlMaterialProfile #The class we're testing.
+
+material_data = """<?xml version="1.0" encoding="UTF-8"?>
+<fdmmaterial xmlns="http://www.ultimaker.com/material" version="{version}">
+    <metadata>
+        <name>
+            <brand>Generic</brand>
+            <material>PLA</material>
+            <color>Generic</color>
+        </name>
+        <GUID>506c9f0d-e3aa-4bd4-b2d2-23e2425b1aa9</GUID>
+    </metadata>
+    <properties>
+        <density>1.24</density>
+        <diameter>2.85</diameter>
+    </properties>
+</fdmmaterial>
+"""
+
+bundled_material_files = glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "resources", "materials", "*.xml.fdm_material"))
+
+##  The version must only depend on the root element.
+@pytest.mark.parametrize("xml_version", ["1.2", "1.3"])
+def test_getVersionFromSerialized(xml_version):
+    serialized = material_data.format(version = xml_version)
+    expected_setting_version = XmlMaterialProfile.xmlVersionToSettingVersion(xml_version)
+
+    assert XmlMaterialProfile.getVersionFromSerialized(serialized) == XmlMaterialProfile.Version * 1000000 + expected_setting_version
+
+def test_getVersionFromSerializedInvalid():
+    with pytest.raises(ET.ParseError):
+        XmlMaterialProfile.getVersionFromSerialized("This is not XML.")
+
+##  Changing the product mapping that was returned must not change the mapping for the next material.
+def test_getProductIdMapCopy():
+    product_id_map = XmlMaterialProfile.getProductIdMap()
+    expected = {key: list(value) for key, value in product_id_map.items()}
+    for value in product_id_map.values():
+        value.append("changed")
+    product_id_map["New Printer"] = ["new_printer"]
+
+    assert XmlMaterialProfile.getProductIdMap() == expected
+
+##  Reading only the root element must give the same versions as fully parsing the bundled material files.
+@pytest.mark.skipif(not bundled_material_files, reason = "The materials are not installed in the resources folder.")
+def test_getVersionFromSerializedBundledMaterials():
+    for file_path in bundled_material_files:
+        with open(file_path, encoding = "utf-8") as f:
+            serialized = f.read()
+        xml_version = ET.fromstring(serialized).attrib.get("version", "1.2")
+
+        assert XmlMaterialProfile.getVersionFromSerialized(serialized) == XmlMaterialProfile.Version * 1000000 + XmlMaterialProfile.xmlVersionToSettingVersion(xml_version)
@@ -0,0 +1,117 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import json #To check the format of the cache file.
+import os #To change the modification time of files.
+
+import pytest #This module contains unit tests.
+
+from cura.Settings.ContainerMetadataCache import ContainerMetadataCache #The class we're testing.
+
+##  Gives a container file to cache the metadata of.
+@pytest.fixture()
+def container_file(tmpdir):
+    file_path = str(tmpdir.join("generic_pla.xml.fdm_material"))
+    with open(file_path, "w") as f:
+        f.write("<fdmmaterial />")
+    return file_path
+
+##  Gives the path to store a cache in.
+@pytest.fixture()
+def cache_path(tmpdir):
+    return str(tmpdir.join("cache", "container_metadata.json"))
+
+def test_putGet(cache_path, container_file):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    metadata = [{"id": "generic_pla", "type": "material"}, {"id": "generic_pla_um3", "type": "material", "base_file": "generic_pla"}]
+    cache.put("generic_pla", container_file, metadata)
+
+    assert cache.get("generic_pla", container_file) == metadata
+    assert cache.get("generic_pla", container_file + ".other") is None #Different file.
+    assert cache.get("generic_abs", container_file) is None #Not cached.
+
+def test_saveLoad(cache_path, container_file):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [{"id": "generic_pla", "container_type": ContainerMetadataCache}])
+    cache.save()
+
+    loaded_cache = ContainerMetadataCache(cache_path, "1.0")
+    loaded_cache.load()
+    assert loaded_cache.get("generic_pla", container_file) == [{"id": "generic_pla", "container_type": ContainerMetadataCache}] #Classes are stored by name.
+
+    with open(cache_path, "r", encoding = "utf-8") as f:
+        data = json.load(f) #Plain JSON, no pickled objects.
+    assert data["entries"]["generic_pla"][4] == [{"id": "generic_pla", "container_type": ["cura.Settings.ContainerMetadataCache", "ContainerMetadataCache"]}]
+
+##  Metadata that would not come back the same from JSON is not cached.
+@pytest.mark.parametrize("metadata", [
+    {"id": "generic_pla", "compatible_printers": ("ultimaker3", )}, #Tuple would come back as a list.
+    {"id": "generic_pla", "properties": {1: "one"}},                #Key would come back as a string.
+    {"id": "generic_pla", "color": object()},                       #Not JSON at all.
+])
+def test_putNotJSON(cache_path, container_file, metadata):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [metadata])
+
+    assert cache.get("generic_pla", container_file) is None
+
+##  A cache written by a different version must not be used.
+def test_loadDifferentVersion(cache_path, container_file):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [{"id": "generic_pla"}])
+    cache.save()
+
+    loaded_cache = ContainerMetadataCache(cache_path, "2.0")
+    loaded_cache.load()
+    assert loaded_cache.get("generic_pla", container_file) is None
+
+def test_loadCorrupt(cache_path, container_file):
+    os.makedirs(os.path.dirname(cache_path))
+    with open(cache_path, "w") as f:
+        f.write("Not JSON.")
+
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.load() #Must not raise.
+    assert cache.get("generic_pla", container_file) is None
+
+##  Entries are invalidated when the file changes.
+def test_getChangedFile(cache_path, container_file):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [{"id": "generic_pla"}])
+
+    stat = os.stat(container_file)
+    os.utime(container_file, ns = (stat.st_atime_ns, stat.st_mtime_ns + 1000000000))
+    assert cache.get("generic_pla", container_file) is None
+
+def test_prune(cache_path, container_file):
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [{"id": "generic_pla"}])
+    cache.prune(["generic_abs"])
+
+    assert cache.get("generic_pla", container_file) is None
+
+##  Entries that depend on other files are invalidated when those files change.
+def test_getChangedDependency(cache_path, container_file, tmpdir):
+    parent_file = str(tmpdir.join("fdmprinter.def.json"))
+    with open(parent_file, "w") as f:
+        f.write("{}")
+    dependency_stamp = ContainerMetadataCache.getFilesStamp([container_file, parent_file])
+    cache = ContainerMetadataCache(cache_path, "1.0")
+    cache.put("generic_pla", container_file, [{"id": "generic_pla"}], dependency_stamp)
+    assert cache.get("generic_pla", container_file, dependency_stamp) == [{"id": "generic_pla"}]
+
+    with open(parent_file, "w") as f:
+        f.write("{\"metadata\": {}}")
+    changed_stamp = ContainerMetadataCache.getFilesStamp([container_file, parent_file])
+    assert changed_stamp != dependency_stamp
+    assert cache.get("generic_pla", container_file, changed_stamp) is None
+    assert cache.get("generic_pla", container_file) is None #Must not be used without checking its dependencies.
+
+def test_getFilesStampAddedFile(container_file, tmpdir):
+    other_file = str(tmpdir.join("generic_abs.xml.fdm_material"))
+    stamp = ContainerMetadataCache.getFilesStamp([container_file])
+    with open(other_file, "w") as f:
+        f.write("<fdmmaterial />")
+
+    assert ContainerMetadataCache.getFilesStamp([other_file, container_file]) != stamp
+    assert ContainerMetadataCache.getFilesStamp([container_file]) == stamp
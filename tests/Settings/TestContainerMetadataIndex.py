@@ -0,0 +1,84 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import pytest #This module contains unit tests.
+
+from cura.Settings.ContainerMetadataIndex import ContainerMetadataIndex #The class we're testing.
+
+##  Gives an index filled with a few material and quality containers.
+@pytest.fixture()
+def metadata_index():
+    index = ContainerMetadataIndex()
+    index.add({"id": "generic_pla", "type": "material", "base_file": "generic_pla", "GUID": "123"})
+    index.add({"id": "generic_pla_um3_aa04", "type": "material", "base_file": "generic_pla", "definition": "ultimaker3", "variant": "ultimaker3_aa04", "GUID": "123"})
+    index.add({"id": "generic_abs_um3_aa04", "type": "material", "base_file": "generic_abs", "definition": "ultimaker3", "variant": "ultimaker3_aa04", "GUID": "456"})
+    index.add({"id": "um3_aa04_pla_normal", "type": "quality", "definition": "ultimaker3", "variant": "ultimaker3_aa04", "material": "generic_pla_um3_aa04", "quality_type": "normal"})
+    return index
+
+def test_findCandidatesSingleKey(metadata_index):
+    assert metadata_index.findCandidates({"type": "quality"}) == ["um3_aa04_pla_normal"]
+    assert metadata_index.findCandidates({"GUID": "123"}) == ["generic_pla", "generic_pla_um3_aa04"]
+
+def test_findCandidatesIntersection(metadata_index):
+    assert metadata_index.findCandidates({"type": "material", "definition": "ultimaker3", "base_file": "generic_abs"}) == ["generic_abs_um3_aa04"]
+    assert metadata_index.findCandidates({"type": "quality", "material": "generic_abs_um3_aa04"}) == []
+
+##  Criteria that the index can't answer must not filter anything away.
+@pytest.mark.parametrize("criteria", [
+    {"name": "PLA"},                  #Not an indexed key.
+    {"definition": "ultimaker*"},     #Wildcard.
+    {"setting_version": 4},           #Not a string.
+])
+def test_findCandidatesNotIndexed(metadata_index, criteria):
+    assert metadata_index.findCandidates(criteria) is None
+
+##  Only the indexed criteria are used to find candidates, the others are left to the container query.
+def test_findCandidatesPartiallyIndexed(metadata_index):
+    assert metadata_index.findCandidates({"type": "material", "name": "Generic PLA"}) == ["generic_pla", "generic_pla_um3_aa04", "generic_abs_um3_aa04"]
+
+def test_remove(metadata_index):
+    metadata_index.remove("generic_pla_um3_aa04")
+
+    assert "generic_pla_um3_aa04" not in metadata_index
+    assert len(metadata_index) == 3
+    assert metadata_index.findCandidates({"GUID": "123"}) == ["generic_pla"]
+    assert metadata_index.findCandidates({"base_file": "generic_pla", "definition": "ultimaker3"}) == []
+
+##  Re-adding a container with changed metadata must update the index but keep its position.
+def test_updateMetadata(metadata_index):
+    metadata_index.add({"id": "generic_pla", "type": "material", "base_file": "generic_pla", "GUID": "789"})
+
+    assert metadata_index.findCandidates({"GUID": "123"}) == ["generic_pla_um3_aa04"]
+    assert metadata_index.findCandidates({"type": "material"}) == ["generic_pla", "generic_pla_um3_aa04", "generic_abs_um3_aa04"]
+
+##  The same number of containers is not enough: the IDs must be the same.
+def test_hasContainerIds(metadata_index):
+    metadata = {"generic_pla": {}, "generic_pla_um3_aa04": {}, "generic_abs_um3_aa04": {}, "um3_aa04_pla_normal": {}}
+    assert metadata_index.hasContainerIds(metadata.keys())
+
+    del metadata["generic_abs_um3_aa04"]
+    metadata["generic_petg"] = {}
+    assert not metadata_index.hasContainerIds(metadata.keys())
+
+def test_rebuild(metadata_index):
+    metadata_index.rebuild([{"id": "only_one", "type": "variant"}])
+
+    assert len(metadata_index) == 1
+    assert metadata_index.findCandidates({"type": "material"}) == []
+    assert metadata_index.findCandidates({"type": "variant"}) == ["only_one"]
+
+##  Tests that an indexed lookup finds the same containers as a full scan, for a registry the size of all bundled Ultimaker profiles.
+def test_findCandidatesLargeRegistry():
+    all_metadata = []
+    for material_index in range(200):
+        for variant in ("aa025", "aa04", "aa08", "bb04", "bb08"):
+            all_metadata.append({"id": "material_{0}_{1}".format(material_index, variant), "type": "material", "definition": "ultimaker3", "variant": variant, "base_file": "material_{0}".format(material_index), "GUID": str(material_index)})
+            for quality_type in ("draft", "fast", "normal", "high"):
+                all_metadata.append({"id": "quality_{0}_{1}_{2}".format(material_index, variant, quality_type), "type": "quality", "definition": "ultimaker3", "variant": variant, "material": "material_{0}_{1}".format(material_index, variant), "quality_type": quality_type})
+    index = ContainerMetadataIndex()
+    index.rebuild(all_metadata)
+    criteria = {"type": "quality", "definition": "ultimaker3", "material": "material_150_aa04"}
+
+    scan_result = [metadata["id"] for metadata in all_metadata if all(str(metadata.get(key)) == value for key, value in criteria.items())]
+
+    assert index.findCandidates(criteria) == scan_result
@@ -0,0 +1,132 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading #To block the worker while it's writing.
+import unittest.mock #To block the worker while it's writing.
+
+import pytest #This module contains unit tests.
+
+import cura.Settings.ContainerSaveWorker
+from cura.Settings.ContainerSaveWorker import ContainerSaveWorker #The class we're testing.
+
+##  A container registry with a lock file that records whether it's held.
+@pytest.yield_fixture(autouse = True)
+def container_registry():
+    registry = unittest.mock.MagicMock()
+    with unittest.mock.patch("UM.Settings.ContainerRegistry.ContainerRegistry.getInstance", return_value = registry):
+        yield registry
+
+def readFile(file_path):
+    with open(file_path) as f:
+        return f.read()
+
+def test_queueFile(tmpdir):
+    worker = ContainerSaveWorker()
+    file_path = str(tmpdir.join("machine.global.cfg"))
+    worker.queueFile(file_path, "[general]\n")
+    worker.flush()
+
+    assert readFile(file_path) == "[general]\n"
+    metrics = worker.getMetrics()
+    assert metrics["queue_depth"] == 0
+    assert metrics["written"] == 1
+    assert metrics["failed"] == 0
+
+##  Files that are queued again before they are written are written only once,
+#   with the latest contents.
+def test_queueFileCoalesce(tmpdir):
+    worker = ContainerSaveWorker()
+    blocking_path = str(tmpdir.join("blocking.cfg"))
+    file_path = str(tmpdir.join("user.inst.cfg"))
+
+    # Keep the worker busy with the first file while the others are queued.
+    release = threading.Event()
+    original_save_file = cura.Settings.ContainerSaveWorker.SaveFile
+    def blockingSaveFile(path, mode):
+        if path == blocking_path:
+            release.wait()
+        return original_save_file(path, mode)
+
+    with unittest.mock.patch("cura.Settings.ContainerSaveWorker.SaveFile", blockingSaveFile):
+        worker.queueFile(blocking_path, "")
+        for value in range(10):
+            worker.queueFile(file_path, "value = {value}".format(value = value))
+        assert worker.getQueueDepth() == 2
+        release.set()
+        worker.flush()
+
+    assert readFile(file_path) == "value = 9"
+    metrics = worker.getMetrics()
+    assert metrics["written"] == 2
+    assert metrics["coalesced"] == 9
+
+##  Failing to write a file is counted, and doesn't stop the worker.
+def test_queueFileFailed(tmpdir):
+    worker = ContainerSaveWorker()
+    worker.queueFile(str(tmpdir.join("does_not_exist", "user.inst.cfg")), "")
+    file_path = str(tmpdir.join("user.inst.cfg"))
+    worker.queueFile(file_path, "[general]\n")
+    worker.flush()
+
+    assert readFile(file_path) == "[general]\n"
+    assert worker.getMetrics()["failed"] == 1
+
+##  Files are written while holding the lock file of the container registry.
+def test_queueFileLocks(tmpdir, container_registry):
+    worker = ContainerSaveWorker()
+    file_path = str(tmpdir.join("user.inst.cfg"))
+    locked_while_writing = []
+    original_save_file = cura.Settings.ContainerSaveWorker.SaveFile
+    def checkingSaveFile(path, mode):
+        lock = container_registry.lockFile.return_value
+        locked_while_writing.append(lock.__enter__.called and not lock.__exit__.called)
+        return original_save_file(path, mode)
+
+    with unittest.mock.patch("cura.Settings.ContainerSaveWorker.SaveFile", checkingSaveFile):
+        worker.queueFile(file_path, "[general]\n")
+        worker.flush()
+
+    assert locked_while_writing == [True]
+
+##  A container of which the file failed to be written is marked as dirty
+#   again, on the main thread.
+def test_queueFileFailedMarksDirty(tmpdir):
+    worker = ContainerSaveWorker()
+    container = unittest.mock.MagicMock()
+    container.getMetaDataEntry = unittest.mock.MagicMock(return_value = None)
+    application = unittest.mock.MagicMock()
+
+    with unittest.mock.patch("UM.Application.Application.getInstance", return_value = application):
+        worker.queueFile(str(tmpdir.join("does_not_exist", "user.inst.cfg")), "", container)
+        worker.flush()
+
+    application.callLater.assert_called_once_with(worker._onWriteFailed, container)
+    container.setDirty.assert_not_called() #Not from the worker thread.
+    worker._onWriteFailed(container) #What the main thread does later.
+    container.setDirty.assert_called_once_with(True)
+
+##  Discarding a container drops its queued file, so that the file isn't
+#   created again after the container is removed.
+def test_discardContainer(tmpdir):
+    worker = ContainerSaveWorker()
+    blocking_path = str(tmpdir.join("blocking.cfg"))
+    file_path = tmpdir.join("removed.inst.cfg")
+    container = unittest.mock.MagicMock()
+    container.getId = unittest.mock.MagicMock(return_value = "removed")
+
+    release = threading.Event()
+    original_save_file = cura.Settings.ContainerSaveWorker.SaveFile
+    def blockingSaveFile(path, mode):
+        if path == blocking_path:
+            release.wait()
+        return original_save_file(path, mode)
+
+    with unittest.mock.patch("cura.Settings.ContainerSaveWorker.SaveFile", blockingSaveFile):
+        worker.queueFile(blocking_path, "")
+        worker.queueFile(str(file_path), "[general]\n", container)
+        worker.discardContainer("removed")
+        release.set()
+        worker.flush()
+
+    assert not file_path.exists()
+    assert worker.getMetrics()["written"] == 1
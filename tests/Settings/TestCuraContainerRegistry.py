@@ -7,6 +7,7 @@ import shutil #To copy files to make a temporary file.
 import unittest.mock #To mock and monkeypatch stuff.
 import urllib.parse
 import copy
+import itertools #To return the container files of each resource type in turn.
 
 import cura.CuraApplication
 from cura.Settings.CuraContainerRegistry import CuraContainerRegistry #The class we're testing.
@@ -96,6 +97,42 @@ def test_addContainerGlobalStack(container_registry, definition_container):
     assert len(mock_super_add_container.call_args_list[0][0]) == 1 #Called with one parameter.
     assert type(mock_super_add_container.call_args_list[0][0][0]) == GlobalStack
 
+##  Tests that metadata put in the registry directly is found through the
+#   metadata index, also when one container was replaced by another so that
+#   the number of containers stayed the same.
+def test_findContainersMetadataReplaced(container_registry):
+    container_registry.metadata["generic_pla"] = {"id": "generic_pla", "type": "material"}
+    assert [metadata["id"] for metadata in container_registry.findContainersMetadata(type = "material")] == ["generic_pla"]
+
+    del container_registry.metadata["generic_pla"]
+    container_registry.metadata["generic_abs"] = {"id": "generic_abs", "type": "material"}
+    assert [metadata["id"] for metadata in container_registry.findContainersMetadata(type = "material")] == ["generic_abs"]
+
+##  Tests that saving a material doesn't invalidate the cached metadata of
+#   other containers, while a changed variant invalidates the materials.
+def test_findCacheableContainerFilesDependencies(container_registry, tmpdir):
+    file_paths = {}
+    for file_name in ("fdmprinter.def.json", "normal.inst.cfg", "aa04.inst.cfg", "generic_pla.xml.fdm_material"):
+        file_paths[file_name] = str(tmpdir.join(file_name))
+        with open(file_paths[file_name], "w") as f:
+            f.write("Original")
+    #The definitions, qualities, variants and materials, in the order they are looked for.
+    found_files = itertools.cycle([{"fdmprinter": file_paths["fdmprinter.def.json"]}, {"normal": file_paths["normal.inst.cfg"]}, {"aa04": file_paths["aa04.inst.cfg"]}, {"generic_pla": file_paths["generic_pla.xml.fdm_material"]}])
+
+    with unittest.mock.patch.object(container_registry, "_findContainerFiles", lambda resource_types: next(found_files)):
+        _, dependency_stamps = container_registry._findCacheableContainerFiles()
+        with open(file_paths["generic_pla.xml.fdm_material"], "w") as f:
+            f.write("Saved material")
+        _, material_saved_stamps = container_registry._findCacheableContainerFiles()
+        with open(file_paths["aa04.inst.cfg"], "w") as f:
+            f.write("Changed variant")
+        _, variant_changed_stamps = container_registry._findCacheableContainerFiles()
+
+    assert set(dependency_stamps.keys()) == {"fdmprinter", "generic_pla"} #Qualities and variants only depend on their own file.
+    assert material_saved_stamps == dependency_stamps
+    assert variant_changed_stamps["fdmprinter"] == dependency_stamps["fdmprinter"]
+    assert variant_changed_stamps["generic_pla"] != dependency_stamps["generic_pla"]
+
 def test_addContainerGoodSettingVersion(container_registry, definition_container):
     from cura.CuraApplication import CuraApplication
     definition_container.getMetaData()["setting_version"] = CuraApplication.SettingVersion
@@ -0,0 +1,175 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import copy #To copy decorators like copying a node does.
+import gc #To delete decorators.
+import unittest.mock #To mock the application, the extruders and the selection.
+
+import pytest #This module contains unit tests.
+
+from UM.Application import Application #To get the mocked application and registry.
+
+from cura.Settings.SettingOverrideDecorator import SettingOverrideDecorator #The class we're testing.
+from plugins.PerObjectSettingsTool.PerObjectSettingsTool import PerObjectSettingsTool #To get the stack ID that the settings panel uses.
+
+##  A stand-in for the per-object stack, with only what the decorator uses.
+class MockStack:
+    def __init__(self, stack_id):
+        self._id = stack_id
+        self._containers = []
+        self._next_stack = None
+        self.propertyChanged = unittest.mock.MagicMock()
+
+    def getId(self):
+        return self._id
+
+    def setDirty(self, dirty):
+        pass
+
+    def addContainer(self, container):
+        self._containers.append(container)
+
+    def getContainer(self, index):
+        return self._containers[index]
+
+    def getTop(self):
+        return self._containers[0]
+
+    def getNextStack(self):
+        return self._next_stack
+
+    def setNextStack(self, stack):
+        self._next_stack = stack
+
+##  Everything outside of the decorator that it talks to.
+@pytest.yield_fixture()
+def environment():
+    selected_nodes = []
+    with unittest.mock.patch("UM.Application.Application.getInstance"), \
+            unittest.mock.patch("cura.Settings.ExtruderManager.ExtruderManager.getInstance"), \
+            unittest.mock.patch("UM.Settings.ContainerRegistry.ContainerRegistry.getInstance"), \
+            unittest.mock.patch("cura.Settings.SettingOverrideDecorator.PerObjectContainerStack", MockStack), \
+            unittest.mock.patch("UM.Scene.Selection.Selection.isSelected", side_effect = lambda node: node in selected_nodes):
+        yield selected_nodes
+
+##  Creates a decorator on a mocked node, and copies of it on other nodes.
+def createDecorators(count):
+    original = SettingOverrideDecorator()
+    decorators = [original] + [copy.deepcopy(original) for _ in range(count - 1)]
+    for decorator in decorators:
+        decorator.setNode(unittest.mock.MagicMock())
+    return decorators
+
+##  Lets the mocks forget the functions of the decorators that were connected
+#   to them, so that the decorators can be garbage collected.
+def forgetConnections(stack):
+    Application.getInstance.reset_mock() #Also records the calls on the application that it returned.
+    stack.propertyChanged.reset_mock()
+
+##  Gets the IDs of the stacks that were added to the registry.
+def getRegisteredIds():
+    return [call[0][0].getId() for call in Application.getInstance().getContainerRegistry().addContainer.call_args_list]
+
+##  Tests that copies share the stack of the original.
+def test_copySharesStack(environment):
+    original, duplicate = createDecorators(2)
+
+    assert duplicate.getStack() is original.getStack()
+
+##  Tests that selecting and looking at the settings of a copy doesn't give it
+#   a stack of its own.
+def test_readingKeepsStackShared(environment):
+    original, duplicate = createDecorators(2)
+    environment.append(duplicate.getNode())
+
+    duplicate.getStack().getTop().findInstances()
+    duplicate.getActiveExtruder()
+
+    assert duplicate.getStack() is original.getStack()
+    duplicate.getNode().decoratorsChanged.emit.assert_not_called()
+
+##  Tests that writing a setting of a shared stack leaves the selected object on
+#   the stack, and moves the other objects to a copy without the change.
+def test_writingUnsharesStack(environment):
+    original, duplicate, other_duplicate = createDecorators(3)
+    stack = duplicate.getStack()
+    environment.append(duplicate.getNode())
+
+    stack.getTop().removeInstance("infill_sparse_density")
+
+    assert duplicate.getStack() is stack
+    assert original.getStack() is not stack
+    assert other_duplicate.getStack() is original.getStack() #The objects that are not edited still share their stack.
+    assert original.getStack().getTop() is not stack.getTop()
+    original.getNode().decoratorsChanged.emit.assert_called_once_with(original.getNode())
+    duplicate.getNode().decoratorsChanged.emit.assert_not_called()
+
+##  Tests that a write without any of the objects selected applies to all of
+#   them.
+def test_writingWithoutSelectionKeepsStackShared(environment):
+    original, duplicate = createDecorators(2)
+
+    original.getStack().getTop().removeInstance("infill_sparse_density")
+
+    assert duplicate.getStack() is original.getStack()
+
+##  Tests that changing the extruder of a copy gives it a stack of its own,
+#   since the extruder stack is below the per-object stack.
+def test_setActiveExtruderUnsharesStack(environment):
+    original, duplicate = createDecorators(2)
+    stack = original.getStack()
+
+    duplicate.setActiveExtruder("other_extruder")
+
+    assert original.getStack() is stack
+    assert duplicate.getStack() is not stack
+    assert duplicate.getActiveExtruder() == "other_extruder"
+    assert original.getActiveExtruder() != "other_extruder"
+
+##  Tests that every stack is registered with an ID of its own, also when the
+#   decorators that the stacks were made for are deleted in between.
+def test_stackIdsUnique(environment):
+    stack_ids = []
+    for _ in range(10):
+        decorator = SettingOverrideDecorator()
+        stack_ids.append(decorator.getStack().getId())
+        forgetConnections(decorator.getStack())
+        del decorator
+        gc.collect()
+
+    assert len(set(stack_ids)) == len(stack_ids)
+
+##  Tests that the per-object settings tool gives the settings panel the ID of
+#   the registered stack of the selected object, also after un-sharing it.
+def test_getContainerID(environment):
+    original, duplicate = createDecorators(2)
+    for decorator in (original, duplicate):
+        decorator.getNode().callDecoration.side_effect = lambda function_name, decorator = decorator: getattr(decorator, function_name)()
+    environment.append(duplicate.getNode())
+    duplicate.getStack().getTop().removeInstance("infill_sparse_density")
+    Application.getInstance().getGlobalContainerStack.return_value = None
+    with unittest.mock.patch("UM.Preferences.Preferences.getInstance"):
+        tool = PerObjectSettingsTool()
+
+    for decorator in (original, duplicate):
+        with unittest.mock.patch("UM.Scene.Selection.Selection.getSelectedObject", return_value = decorator.getNode()):
+            assert tool.getContainerID() == decorator.getStack().getId()
+    assert original.getStack().getId() != duplicate.getStack().getId()
+    assert sorted(getRegisteredIds()) == sorted([original.getStack().getId(), duplicate.getStack().getId()])
+
+##  Tests that a stack is removed from the registry when the last object that
+#   used it is deleted.
+def test_unusedStackRemoved(environment):
+    Application.getInstance().callLater.side_effect = lambda function, *args: function(*args)
+    original, duplicate = createDecorators(2)
+    stack_id = original.getStack().getId()
+    forgetConnections(original.getStack())
+    registry = Application.getInstance().getContainerRegistry()
+
+    del original
+    gc.collect()
+    registry.removeContainer.assert_not_called() #The copy still uses it.
+
+    del duplicate
+    gc.collect()
+    registry.removeContainer.assert_called_once_with(stack_id)
@@ -140,3 +140,15 @@ def test_check2():
     assert numpy.any(check_array)
     assert not check_array[3][0]
     assert check_array[3][4]
+
+
+##  The same hull at another position, also a fraction of a unit further,
+#   shares the filled array and only gets another offset.
+def test_fromPolygonSharesArray():
+    vertices = numpy.array([[-3.3, 1.2], [3.1, 1.2], [0.4, -3.7]])
+    shape_arr = ShapeArray.fromPolygon(vertices)
+    moved_shape_arr = ShapeArray.fromPolygon(vertices + numpy.array([10.45, -20.3]))
+
+    assert moved_shape_arr.arr is shape_arr.arr
+    assert moved_shape_arr.offset_x - shape_arr.offset_x == 10
+    assert moved_shape_arr.offset_y - shape_arr.offset_y == -20
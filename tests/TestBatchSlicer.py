@@ -0,0 +1,83 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import json #To write job files.
+import os.path #To check the paths of the jobs.
+import unittest.mock #To run the batch slicer without the application and engines.
+
+import pytest #To register tests with.
+
+from cura.BatchSlicer import BatchJobError, BatchSlicer, formatPrintTime, loadBatchJobs #The functions we're testing.
+
+##  Stands in for an EngineProcess. It stops for good when it slices a job
+#   named "crash".
+class MockEngine:
+    def __init__(self):
+        self._alive = True
+
+    def createSliceMessage(self):
+        return None
+
+    def slice(self, slice_message):
+        if slice_message == "crash":
+            self._alive = False
+            raise RuntimeError("The engine stopped")
+        return unittest.mock.MagicMock(gcode_list = [";FLAVOR:Mock\n"], print_times = {"infill": 10.0}, material_amounts = [100.0])
+
+    def isAlive(self):
+        return self._alive
+
+    def close(self):
+        self._alive = False
+
+##  Tests reading a job file, with paths relative to the file.
+def test_loadBatchJobs(tmpdir):
+    job_file = tmpdir.join("jobs.json")
+    job_file.write(json.dumps([
+        {"models": ["bracket.stl", "models/clip.stl"], "output": "out/bracket.gcode", "machine": "ultimaker3"},
+        {"name": "Spare", "models": ["/models/spare.stl"], "output": "spare.gcode", "machine": "My printer", "material": "generic_pla", "quality": "normal"}
+    ]))
+
+    jobs = loadBatchJobs(str(job_file))
+
+    assert jobs[0]["models"] == [os.path.join(str(tmpdir), "bracket.stl"), os.path.join(str(tmpdir), "models/clip.stl")]
+    assert jobs[0]["output"] == os.path.join(str(tmpdir), "out/bracket.gcode")
+    assert jobs[0]["name"] == "bracket.gcode"
+    assert jobs[1]["models"] == ["/models/spare.stl"]
+    assert jobs[1]["name"] == "Spare"
+    assert jobs[1]["material"] == "generic_pla"
+
+##  Tests that jobs without the required keys are refused.
+@pytest.mark.parametrize("missing", ["models", "output", "machine"])
+def test_loadBatchJobsMissingKey(tmpdir, missing):
+    job = {"models": ["bracket.stl"], "output": "bracket.gcode", "machine": "ultimaker3"}
+    del job[missing]
+    job_file = tmpdir.join("jobs.json")
+    job_file.write(json.dumps([job]))
+
+    with pytest.raises(BatchJobError):
+        loadBatchJobs(str(job_file))
+
+@pytest.mark.parametrize("seconds, expected", [(0, "00:00:00"), (59.6, "00:01:00"), (3723, "01:02:03"), (90000, "25:00:00")])
+def test_formatPrintTime(seconds, expected):
+    assert formatPrintTime(seconds) == expected
+
+##  Tests that an engine that stops while slicing is replaced, also when it was
+#   the only one.
+def test_runReplacesStoppedEngine(tmpdir):
+    jobs = [{"name": name, "output": str(tmpdir.join(name + ".gcode"))} for name in ("first", "crash", "third", "fourth")]
+    slicer = BatchSlicer(jobs, worker_count = 1)
+    def prepareJob(job, engine, backend, entry):
+        entry["prepare_time"] = 0
+        return job["name"], unittest.mock.MagicMock()
+    slicer._prepareJob = prepareJob
+    application = unittest.mock.MagicMock()
+    engines = []
+    application.getBackend.return_value.createEngineProcess = lambda: engines.append(MockEngine()) or engines[-1]
+
+    with unittest.mock.patch("UM.Application.Application.getInstance", return_value = application):
+        assert not slicer.run()
+
+    assert [entry["success"] for entry in slicer.getReport()] == [True, False, True, True]
+    assert len(engines) == 2
+    assert tmpdir.join("fourth.gcode").read() == ";FLAVOR:Mock\n"
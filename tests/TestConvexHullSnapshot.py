@@ -0,0 +1,120 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import threading #To invalidate hulls from another thread.
+import unittest.mock #To mock nodes, stacks and the application.
+import weakref
+
+import numpy
+import pytest
+
+from UM.Math.Matrix import Matrix
+
+from cura.ConvexHullDecorator import ConvexHullDecorator
+from cura.ConvexHullService import ConvexHullService
+from cura.ConvexHullSnapshot import ConvexHullSnapshot
+
+##  Mesh data of a cube of 10mm, of which only the hull vertices are used.
+class MockMesh:
+    def getConvexHullVertices(self):
+        return numpy.array([[x, y, z] for x in (-5, 5) for y in (0, 10) for z in (-5, 5)], dtype = numpy.float32)
+
+def translation(x, z):
+    data = numpy.identity(4)
+    data[0, 3] = x
+    data[2, 3] = z
+    return data
+
+def bounds(hull):
+    points = hull.getPoints()
+    return tuple(points.min(axis = 0)) + tuple(points.max(axis = 0))
+
+def test_computeConvexHull():
+    snapshot = ConvexHullSnapshot(MockMesh(), translation(10, 20), None, hull_offset = 0)
+
+    assert bounds(snapshot.computeConvexHull()) == pytest.approx((5, 15, 15, 25))
+
+def test_computeConvexHullOffset():
+    snapshot = ConvexHullSnapshot(MockMesh(), translation(0, 0), None, hull_offset = 2)
+
+    assert bounds(snapshot.computeConvexHull()) == pytest.approx((-7, -7, 7, 7))
+
+def test_computeConvexHullGroup():
+    children = [ConvexHullSnapshot(MockMesh(), translation(-10, 0), None, 0), ConvexHullSnapshot(MockMesh(), translation(10, 0), None, 0)]
+    snapshot = ConvexHullSnapshot(None, None, children, hull_offset = 0)
+
+    assert bounds(snapshot.computeConvexHull()) == pytest.approx((-15, -5, 15, 5))
+
+##  Printing one at a time adds the head and the adhesion margin, but only
+#   around the full hull.
+def test_computeConvexHullHead():
+    head = [[-20, 10], [10, 10], [10, -10], [-20, -10]]
+    snapshot = ConvexHullSnapshot(MockMesh(), translation(0, 0), None, 0, head_polygon = head, adhesion_margin = 0)
+
+    assert bounds(snapshot.computeConvexHull()) == pytest.approx((-25, -15, 15, 15))
+    assert bounds(snapshot.compute2DConvexHull()) == pytest.approx((-5, -5, 5, 5))
+
+##  The snapshot must not change when the node is moved after it was made.
+def test_createConvexHullSnapshotCopiesTransformation():
+    application = unittest.mock.MagicMock()
+    application.getGlobalContainerStack.return_value.getProperty.return_value = "all_at_once"
+    with unittest.mock.patch("UM.Application.Application.getInstance", return_value = application), unittest.mock.patch("cura.ConvexHullService.ConvexHullService.getInstance"):
+        decorator = ConvexHullDecorator()
+        world_transformation = Matrix(translation(10, 20))
+        per_mesh_stack = unittest.mock.MagicMock()
+        per_mesh_stack.getProperty = lambda key, property_name: False if key == "mold_enabled" else 0
+        node = unittest.mock.MagicMock()
+        node.getMeshData.return_value = MockMesh()
+        node.getWorldTransformation.return_value = world_transformation
+        node.callDecoration = lambda name: per_mesh_stack if name == "getStack" else None
+        decorator._node = node
+
+        snapshot = decorator.createConvexHullSnapshot()
+    world_transformation.getData()[0, 3] = 100 #The node is moved while the hull is computed.
+
+    assert bounds(snapshot.computeConvexHull()) == pytest.approx((5, 15, 15, 25))
+
+##  Invalidating a hull from another thread must only change the service on
+#   the main thread.
+def test_invalidateFromOtherThread():
+    service = ConvexHullService.__new__(ConvexHullService) #Without connecting to the application.
+    service._decorators = weakref.WeakSet()
+    service._dirty_decorators = weakref.WeakSet()
+    service._update_timer = unittest.mock.MagicMock()
+    decorator = unittest.mock.MagicMock()
+    application = unittest.mock.MagicMock()
+
+    with unittest.mock.patch("UM.Application.Application.getInstance", return_value = application):
+        thread = threading.Thread(target = service.invalidate, args = (decorator, ))
+        thread.start()
+        thread.join()
+
+    assert decorator not in service._dirty_decorators
+    service._update_timer.start.assert_not_called()
+    application.callLater.assert_called_once_with(service._invalidate, decorator)
+
+    service._invalidate(decorator) #What the main thread does later.
+    assert decorator in service._dirty_decorators
+    service._update_timer.start.assert_called_once_with()
+
+##  Changing a per-object setting must recompute hulls derived from the
+#   settings, such as the head hull.
+def test_getDerivedHullPerObjectSettingChanged():
+    with unittest.mock.patch("UM.Application.Application.getInstance"), unittest.mock.patch("cura.ConvexHullService.ConvexHullService.getInstance") as get_service:
+        get_service.return_value.getSettingsRevision.return_value = 1
+        per_object_stack = unittest.mock.MagicMock()
+        node = unittest.mock.MagicMock()
+        node.callDecoration = lambda name: per_object_stack if name == "getStack" else None
+        decorator = ConvexHullDecorator()
+        decorator.setNode(node)
+        on_setting_changed = per_object_stack.propertyChanged.connect.call_args[0][0]
+        convex_hull = unittest.mock.MagicMock()
+        compute = unittest.mock.MagicMock()
+
+        decorator._getDerivedHull("head", convex_hull, compute)
+        decorator._getDerivedHull("head", convex_hull, compute)
+        assert compute.call_count == 1
+
+        on_setting_changed("adhesion_type", "value")
+        decorator._getDerivedHull("head", convex_hull, compute)
+        assert compute.call_count == 2
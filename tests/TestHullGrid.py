@@ -0,0 +1,52 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import collections
+
+from cura.HullGrid import HullGrid
+
+Offset = collections.namedtuple("Offset", ["x", "z"]) #Stands in for a Vector, of which only X and Z are used.
+
+def gimmeHullGrid():
+    grid = HullGrid()
+    grid.add("left", (-50, -10, -30, 10))
+    grid.add("center", (-10, -10, 10, 10))
+    grid.add("right", (30, -10, 50, 10))
+    grid.add("touching_center", (10, -5, 20, 5))
+    grid.build()
+    return grid
+
+def test_findNearEmpty():
+    grid = HullGrid()
+    grid.build()
+    assert grid.findNear((0, 0, 10, 10)) == []
+
+def test_findNearNone():
+    assert gimmeHullGrid().findNear(None) == []
+
+def test_findNear():
+    grid = gimmeHullGrid()
+    assert grid.findNear((-5, -5, 5, 5)) == ["center"]
+    assert grid.findNear((5, -5, 35, 5)) == ["center", "right", "touching_center"]
+    assert grid.findNear((100, 100, 110, 110)) == []
+
+def test_findNearOffset():
+    grid = gimmeHullGrid()
+    assert grid.findNear((-5, -5, 5, 5), Offset(x = 40, z = 0)) == ["right"]
+    assert grid.findNear((-5, -5, 5, 5), Offset(x = 0, z = 40)) == []
+
+##  The grid must find exactly the same pairs as comparing all bounds with each other.
+def test_findNearMatchesBruteForce():
+    grid = HullGrid()
+    all_bounds = []
+    for index in range(150):
+        x = (index * 37) % 200
+        z = (index * 53) % 200
+        bounds = (x, z, x + 5 + index % 20, z + 5 + index % 15)
+        all_bounds.append(bounds)
+        grid.add(index, bounds)
+    grid.build()
+
+    for bounds in all_bounds:
+        brute_force = [index for index, other in enumerate(all_bounds) if other[0] <= bounds[2] and bounds[0] <= other[2] and other[1] <= bounds[3] and bounds[1] <= other[3]]
+        assert grid.findNear(bounds) == brute_force
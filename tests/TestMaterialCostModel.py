@@ -0,0 +1,59 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import math #To compute the expected lengths.
+
+import pytest #To register tests with.
+
+from cura.MaterialCostModel import ExtruderMaterial, MaterialCostModel, estimateMaterials #The classes we're testing.
+
+##  A stand-in for a container, with only what the cost model uses.
+class MockContainer:
+    def __init__(self, metadata = None, properties = None, name = ""):
+        self._metadata = metadata or {}
+        self._properties = properties or {}
+        self._name = name
+        self.material = None
+
+    def getMetaDataEntry(self, entry, default = None):
+        return self._metadata.get(entry, default)
+
+    def getProperty(self, key, property_name):
+        return self._properties.get(key)
+
+    def getName(self):
+        return self._name
+
+    def findContainer(self, criteria):
+        return self.material
+
+@pytest.fixture
+def extruder_materials():
+    return [ExtruderMaterial("PLA", 1.24, 2.85, spool_weight = 750, spool_cost = 30), None, ExtruderMaterial("PVA", 1.23, 1.75)]
+
+def test_estimateMaterials(extruder_materials):
+    estimates = estimateMaterials([[1000, 500, 2000], [0]], extruder_materials)
+
+    assert len(estimates) == 2
+    first = estimates[0]
+    assert first.lengths == [round(1000 / (math.pi * 1.425 ** 2) / 1000, 2), 0, round(2000 / (math.pi * 0.875 ** 2) / 1000, 2)]
+    assert first.weights == pytest.approx([1.24, 0, 2.46])
+    assert first.costs == pytest.approx([1.24 * 30 / 750, 0, 0]) #No spool cost for PVA, and no material in the second extruder.
+    assert estimates[1].lengths == [0]
+
+##  Tests that the model finds the material of each extruder by its position,
+#   with the costs from the preferences.
+def test_fromStacks():
+    global_stack = MockContainer(properties = {"material_diameter": 2.85})
+    first = MockContainer(metadata = {"position": "1", "properties": {"density": 1.2}}, properties = {"material_diameter": 1.75})
+    first.material = MockContainer(metadata = {"GUID": "abc"}, name = "Nylon")
+    second = MockContainer(metadata = {"position": "0", "properties": {"density": 1.0}})
+
+    model = MaterialCostModel.fromStacks(global_stack, [first, second], {"abc": {"spool_weight": 500, "spool_cost": 25}}, "Unknown")
+
+    assert model.getNames([10, 10, 10], "Unknown") == ["Unknown", "Nylon", "Unknown"]
+    assert model.getExtruderMaterial(0).diameter == 2.85 #Falls back to the diameter of the global stack.
+    assert model.getExtruderMaterial(1).diameter == 1.75
+    estimate = model.estimate([1000, 1000])
+    assert estimate.weights == pytest.approx([1.0, 1.2])
+    assert estimate.costs == pytest.approx([0, 1.2 * 25 / 500])
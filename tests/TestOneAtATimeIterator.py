@@ -0,0 +1,94 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import unittest.mock #To mock the scene root.
+
+import numpy
+
+from UM.Scene.SceneNode import SceneNode
+
+from cura.OneAtATimeIterator import OneAtATimeIterator #The class we're testing.
+
+##  A rectangle in the X/Z plane, of which only what the iterator uses is
+#   implemented.
+class MockPolygon:
+    ##  \param bounds The bounds of the rectangle (min x, min z, max x, max z).
+    #   \param checks A list that each exact intersection check is added to.
+    def __init__(self, bounds, checks):
+        self._bounds = bounds
+        self._checks = checks
+
+    def getPoints(self):
+        min_x, min_z, max_x, max_z = self._bounds
+        return numpy.array([[min_x, min_z], [min_x, max_z], [max_x, max_z], [max_x, min_z]], dtype = numpy.float32)
+
+    def intersectsPolygon(self, other):
+        self._checks.append((self, other))
+        if self._bounds[0] < other._bounds[2] and other._bounds[0] < self._bounds[2] and self._bounds[1] < other._bounds[3] and other._bounds[1] < self._bounds[3]:
+            return (1, 0) #Some push-out vector, as long as it's not None.
+        return None
+
+##  Creates a node of 10 by 10mm, whose head hull extends to one side.
+#
+#   \param x The X coordinate of the centre of the node.
+#   \param head_size How far the head hull extends to the right of the node,
+#   or to the left if negative.
+#   \param checks A list that each exact intersection check is added to.
+def createNode(x, head_size, checks):
+    node = SceneNode()
+    moveNode(node, x, head_size, checks)
+    return node
+
+##  Gives a node new hulls, like its convex hull decorator does when it's
+#   moved.
+def moveNode(node, x, head_size, checks):
+    boundary = MockPolygon((x - 5, -5, x + 5, 5), checks)
+    head = MockPolygon((x - 5 + min(head_size, 0), -5, x + 5 + max(head_size, 0), 5), checks)
+    hulls = {"getConvexHull": boundary, "getConvexHullBoundary": boundary, "getConvexHullHeadFull": head}
+    node.callDecoration = lambda function_name: hulls.get(function_name)
+
+def createRoot(nodes):
+    root = unittest.mock.MagicMock()
+    root.getChildren.return_value = nodes
+    return root
+
+##  Nodes that don't get in each other's way are printed in the reverse order
+#   of the scene.
+def test_orderSeparate():
+    checks = []
+    nodes = [createNode(x, 0, checks) for x in (0, 50, 100)]
+
+    assert list(OneAtATimeIterator(createRoot(nodes))) == list(reversed(nodes))
+    assert checks == [] #The bounding boxes don't even overlap.
+
+##  A node whose head hull covers another node has to be printed first.
+def test_orderBlocking():
+    checks = []
+    first = createNode(0, 20, checks) #Its head covers the second node.
+    second = createNode(20, 0, checks)
+
+    assert list(OneAtATimeIterator(createRoot([first, second]))) == [first, second]
+
+##  If both nodes have to be printed before each other, there is no order.
+def test_orderMutuallyBlocking():
+    checks = []
+    left = createNode(0, 20, checks) #Its head covers the right node.
+    right = createNode(20, -20, checks) #Its head covers the left node.
+
+    assert list(OneAtATimeIterator(createRoot([left, right]))) == []
+
+##  After a node is moved, only the pairs with that node are checked again.
+def test_hitCacheAfterMove():
+    checks = []
+    nodes = [createNode(0, 20, checks), createNode(20, 20, checks), createNode(40, 20, checks)]
+    root = createRoot(nodes)
+    assert list(OneAtATimeIterator(root)) == nodes
+    assert len(checks) == 2 #Only neighbouring nodes are close enough to check.
+    checks.clear()
+
+    assert list(OneAtATimeIterator(root)) == nodes
+    assert checks == [] #Nothing changed, so everything came from the cache.
+
+    moveNode(nodes[2], 42, 20, checks)
+    assert list(OneAtATimeIterator(root)) == nodes
+    assert len(checks) == 1 #Only the pair of the middle node and the moved node.
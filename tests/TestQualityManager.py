@@ -0,0 +1,72 @@
+# Copyright (c) 2017 Ultimaker B.V.
+# Cura is released under the terms of the LGPLv3 or higher.
+
+import unittest.mock #To mock the container registry and the preferences.
+
+import pytest #This module contains unit tests.
+
+import UM.Settings.ContainerRegistry
+from cura.QualityManager import QualityManager #The class we're testing.
+
+##  Fake container registry that knows a single basic material.
+@pytest.yield_fixture()
+def container_registry():
+    registry = unittest.mock.MagicMock()
+    registry.findDefinitionContainersMetadata = unittest.mock.MagicMock(return_value = [])
+    registry.findInstanceContainersMetadata = unittest.mock.MagicMock(side_effect = lambda **kwargs: [{"id": "generic_pla", "type": "material"}])
+
+    UM.Settings.ContainerRegistry.ContainerRegistry._ContainerRegistry__instance = registry
+    yield registry
+    UM.Settings.ContainerRegistry.ContainerRegistry._ContainerRegistry__instance = None
+
+##  A quality manager of its own, so the tests don't change the singleton.
+@pytest.fixture()
+def quality_manager(container_registry):
+    return QualityManager()
+
+material = {"id": "generic_pla_ultimaker3_AA_0.4", "definition": "ultimaker3", "variant": "ultimaker3_aa04", "material": "generic_pla"}
+
+##  Tests that the basic materials are looked up once, and that callers get a
+#   copy they can change.
+def test_getBasicMaterialMetadatasLookupTable(quality_manager, container_registry):
+    quality_manager.setLookupTableEnabled(True)
+
+    result = quality_manager._getBasicMaterialMetadatas(material)
+    result.append({"id": "not_a_basic_material"})
+
+    assert quality_manager._getBasicMaterialMetadatas(material) == [{"id": "generic_pla", "type": "material"}]
+    assert container_registry.findInstanceContainersMetadata.call_count == 1
+
+##  Tests that changing a material clears the lookup tables.
+def test_containerChangedClearsLookupTable(quality_manager, container_registry):
+    quality_manager.setLookupTableEnabled(True)
+    quality_manager._getBasicMaterialMetadatas(material)
+
+    changed_material = unittest.mock.MagicMock()
+    changed_material.getMetaDataEntry = unittest.mock.MagicMock(return_value = "material")
+    quality_manager._onContainerChanged(changed_material)
+    quality_manager._getBasicMaterialMetadatas(material)
+
+    assert container_registry.findInstanceContainersMetadata.call_count == 2
+
+##  Tests that turning the preference off and on again turns the lookup tables
+#   off and on, and starts with empty tables.
+def test_followLookupTablePreference(quality_manager, container_registry):
+    preferences = unittest.mock.MagicMock()
+    preferences.getValue = unittest.mock.MagicMock(return_value = True)
+    quality_manager.followLookupTablePreference(preferences)
+    preferences.preferenceChanged.connect.assert_called_once_with(quality_manager._onPreferenceChanged)
+    quality_manager._getBasicMaterialMetadatas(material)
+    quality_manager._getBasicMaterialMetadatas(material)
+    assert container_registry.findInstanceContainersMetadata.call_count == 1
+
+    preferences.getValue.return_value = False
+    quality_manager._onPreferenceChanged("cura/use_quality_lookup_table")
+    quality_manager._getBasicMaterialMetadatas(material)
+    quality_manager._getBasicMaterialMetadatas(material)
+    assert container_registry.findInstanceContainersMetadata.call_count == 3
+
+    preferences.getValue.return_value = True
+    quality_manager._onPreferenceChanged("cura/use_quality_lookup_table")
+    quality_manager._getBasicMaterialMetadatas(material)
+    assert container_registry.findInstanceContainersMetadata.call_count == 4 #The table was emptied when it was turned off.